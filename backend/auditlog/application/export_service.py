@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zlib
+from collections.abc import AsyncIterator, Iterable, Iterator
+from datetime import datetime
+from typing import TypeVar, cast
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import QuerySet
+
+from auditlog.infrastructure.cursor import decode_cursor, encode_cursor
+from auditlog.infrastructure.query_builder import before_cursor
+from auditlog.models import AuditEvent
+
+T = TypeVar("T")
+
+_EXHAUSTED = object()
+
+EXPORT_FORMATS = ("csv", "json", "jsonl", "ndjson")
+
+EXPORT_FIELDNAMES = [
+    "id",
+    "createdAt",
+    "action",
+    "protocol",
+    "actorUserId",
+    "actorUsername",
+    "isAuthenticated",
+    "method",
+    "path",
+    "statusCode",
+    "success",
+    "ip",
+    "requestId",
+    "metadata",
+]
+
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "json": "application/json; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+
+
+def export_chunk_size() -> int:
+    return max(1, int(getattr(settings, "AUDIT_EXPORT_CHUNK_SIZE", 1000)))
+
+
+def serialize_event(event: AuditEvent) -> dict[str, object]:
+    created_at = cast(datetime | None, event.created_at)
+    return {
+        "id": event.pk,
+        "createdAt": created_at.isoformat() if created_at else None,
+        "action": event.action,
+        "protocol": event.protocol,
+        "actorUserId": event.actor_user_id_snapshot,
+        "actorUsername": event.actor_username_snapshot,
+        "isAuthenticated": event.is_authenticated,
+        "method": event.method,
+        "path": event.path,
+        "statusCode": event.status_code,
+        "success": event.success,
+        "ip": event.ip,
+        "requestId": event.request_id,
+        "metadata": event.metadata or {},
+    }
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _dumps(payload: dict[str, object], *, indent: int | None = None) -> str:
+    return json.dumps(payload, ensure_ascii=False, indent=indent, default=_json_default)
+
+
+def iter_event_pages(
+    queryset: QuerySet[AuditEvent],
+    *,
+    chunk_size: int | None = None,
+    cursor: str | None = None,
+) -> Iterator[list[AuditEvent]]:
+    """Yield events newest first in pages, seeking by ``(created_at, id)``.
+
+    Each page is one indexed range query, so memory stays bounded by the page
+    size and late pages cost the same as early ones.
+    """
+    size = chunk_size or export_chunk_size()
+    queryset = queryset.order_by("-created_at", "-id")
+    position = decode_cursor(cursor)
+    while True:
+        page_qs = queryset.filter(before_cursor(*position)) if position else queryset
+        page = list(page_qs[:size])
+        if not page:
+            return
+        yield page
+        if len(page) < size:
+            return
+        position = (page[-1].created_at, page[-1].pk)
+
+
+def csv_chunks(pages: Iterable[list[AuditEvent]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDNAMES)
+    writer.writeheader()
+    for page in pages:
+        for event in page:
+            row = serialize_event(event)
+            row["metadata"] = json.dumps(row["metadata"], ensure_ascii=False, separators=(",", ":"))
+            writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def json_chunks(pages: Iterable[list[AuditEvent]]) -> Iterator[str]:
+    """Same bytes as ``json.dumps(events, indent=2)``, written one page at a time."""
+    yield "["
+    first = True
+    for page in pages:
+        parts = []
+        for event in page:
+            # Newlines inside string values are escaped, so every raw one is layout.
+            item = _dumps(serialize_event(event), indent=2).replace("\n", "\n  ")
+            parts.append(("\n  " if first else ",\n  ") + item)
+            first = False
+        yield "".join(parts)
+    yield "]" if first else "\n]"
+
+
+def ndjson_chunks(pages: Iterable[list[AuditEvent]], *, with_cursor: bool = False) -> Iterator[str]:
+    """One JSON object per line; ``with_cursor`` adds a resume cursor to each line.
+
+    Passing the last received ``cursor`` back as ``?cursor=`` continues the
+    download right after that event.
+    """
+    for page in pages:
+        lines = []
+        for event in page:
+            payload = serialize_event(event)
+            if with_cursor:
+                payload["cursor"] = encode_cursor(event.created_at, int(event.pk))
+            lines.append(_dumps(payload) + "\n")
+        yield "".join(lines)
+
+
+def export_chunks(pages: Iterable[list[AuditEvent]], export_format: str) -> Iterator[str]:
+    if export_format == "csv":
+        return csv_chunks(pages)
+    if export_format == "json":
+        return json_chunks(pages)
+    return ndjson_chunks(pages, with_cursor=export_format == "ndjson")
+
+
+def gzip_chunks(chunks: Iterable[str]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode("utf-8"))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def aiterate_in_thread(chunks: Iterator[T]) -> AsyncIterator[T]:
+    """Pull each chunk of a sync (DB-backed) iterator in a worker thread.
+
+    Under ASGI the response is consumed on the event loop, where the keyset
+    queries of ``iter_event_pages`` are not allowed to run.
+    """
+    step = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await step(chunks, _EXHAUSTED)
+        if chunk is _EXHAUSTED:
+            return
+        yield cast(T, chunk)
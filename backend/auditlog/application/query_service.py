@@ -8,6 +8,7 @@ from django.conf import settings
 from django.db.models import Count
 from django.utils import timezone
 
+from auditlog.application.rollup_service import action_counts_from_rollups, counter_action_counts
 from auditlog.domain.context import AuditQueryFilters
 from auditlog.infrastructure.cursor import encode_cursor
 from auditlog.infrastructure.query_builder import apply_filters
@@ -95,13 +96,25 @@ def get_event(event_id: int):
 
 def list_action_counts(filters: AuditQueryFilters):
     base_filters = replace(filters, action=None, action_prefix=None, cursor=None)
-    queryset = apply_filters(
-        AuditEventRepository.all(),
-        base_filters,
-        include_action_filters=False,
-    )
-    return list(
-        queryset.values("action")
-        .annotate(count=Count("id"))
-        .order_by("-count", "action")
-    )
+    from_rollups = action_counts_from_rollups(base_filters)
+    if from_rollups is not None:
+        counts = from_rollups
+    else:
+        queryset = apply_filters(
+            AuditEventRepository.all(),
+            base_filters,
+            include_action_filters=False,
+        )
+        counts = list(
+            queryset.values("action")
+            .annotate(count=Count("id"))
+            .order_by("-count", "action")
+        )
+    aggregated = counter_action_counts(base_filters)
+    if not aggregated:
+        return counts
+    aggregated.update({row["action"]: row["count"] for row in counts})
+    return [
+        {"action": action, "count": count}
+        for action, count in sorted(aggregated.items(), key=lambda item: (-item[1], item[0]))
+    ]
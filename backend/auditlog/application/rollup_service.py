@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import fields
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from auditlog.domain.context import AuditQueryFilters
+from auditlog.infrastructure.query_builder import apply_filters
+from auditlog.infrastructure.repository import AuditEventRepository
+from auditlog.models import AuditActionCounter, AuditActionRollup, AuditRollupWatermark
+
+HOUR = timedelta(hours=1)
+
+# Filters a rollup bucket can answer; anything else needs the raw table.
+_ROLLUP_FILTERS = {"protocol", "success", "date_from", "date_to", "action", "action_prefix", "limit", "cursor"}
+
+
+def rollups_enabled() -> bool:
+    return bool(getattr(settings, "AUDIT_ACTION_ROLLUPS", False))
+
+
+def floor_hour(value: datetime) -> datetime:
+    # Buckets are UTC hours, so zones with sub-hour offsets still line up.
+    return value.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def ceil_hour(value: datetime) -> datetime:
+    floored = floor_hour(value)
+    return floored if floored == value else floored + HOUR
+
+
+def compacted_until() -> datetime | None:
+    watermark = AuditRollupWatermark.objects.order_by("pk").first()
+    return watermark.compacted_until if watermark else None
+
+
+def compact_action_rollups(*, until: datetime | None = None, max_hours: int = 24 * 7) -> int:
+    """Roll up closed hours after the watermark; returns the number of hours compacted.
+
+    Each hour is recomputed from scratch, so reruns and overlaps are safe.
+    ``until`` defaults to the start of the hour that closed
+    ``AUDIT_ROLLUP_LAG_SECONDS`` ago, leaving room for in-flight writes.
+    """
+    if until is None:
+        lag = int(getattr(settings, "AUDIT_ROLLUP_LAG_SECONDS", 300))
+        until = floor_hour(timezone.now() - timedelta(seconds=lag))
+    start = compacted_until()
+    if start is None:
+        first_event = AuditEventRepository.all().aggregate(first=Min("created_at"))["first"]
+        start = floor_hour(first_event) if first_event else until
+    end = min(until, start + HOUR * max(1, max_hours))
+    if start >= end:
+        return 0
+
+    buckets = (
+        AuditEventRepository.all()
+        .filter(created_at__gte=start, created_at__lt=end)
+        .annotate(hour=TruncHour("created_at", tzinfo=dt_timezone.utc))
+        .values("hour", "action", "protocol", "success")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    rows = [AuditActionRollup(**bucket) for bucket in buckets]
+    with transaction.atomic():
+        AuditActionRollup.objects.filter(hour__gte=start, hour__lt=end).delete()
+        AuditActionRollup.objects.bulk_create(rows, batch_size=1000)
+        updated = AuditRollupWatermark.objects.filter(pk=1).update(compacted_until=end)
+        if not updated:
+            AuditRollupWatermark.objects.create(pk=1, compacted_until=end)
+    return int((end - start) / HOUR)
+
+
+def delete_rollups_before(cutoff: datetime) -> int:
+    deleted, _details = AuditActionRollup.objects.filter(hour__lt=floor_hour(cutoff)).delete()
+    return deleted
+
+
+def delete_counters_before(cutoff: datetime) -> int:
+    deleted, _details = AuditActionCounter.objects.filter(minute__lt=cutoff).delete()
+    return deleted
+
+
+def _answerable(filters: AuditQueryFilters) -> bool:
+    return all(
+        field.name in _ROLLUP_FILTERS or getattr(filters, field.name) in (None, "")
+        for field in fields(filters)
+    )
+
+
+def action_counts_from_rollups(filters: AuditQueryFilters) -> list[dict] | None:
+    """Action counts from whole compacted hours plus raw rows at the window edges.
+
+    Returns ``None`` when the filters or the compacted range do not allow it;
+    callers then aggregate the raw table.
+    """
+    if not rollups_enabled() or not _answerable(filters):
+        return None
+    watermark = compacted_until()
+    if watermark is None:
+        return None
+    start = ceil_hour(filters.date_from) if filters.date_from else None
+    end = min(floor_hour(filters.date_to), watermark) if filters.date_to else watermark
+    if start is not None and start >= end:
+        return None
+
+    rollups = AuditActionRollup.objects.filter(hour__lt=end)
+    if start is not None:
+        rollups = rollups.filter(hour__gte=start)
+    if filters.protocol:
+        rollups = rollups.filter(protocol=filters.protocol)
+    if filters.success is not None:
+        rollups = rollups.filter(success=filters.success)
+
+    counts: Counter[str] = Counter()
+    for row in rollups.values("action").annotate(total=Sum("count")).order_by():
+        counts[row["action"]] += int(row["total"])
+
+    edges = Q(created_at__gte=end)
+    if start is not None:
+        edges |= Q(created_at__lt=start)
+    raw = apply_filters(AuditEventRepository.all(), filters, include_action_filters=False).filter(edges)
+    for row in raw.values("action").annotate(count=Count("id")).order_by():
+        counts[row["action"]] += int(row["count"])
+
+    return [
+        {"action": action, "count": count}
+        for action, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    ]
+
+
+def counter_action_counts(filters: AuditQueryFilters) -> Counter[str] | None:
+    """Events the audit policy counted instead of storing, per action.
+
+    Counters only carry protocol, success and a minute, so ``None`` means the
+    filters cannot be applied to them and the counts must be left out.
+    """
+    if not _answerable(filters):
+        return None
+    counters = AuditActionCounter.objects.all()
+    if filters.date_from:
+        counters = counters.filter(minute__gte=filters.date_from)
+    if filters.date_to:
+        counters = counters.filter(minute__lte=filters.date_to)
+    if filters.protocol:
+        counters = counters.filter(protocol=filters.protocol)
+    if filters.success is not None:
+        counters = counters.filter(success=filters.success)
+    counts: Counter[str] = Counter()
+    for row in counters.values("action").annotate(total=Sum("count")).order_by():
+        counts[row["action"]] += int(row["total"])
+    return counts
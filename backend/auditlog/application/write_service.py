@@ -3,15 +3,21 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+import random
 import uuid
 from collections.abc import Awaitable, Callable, Iterable, Mapping
 from typing import cast
 
 from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.db import IntegrityError, OperationalError, ProgrammingError
 
 from auditlog.domain.actions import AuditAction
+from auditlog.domain.policy import AGGREGATE, DEFAULT_POLICY_RULES, LOG, SAMPLE, AuditPolicyEngine, must_persist
 from auditlog.domain.sanitize import sanitize_value
+from auditlog.infrastructure.batch_writer import batch_writer_enabled, get_audit_writer
+from auditlog.infrastructure.counters import get_counter_aggregator
 from auditlog.infrastructure.repository import AuditEventRepository
 from chat_app_django.ip_utils import get_client_ip_from_request, get_client_ip_from_scope
 
@@ -20,6 +26,9 @@ LOGGER_NAME = "security.audit"
 _audit_logger = logging.getLogger(LOGGER_NAME)
 _internal_logger = logging.getLogger("auditlog")
 
+# Metadata keys also stored in indexed columns (column name -> max length).
+PROMOTED_METADATA_KEYS = {"room_slug": 128, "endpoint": 64, "reason": 64}
+
 
 def _normalize_int(value):
     if value is None:
@@ -93,6 +102,33 @@ def _safe_metadata(metadata) -> dict:
     return {"value": sanitized}
 
 
+_policy_cache: tuple[tuple, AuditPolicyEngine] | None = None
+
+
+def _policy_engine() -> AuditPolicyEngine:
+    """Engine for the current settings; rebuilt only when they change."""
+    global _policy_cache
+    enabled = bool(getattr(settings, "AUDIT_POLICY", False))
+    extra_rules = tuple(getattr(settings, "AUDIT_POLICY_RULES", ()) or ())
+    key = (enabled, extra_rules)
+    if _policy_cache is None or _policy_cache[0] != key:
+        rules = (*extra_rules, *DEFAULT_POLICY_RULES) if enabled else ()
+        try:
+            engine = AuditPolicyEngine(rules)
+        except ValueError as exc:
+            raise ImproperlyConfigured(f"AUDIT_POLICY_RULES содержит некорректное правило: {exc}") from exc
+        _policy_cache = (key, engine)
+    return _policy_cache[1]
+
+
+def _promoted_columns(event_metadata: dict) -> dict[str, str | None]:
+    columns: dict[str, str | None] = {}
+    for key, max_length in PROMOTED_METADATA_KEYS.items():
+        value = event_metadata.get(key)
+        columns[key] = str(value)[:max_length] if value not in (None, "") else None
+    return columns
+
+
 def _default_success(event: str, status_code: int | None) -> bool:
     if status_code is not None:
         return status_code < 400
@@ -108,10 +144,19 @@ def _persist_event_row(payload: dict) -> None:
         _internal_logger.exception("Failed to persist audit event")
 
 
-def _persist_event(payload: dict) -> None:
+def _persist_event(payload: dict, *, critical: bool = False) -> None:
     try:
         loop = asyncio.get_running_loop()
     except RuntimeError:
+        loop = None
+
+    if batch_writer_enabled():
+        # Never block the event loop: async callers do not wait for room in the queue.
+        if get_audit_writer().submit(payload, block=loop is None) or not critical:
+            return
+        # A full queue may drop noise, but failed and security events are inserted directly.
+
+    if loop is None:
         _persist_event_row(payload)
         return
 
@@ -143,9 +188,22 @@ def write_event(
     metadata=None,
     **fields,
 ):
+    normalized_status_code = _normalize_int(status_code)
+    if success is None:
+        success = _default_success(action, normalized_status_code)
+    success = bool(success)
+
+    # Decided before any sanitizing or serialization so aggregated events stay cheap.
+    policy = _policy_engine().resolve(action, success=success)
+    if policy.mode == AGGREGATE or (policy.mode == SAMPLE and random.random() >= policy.sample_rate):
+        get_counter_aggregator().add(action, protocol, success)
+        return
+
     event_metadata = _safe_metadata(metadata)
     if fields:
         event_metadata.update(_safe_metadata(fields))
+    if policy.mode == SAMPLE:
+        event_metadata["sample_rate"] = policy.sample_rate
 
     actor_user, actor_user_id_snapshot, actor_username_snapshot, actor_authenticated = _extract_actor(
         actor_user=actor_user,
@@ -154,11 +212,6 @@ def write_event(
         is_authenticated=is_authenticated,
     )
 
-    normalized_status_code = _normalize_int(status_code)
-    if success is None:
-        success = _default_success(action, normalized_status_code)
-    success = bool(success)
-
     payload = {
         "protocol": protocol,
         "method": method,
@@ -185,6 +238,8 @@ def write_event(
             sort_keys=True,
         )
     )
+    if policy.mode == LOG:
+        return
 
     _persist_event(
         {
@@ -201,7 +256,9 @@ def write_event(
             "ip": ip,
             "request_id": request_id,
             "metadata": event_metadata,
-        }
+            **_promoted_columns(event_metadata),
+        },
+        critical=must_persist(action, success=success),
     )
 
 
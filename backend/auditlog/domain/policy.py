@@ -0,0 +1,98 @@
+"""Per-action audit policy: what a write does with an event.
+
+``persist`` stores a row (the default), ``sample`` stores a row for a
+fraction of events and counts the rest, ``aggregate`` only bumps a
+per-minute counter and ``log`` writes the log line without a row.
+Failed events and security actions are always persisted whatever the
+rules say.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+
+PERSIST = "persist"
+SAMPLE = "sample"
+AGGREGATE = "aggregate"
+LOG = "log"
+MODES = (PERSIST, SAMPLE, AGGREGATE, LOG)
+
+SECURITY_ACTION_PREFIXES = ("auth.", "user.", "media.signature.")
+
+# First matching pattern wins.
+DEFAULT_POLICY_RULES = (
+    "ws.message.sent=aggregate",
+    "ws.disconnect=aggregate",
+    "ws.connect.accepted=sample:0.1",
+    "ws.direct_inbox.*.success=log",
+)
+
+_MAX_CACHED_ACTIONS = 1024
+
+
+@dataclass(frozen=True, slots=True)
+class AuditPolicy:
+    mode: str = PERSIST
+    sample_rate: float = 1.0
+
+
+ALWAYS_PERSIST = AuditPolicy()
+
+
+def parse_policy(spec: str) -> AuditPolicy:
+    """``mode`` or ``sample:<rate>`` with a rate in ``(0, 1]``."""
+    mode, _sep, rate = spec.strip().partition(":")
+    mode = mode.strip().lower()
+    if mode not in MODES:
+        raise ValueError(f"Unknown audit policy mode: {mode!r}")
+    if mode != SAMPLE:
+        if rate:
+            raise ValueError(f"Audit policy mode {mode!r} takes no rate")
+        return AuditPolicy(mode=mode)
+    try:
+        sample_rate = float(rate)
+    except ValueError as exc:
+        raise ValueError(f"Invalid audit sample rate: {rate!r}") from exc
+    if not 0 < sample_rate <= 1:
+        raise ValueError(f"Audit sample rate must be in (0, 1]: {rate!r}")
+    return AuditPolicy(mode=SAMPLE, sample_rate=sample_rate)
+
+
+def parse_rule(rule: str) -> tuple[str, AuditPolicy]:
+    """``<action pattern>=<policy>``, e.g. ``ws.message.*=sample:0.05``."""
+    pattern, sep, spec = rule.partition("=")
+    pattern = pattern.strip()
+    if not sep or not pattern:
+        raise ValueError(f"Audit policy rule must look like 'pattern=mode': {rule!r}")
+    return pattern, parse_policy(spec)
+
+
+def must_persist(action: str, *, success: bool) -> bool:
+    """Failed and security events: never sampled, aggregated or dropped."""
+    return not success or action.startswith(SECURITY_ACTION_PREFIXES)
+
+
+class AuditPolicyEngine:
+    """Resolves the policy for an action against ordered fnmatch rules."""
+
+    def __init__(self, rules: Iterable[str] = ()):
+        self.rules = [parse_rule(rule) for rule in rules]
+        self._cache: dict[str, AuditPolicy] = {}
+
+    def resolve(self, action: str, *, success: bool) -> AuditPolicy:
+        if not self.rules or must_persist(action, success=success):
+            return ALWAYS_PERSIST
+        policy = self._cache.get(action)
+        if policy is None:
+            policy = self._match(action)
+            if len(self._cache) < _MAX_CACHED_ACTIONS:
+                self._cache[action] = policy
+        return policy
+
+    def _match(self, action: str) -> AuditPolicy:
+        for pattern, policy in self.rules:
+            if fnmatchcase(action, pattern):
+                return policy
+        return ALWAYS_PERSIST
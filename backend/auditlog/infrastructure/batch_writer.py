@@ -0,0 +1,166 @@
+"""Bounded in-process queue that persists audit events in batches.
+
+Callers enqueue row payloads and return immediately; one daemon thread
+drains the queue and writes up to ``batch_size`` rows per ``bulk_create``,
+waiting at most ``flush_interval`` seconds for a batch to fill. When the
+queue is full, sync callers block for up to ``block_timeout`` seconds
+(back-pressure) and async callers never block; events that still do not
+fit are dropped and counted, except failed and security events, which
+``write_service`` then inserts directly. ``close()`` drains what is queued and runs at
+interpreter exit.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from chat_app_django.metrics import gauge, histogram
+
+from .repository import AuditEventRepository
+
+logger = logging.getLogger("auditlog")
+
+_STOP = object()
+
+
+class AuditBatchWriter:
+    """Single-consumer audit queue with a background flusher thread."""
+
+    def __init__(
+        self,
+        *,
+        queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.2,
+        block_timeout: float = 0.05,
+    ):
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.0, float(flush_interval))
+        self.block_timeout = max(0.0, float(block_timeout))
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.queue_depth = gauge("audit.writer.queue_depth")
+        self.dropped = gauge("audit.writer.dropped")
+        self.written = gauge("audit.writer.written")
+        self.flush_latency = histogram("audit.writer.flush")
+
+    def submit(self, row: dict, *, block: bool = True) -> bool:
+        """Queue one row; returns ``False`` when it was dropped."""
+        if self._closed:
+            self.dropped.add(1)
+            return False
+        self._ensure_running()
+        try:
+            if block and self.block_timeout > 0:
+                self._queue.put(row, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped.add(1)
+            return False
+        self.queue_depth.add(1)
+        return True
+
+    def _ensure_running(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+
+    def _collect_batch(self) -> tuple[list[dict], bool]:
+        batch: list[dict] = []
+        first = self._queue.get()
+        if first is _STOP:
+            return batch, True
+        batch.append(first)
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect_batch()
+            if batch:
+                self._flush(batch)
+        # Whatever was queued behind the stop marker is still written.
+        rest: list[dict] = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                rest.append(item)
+        for start in range(0, len(rest), self.batch_size):
+            self._flush(rest[start : start + self.batch_size])
+        close_old_connections()
+
+    def _flush(self, batch: list[dict]) -> None:
+        self.queue_depth.add(-len(batch))
+        close_old_connections()
+        with self.flush_latency.time():
+            try:
+                AuditEventRepository.bulk_create(batch)
+                self.written.add(len(batch))
+                return
+            except Exception:
+                logger.warning("Batched audit insert failed, retrying row by row", exc_info=True)
+            for row in batch:
+                try:
+                    AuditEventRepository.create(**row)
+                    self.written.add(1)
+                except Exception:
+                    self.dropped.add(1)
+                    logger.exception("Failed to persist audit event")
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop accepting rows, write everything queued and stop the thread."""
+        self._closed = True
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+
+_writer: AuditBatchWriter | None = None
+_writer_lock = threading.Lock()
+
+
+def batch_writer_enabled() -> bool:
+    return bool(getattr(settings, "AUDIT_BATCH_WRITER", False))
+
+
+def get_audit_writer() -> AuditBatchWriter:
+    """Return the process-wide writer, creating it on first use."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = AuditBatchWriter(
+                queue_size=int(getattr(settings, "AUDIT_BATCH_QUEUE_SIZE", 10000)),
+                batch_size=int(getattr(settings, "AUDIT_BATCH_MAX_SIZE", 500)),
+                flush_interval=int(getattr(settings, "AUDIT_BATCH_MAX_DELAY_MS", 200)) / 1000,
+                block_timeout=int(getattr(settings, "AUDIT_BATCH_BLOCK_MS", 50)) / 1000,
+            )
+            atexit.register(_writer.close)
+        return _writer
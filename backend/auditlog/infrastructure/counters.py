@@ -0,0 +1,115 @@
+"""In-process per-minute counters for audit events that are not stored as rows.
+
+``add()`` only bumps a dict entry under a lock, so it is cheap enough for
+every chat message and safe to call from the event loop. A daemon thread
+adds the accumulated counts to ``AuditActionCounter`` every
+``flush_interval`` seconds; ``close()`` flushes the rest and runs at
+interpreter exit.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from chat_app_django.metrics import gauge
+
+from .repository import AuditActionCounterRepository
+
+logger = logging.getLogger("auditlog")
+
+CounterKey = tuple[int, str, str, bool]
+
+
+class AuditCounterAggregator:
+    """Accumulates ``(minute, action, protocol, success)`` counts between flushes."""
+
+    def __init__(self, *, flush_interval: float = 10.0):
+        self.flush_interval = max(0.01, float(flush_interval))
+        self._counts: dict[CounterKey, int] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        self.pending = gauge("audit.counters.pending")
+        self.flushed = gauge("audit.counters.flushed")
+
+    def add(self, action: str, protocol: str | None, success: bool, *, now: float | None = None) -> None:
+        minute = int((time.time() if now is None else now) // 60)
+        key = (minute, action, protocol or "", bool(success))
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+        self.pending.add(1)
+        if not self._closed:
+            self._ensure_running()
+
+    def _ensure_running(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="audit-counters", daemon=True)
+                self._thread.start()
+
+    def flush(self) -> int:
+        """Write accumulated counts; returns the number of buckets written."""
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        if not counts:
+            return 0
+        self.pending.add(-sum(counts.values()))
+        close_old_connections()
+        written = 0
+        for (minute, action, protocol, success), count in counts.items():
+            try:
+                AuditActionCounterRepository.increment(
+                    minute=datetime.fromtimestamp(minute * 60, tz=dt_timezone.utc),
+                    action=action,
+                    protocol=protocol,
+                    success=success,
+                    count=count,
+                )
+            except Exception:
+                logger.exception("Failed to persist audit counter %s", action)
+                continue
+            written += 1
+            self.flushed.add(count)
+        return written
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self.flush()
+        close_old_connections()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop the thread and write whatever is still counted."""
+        self._closed = True
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        self.flush()
+
+
+_aggregator: AuditCounterAggregator | None = None
+_aggregator_lock = threading.Lock()
+
+
+def get_counter_aggregator() -> AuditCounterAggregator:
+    """Return the process-wide aggregator, creating it on first use."""
+    global _aggregator
+    with _aggregator_lock:
+        if _aggregator is None:
+            _aggregator = AuditCounterAggregator(
+                flush_interval=int(getattr(settings, "AUDIT_COUNTER_FLUSH_SECONDS", 10)),
+            )
+            atexit.register(_aggregator.close)
+        return _aggregator
@@ -22,6 +22,10 @@ class AuditEvent(models.Model):
     ip = models.CharField(max_length=64, null=True, blank=True, db_index=True)
     request_id = models.CharField(max_length=64, null=True, blank=True, db_index=True)
     metadata = models.JSONField(default=dict, blank=True)
+    # Hot metadata keys copied into columns at write time so filters hit an index.
+    room_slug = models.CharField(max_length=128, null=True, blank=True)
+    endpoint = models.CharField(max_length=64, null=True, blank=True)
+    reason = models.CharField(max_length=64, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
@@ -37,7 +41,69 @@ class AuditEvent(models.Model):
                 fields=["status_code", "created_at"],
                 name="audit_evt_status_created_idx",
             ),
+            models.Index(fields=["room_slug", "created_at"], name="audit_evt_room_created_idx"),
+            models.Index(fields=["endpoint", "created_at"], name="audit_evt_endpoint_created_idx"),
+            models.Index(fields=["reason", "created_at"], name="audit_evt_reason_created_idx"),
         ]
 
     def __str__(self):
         return f"{self.created_at.isoformat()} {self.action}"
+
+
+class AuditActionRollup(models.Model):
+    """Event counts per (hour, action, protocol, success), built by compact_audit_rollups."""
+
+    hour = models.DateTimeField()
+    action = models.CharField(max_length=128)
+    protocol = models.CharField(max_length=16, null=True, blank=True)
+    success = models.BooleanField(default=False)
+    count = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hour", "action", "protocol", "success"],
+                name="audit_rollup_bucket_uniq",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["hour", "action"], name="audit_rollup_hour_action_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.hour.isoformat()} {self.action} x{self.count}"
+
+
+class AuditActionCounter(models.Model):
+    """Per-minute counts of events the audit policy aggregated instead of storing as rows."""
+
+    minute = models.DateTimeField()
+    action = models.CharField(max_length=128)
+    # "" rather than NULL: NULLs are distinct in the unique bucket constraint.
+    protocol = models.CharField(max_length=16, blank=True, default="")
+    success = models.BooleanField(default=False)
+    count = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["minute", "action", "protocol", "success"],
+                name="audit_counter_bucket_uniq",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["minute", "action"], name="audit_counter_min_action_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.minute.isoformat()} {self.action} x{self.count}"
+
+
+class AuditRollupWatermark(models.Model):
+    """Single row: rollups are complete for every hour before ``compacted_until``."""
+
+    compacted_until = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.compacted_until.isoformat()
@@ -0,0 +1,259 @@
+"""Monthly range partitions of the audit table on PostgreSQL.
+
+Once converted (``manage.py audit_partitions --convert``), ``AuditEvent``
+rows live in ``auditlog_auditevent_pYYYYMM`` partitions keyed by
+``created_at``. Retention then detaches and drops whole partitions instead
+of deleting rows. Rows that existed before the conversion stay in the
+``..._legacy`` partition, which is dropped once its upper bound falls
+behind the retention cutoff. A ``DEFAULT`` partition catches rows outside
+the prepared months so inserts never fail.
+
+Other databases keep the plain table; callers check
+``is_partitioned()`` and fall back to chunked deletes.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from datetime import date, datetime
+from datetime import timezone as dt_timezone
+
+from django.db import connection, transaction
+
+from auditlog.models import AuditEvent
+
+TABLE = AuditEvent._meta.db_table
+LEGACY_PARTITION = f"{TABLE}_legacy"
+DEFAULT_PARTITION = f"{TABLE}_default"
+SEQUENCE = f"{TABLE}_id_seq"
+
+_UPPER_BOUND_RE = re.compile(r"TO \('([^']+)'\)")
+
+
+@dataclass(frozen=True, slots=True)
+class AuditPartition:
+    name: str
+    upper_bound: datetime | None
+    estimated_rows: int
+
+
+def month_start(value: date) -> date:
+    return value.replace(day=1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_p{month:%Y%m}"
+
+
+def parse_upper_bound(bound_expression: str) -> datetime | None:
+    """Upper bound of ``FOR VALUES FROM (...) TO (...)``; ``None`` for DEFAULT/MAXVALUE."""
+    match = _UPPER_BOUND_RE.search(bound_expression or "")
+    if not match:
+        return None
+    parsed = datetime.fromisoformat(match.group(1))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return parsed
+
+
+def partitioning_supported() -> bool:
+    return connection.vendor == "postgresql"
+
+
+def is_partitioned() -> bool:
+    if not partitioning_supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = %s",
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions() -> list[AuditPartition]:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid), child.reltuples::bigint
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            ORDER BY child.relname
+            """,
+            [TABLE],
+        )
+        return [
+            AuditPartition(name=name, upper_bound=parse_upper_bound(bound), estimated_rows=max(0, int(rows)))
+            for name, bound, rows in cursor.fetchall()
+        ]
+
+
+def ensure_monthly_partitions(*, months_ahead: int, today: date | None = None) -> list[str]:
+    """Create partitions from the current month through ``months_ahead``; returns created names.
+
+    Months already covered by an existing range (including the legacy
+    partition) are skipped. Rows the ``DEFAULT`` partition caught for a
+    month being created are moved into the new partition.
+    """
+    current = month_start(today or datetime.now(dt_timezone.utc).date())
+    existing = list_partitions()
+    bounds = [partition.upper_bound for partition in existing if partition.upper_bound is not None]
+    covered_until = max(bounds).date() if bounds else None
+    has_default = any(partition.name == DEFAULT_PARTITION for partition in existing)
+    created: list[str] = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if covered_until is not None and month < covered_until:
+            continue
+        name = partition_name(month)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                if has_default and _default_has_rows(cursor, month):
+                    _create_partition_from_default(cursor, name, month)
+                else:
+                    _create_partition(cursor, name, month)
+        created.append(name)
+    return created
+
+
+def _month_bounds(month: date) -> list[str]:
+    return [month.isoformat(), add_months(month, 1).isoformat()]
+
+
+def _create_partition(cursor, name: str, month: date) -> None:
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {connection.ops.quote_name(name)} "
+        f"PARTITION OF {connection.ops.quote_name(TABLE)} "
+        "FOR VALUES FROM (%s) TO (%s)",
+        _month_bounds(month),
+    )
+
+
+def _default_has_rows(cursor, month: date) -> bool:
+    cursor.execute(
+        f"SELECT EXISTS (SELECT 1 FROM {connection.ops.quote_name(DEFAULT_PARTITION)} "
+        "WHERE created_at >= %s AND created_at < %s)",
+        _month_bounds(month),
+    )
+    return bool(cursor.fetchone()[0])
+
+
+def _create_partition_from_default(cursor, name: str, month: date) -> None:
+    """Create ``name`` while the default partition holds rows for its month.
+
+    PostgreSQL refuses such a ``CREATE TABLE ... PARTITION OF``, so the
+    default partition is detached, the month created, its rows moved and
+    the default re-attached, all in the caller's transaction. DETACH locks
+    the audit table, so inserts wait until the move commits.
+    """
+    qn = connection.ops.quote_name
+    cursor.execute(f"ALTER TABLE {qn(TABLE)} DETACH PARTITION {qn(DEFAULT_PARTITION)}")
+    _create_partition(cursor, name, month)
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {qn(DEFAULT_PARTITION)} WHERE created_at >= %s AND created_at < %s RETURNING *) "
+        f"INSERT INTO {qn(name)} SELECT * FROM moved",
+        _month_bounds(month),
+    )
+    cursor.execute(f"ALTER TABLE {qn(TABLE)} ATTACH PARTITION {qn(DEFAULT_PARTITION)} DEFAULT")
+
+
+def drop_partition(name: str) -> None:
+    quoted = connection.ops.quote_name(name)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {connection.ops.quote_name(TABLE)} DETACH PARTITION {quoted}")
+            cursor.execute(f"DROP TABLE {quoted}")
+
+
+def expired_partitions(cutoff: datetime) -> list[AuditPartition]:
+    """Partitions whose every row is older than ``cutoff`` (the default partition never is)."""
+    return [
+        partition
+        for partition in list_partitions()
+        if partition.upper_bound is not None and partition.upper_bound <= cutoff
+    ]
+
+
+def convert_to_partitioned(*, months_ahead: int) -> None:
+    """Turn the plain audit table into a partitioned one, keeping existing rows.
+
+    The old table becomes the legacy partition covering everything up to
+    the end of the current month. Its indexes are renamed so the parent can
+    take the original (Django-generated) names; ATTACH then adopts them
+    instead of rebuilding. Building the ``(id, created_at)`` key and validating the
+    range scan the legacy table once, so run it in a maintenance window.
+    """
+    if not partitioning_supported():
+        raise RuntimeError("Audit partitioning requires PostgreSQL")
+    if is_partitioned():
+        return
+
+    qn = connection.ops.quote_name
+    legacy_until = add_months(month_start(datetime.now(dt_timezone.utc).date()), 1)
+    user_table = AuditEvent._meta.get_field("actor_user").related_model._meta.db_table
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {qn(TABLE)} IN ACCESS EXCLUSIVE MODE")
+            cursor.execute(
+                "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname <> %s",
+                [TABLE, f"{TABLE}_pkey"],
+            )
+            indexes = cursor.fetchall()
+
+            cursor.execute(f"ALTER TABLE {qn(TABLE)} RENAME TO {qn(LEGACY_PARTITION)}")
+            cursor.execute(f"ALTER TABLE {qn(LEGACY_PARTITION)} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+            cursor.execute(f"ALTER TABLE {qn(LEGACY_PARTITION)} ALTER COLUMN id DROP DEFAULT")
+            for index_name, _definition in indexes:
+                cursor.execute(f"ALTER INDEX {qn(index_name)} RENAME TO {qn(_legacy_index_name(index_name))}")
+
+            cursor.execute(
+                f"CREATE TABLE {qn(TABLE)} (LIKE {qn(LEGACY_PARTITION)} INCLUDING DEFAULTS) "
+                "PARTITION BY RANGE (created_at)"
+            )
+            cursor.execute(f"ALTER TABLE {qn(TABLE)} ADD PRIMARY KEY (id, created_at)")
+            cursor.execute(
+                f"ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(f'{TABLE}_actor_user_id_fk')} "
+                f"FOREIGN KEY (actor_user_id) REFERENCES {qn(user_table)} (id) DEFERRABLE INITIALLY DEFERRED"
+            )
+            cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {qn(SEQUENCE)}")
+            # A serial-era sequence survives DROP DEFAULT; re-own it so dropping legacy keeps it.
+            cursor.execute(f"ALTER SEQUENCE {qn(SEQUENCE)} OWNED BY {qn(TABLE)}.id")
+            cursor.execute(
+                f"SELECT setval(%s, COALESCE((SELECT MAX(id) FROM {qn(LEGACY_PARTITION)}), 0) + 1, false)",
+                [SEQUENCE],
+            )
+            cursor.execute(f"ALTER TABLE {qn(TABLE)} ALTER COLUMN id SET DEFAULT nextval(%s::regclass)", [SEQUENCE])
+            for index_name, definition in indexes:
+                cursor.execute(_parent_index_sql(definition, index_name))
+
+            cursor.execute(
+                f"ALTER TABLE {qn(TABLE)} ATTACH PARTITION {qn(LEGACY_PARTITION)} "
+                "FOR VALUES FROM (MINVALUE) TO (%s)",
+                [legacy_until.isoformat()],
+            )
+            cursor.execute(f"CREATE TABLE {qn(DEFAULT_PARTITION)} PARTITION OF {qn(TABLE)} DEFAULT")
+        ensure_monthly_partitions(months_ahead=months_ahead)
+
+
+def _legacy_index_name(index_name: str) -> str:
+    suffix = "_legacy"
+    return f"{index_name[: 63 - len(suffix)]}{suffix}"
+
+
+def _parent_index_sql(definition: str, index_name: str) -> str:
+    """Rewrite a legacy ``CREATE INDEX`` to target the partitioned parent."""
+    _prefix, _sep, rest = definition.partition(" USING ")
+    unique = "UNIQUE " if definition.startswith("CREATE UNIQUE INDEX") else ""
+    return (
+        f"CREATE {unique}INDEX {connection.ops.quote_name(index_name)} "
+        f"ON {connection.ops.quote_name(TABLE)} USING {rest}"
+    )
@@ -7,6 +7,11 @@ from auditlog.infrastructure.cursor import decode_cursor
 from auditlog.models import AuditEvent
 
 
+def before_cursor(created_at, event_id: int) -> Q:
+    """Events strictly after ``(created_at, id)`` in newest-first order."""
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=event_id)
+
+
 def apply_filters(
     queryset: QuerySet[AuditEvent],
     filters: AuditQueryFilters,
@@ -39,11 +44,10 @@ def apply_filters(
     if filters.date_to:
         qs = qs.filter(created_at__lte=filters.date_to)
     if filters.room_slug:
-        qs = qs.filter(metadata__room_slug=filters.room_slug)
+        qs = qs.filter(room_slug=filters.room_slug)
 
     parsed_cursor = decode_cursor(filters.cursor)
     if parsed_cursor:
-        created_at, event_id = parsed_cursor
-        qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=event_id))
+        qs = qs.filter(before_cursor(*parsed_cursor))
 
     return qs
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
-from django.db.models import QuerySet
+from datetime import datetime
 
-from auditlog.models import AuditEvent
+from django.db import IntegrityError, transaction
+from django.db.models import F, QuerySet
+
+from auditlog.models import AuditActionCounter, AuditEvent
 
 
 class AuditEventRepository:
@@ -10,6 +13,27 @@ class AuditEventRepository:
     def create(**kwargs) -> AuditEvent:
         return AuditEvent.objects.create(**kwargs)
 
+    @staticmethod
+    def bulk_create(rows: list[dict]) -> list[AuditEvent]:
+        return AuditEvent.objects.bulk_create([AuditEvent(**row) for row in rows])
+
     @staticmethod
     def all() -> QuerySet[AuditEvent]:
         return AuditEvent.objects.all()
+
+
+class AuditActionCounterRepository:
+    @staticmethod
+    def increment(*, minute: datetime, action: str, protocol: str | None, success: bool, count: int) -> None:
+        protocol = protocol or ""
+        bucket = AuditActionCounter.objects.filter(minute=minute, action=action, protocol=protocol, success=success)
+        if bucket.update(count=F("count") + count):
+            return
+        try:
+            with transaction.atomic():
+                AuditActionCounter.objects.create(
+                    minute=minute, action=action, protocol=protocol, success=success, count=count
+                )
+        except IntegrityError:
+            # Another process created the bucket in between.
+            bucket.update(count=F("count") + count)
@@ -1,18 +1,29 @@
-import csv
-import json
-from datetime import datetime
-from typing import Any, cast
+from typing import Any
 
 from django.contrib import admin
+from django.core.handlers.asgi import ASGIRequest
 from django.db.models import Q, QuerySet
-from django.http import HttpRequest, HttpResponse, HttpResponseBadRequest
+from django.http import HttpRequest, HttpResponseBadRequest, StreamingHttpResponse
+from django.http.response import HttpResponseBase
 from django.urls import path, reverse
 from django.utils import timezone
 from django.utils.text import slugify
 
+from auditlog.application.export_service import (
+    EXPORT_CONTENT_TYPES,
+    EXPORT_FORMATS,
+    aiterate_in_thread,
+    export_chunks,
+    gzip_chunks,
+    iter_event_pages,
+)
 from auditlog.models import AuditEvent
 
 
+def _is_asgi(request: HttpRequest) -> bool:
+    return isinstance(request, ASGIRequest)
+
+
 class StatusFamilyFilter(admin.SimpleListFilter):
     title = "Группа статусов"
     parameter_name = "status_family"
@@ -162,12 +173,17 @@ class AuditEventAdmin(admin.ModelAdmin):
         "success",
         "ip",
         "request_id",
+        "room_slug",
+        "endpoint",
+        "reason",
         "metadata",
     )
     fields = readonly_fields
     ordering = ("-created_at", "-id")
     date_hierarchy = "created_at"
     actions = ("export_selected_as_csv", "export_selected_as_json", "export_selected_as_jsonl")
+    # Query parameters of the export view that are not changelist filters.
+    _EXPORT_PARAMS = ("format", "gzip", "cursor")
 
     @admin.display(description="Path")
     def short_path(self, obj):
@@ -184,16 +200,16 @@ class AuditEventAdmin(admin.ModelAdmin):
         return False
 
     @admin.action(description="Экспортировать выбранные (CSV)")
-    def export_selected_as_csv(self, _request, queryset):
-        return self._build_export_response(queryset, export_format="csv")
+    def export_selected_as_csv(self, request, queryset):
+        return self._build_export_response(queryset, export_format="csv", asynchronous=_is_asgi(request))
 
     @admin.action(description="Экспортировать выбранные (JSON)")
-    def export_selected_as_json(self, _request, queryset):
-        return self._build_export_response(queryset, export_format="json")
+    def export_selected_as_json(self, request, queryset):
+        return self._build_export_response(queryset, export_format="json", asynchronous=_is_asgi(request))
 
     @admin.action(description="Экспортировать выбранные (JSONL)")
-    def export_selected_as_jsonl(self, _request, queryset):
-        return self._build_export_response(queryset, export_format="jsonl")
+    def export_selected_as_jsonl(self, request, queryset):
+        return self._build_export_response(queryset, export_format="jsonl", asynchronous=_is_asgi(request))
 
     def get_urls(self):
         urls = super().get_urls()
@@ -209,27 +225,36 @@ class AuditEventAdmin(admin.ModelAdmin):
     def changelist_view(self, request, extra_context=None):
         extra_context = dict(extra_context or {})
         params = request.GET.copy()
-        params.pop("format", None)
+        for param in self._EXPORT_PARAMS:
+            params.pop(param, None)
         query_string = params.urlencode()
         export_base = reverse("admin:auditlog_auditevent_export")
         separator = f"?{query_string}&" if query_string else "?"
         extra_context["export_csv_url"] = f"{export_base}{separator}format=csv"
         extra_context["export_json_url"] = f"{export_base}{separator}format=json"
         extra_context["export_jsonl_url"] = f"{export_base}{separator}format=jsonl"
+        extra_context["export_ndjson_gzip_url"] = f"{export_base}{separator}format=ndjson&gzip=1"
         return super().changelist_view(request, extra_context=extra_context)
 
     def export_view(self, request):
         export_format = (request.GET.get("format") or "csv").strip().lower()
-        if export_format not in {"csv", "json", "jsonl"}:
+        if export_format not in EXPORT_FORMATS:
             return HttpResponseBadRequest("Неподдерживаемый формат экспорта".encode("utf-8"))
 
         queryset = self._get_filtered_queryset(request)
-        return self._build_export_response(queryset, export_format=export_format)
+        return self._build_export_response(
+            queryset,
+            export_format=export_format,
+            compress=(request.GET.get("gzip") or "").strip().lower() in {"1", "true", "yes", "on"},
+            cursor=(request.GET.get("cursor") or "").strip() or None,
+            asynchronous=_is_asgi(request),
+        )
 
     def _get_filtered_queryset(self, request):
         original_get = request.GET
         mutable_get = request.GET.copy()
-        mutable_get.pop("format", None)
+        for param in self._EXPORT_PARAMS:
+            mutable_get.pop(param, None)
         request.GET = mutable_get
         try:
             changelist = self.get_changelist_instance(request)
@@ -237,88 +262,29 @@ class AuditEventAdmin(admin.ModelAdmin):
         finally:
             request.GET = original_get
 
-    def _serialize_event(self, event: AuditEvent) -> dict[str, object]:
-        created_at = cast(datetime | None, event.created_at)
-        return {
-            "id": event.pk,
-            "createdAt": created_at.isoformat() if created_at else None,
-            "action": event.action,
-            "protocol": event.protocol,
-            "actorUserId": event.actor_user_id_snapshot,
-            "actorUsername": event.actor_username_snapshot,
-            "isAuthenticated": event.is_authenticated,
-            "method": event.method,
-            "path": event.path,
-            "statusCode": event.status_code,
-            "success": event.success,
-            "ip": event.ip,
-            "requestId": event.request_id,
-            "metadata": event.metadata or {},
-        }
-
-    def _build_export_filename(self, export_format: str) -> str:
+    def _build_export_filename(self, export_format: str, *, compress: bool = False) -> str:
         timestamp = timezone.now().strftime("%Y%m%d-%H%M%S")
-        return f"audit-events-{timestamp}.{slugify(export_format) or export_format}"
-
-    def _build_export_response(self, queryset, *, export_format: str) -> HttpResponse:
-        if export_format == "csv":
-            return self._as_csv(queryset, filename=self._build_export_filename("csv"))
-        if export_format == "json":
-            return self._as_json(queryset, filename=self._build_export_filename("json"))
-        if export_format == "jsonl":
-            return self._as_jsonl(queryset, filename=self._build_export_filename("jsonl"))
-        return HttpResponseBadRequest("Неподдерживаемый формат экспорта".encode("utf-8"))
-
-    def _as_csv(self, queryset, *, filename: str) -> HttpResponse:
-        response = HttpResponse(content_type="text/csv; charset=utf-8")
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
-
-        fieldnames = [
-            "id",
-            "createdAt",
-            "action",
-            "protocol",
-            "actorUserId",
-            "actorUsername",
-            "isAuthenticated",
-            "method",
-            "path",
-            "statusCode",
-            "success",
-            "ip",
-            "requestId",
-            "metadata",
-        ]
-        writer = csv.DictWriter(response, fieldnames=fieldnames)
-        writer.writeheader()
-        for event in queryset.iterator(chunk_size=1000):
-            row = self._serialize_event(event)
-            row["metadata"] = json.dumps(row["metadata"], ensure_ascii=False, separators=(",", ":"))
-            writer.writerow(row)
-        return response
+        filename = f"audit-events-{timestamp}.{slugify(export_format) or export_format}"
+        return f"{filename}.gz" if compress else filename
 
-    def _as_json(self, queryset, *, filename: str) -> HttpResponse:
-        payload = [self._serialize_event(event) for event in queryset.iterator(chunk_size=1000)]
-        response = HttpResponse(content_type="application/json; charset=utf-8")
-        response.write(
-            json.dumps(payload, ensure_ascii=False, indent=2, default=self._json_default).encode("utf-8")
-        )
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        return response
+    def _build_export_response(
+        self,
+        queryset,
+        *,
+        export_format: str,
+        compress: bool = False,
+        cursor: str | None = None,
+        asynchronous: bool = False,
+    ) -> HttpResponseBase:
+        if export_format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest("Неподдерживаемый формат экспорта".encode("utf-8"))
 
-    def _as_jsonl(self, queryset, *, filename: str) -> HttpResponse:
-        lines = []
-        for event in queryset.iterator(chunk_size=1000):
-            lines.append(
-                json.dumps(self._serialize_event(event), ensure_ascii=False, default=self._json_default)
-            )
-        response = HttpResponse(content_type="application/x-ndjson; charset=utf-8")
-        response.write(("\n".join(lines) + ("\n" if lines else "")).encode("utf-8"))
+        chunks = export_chunks(iter_event_pages(queryset, cursor=cursor), export_format)
+        body = gzip_chunks(chunks) if compress else chunks
+        content_type = "application/gzip" if compress else EXPORT_CONTENT_TYPES[export_format]
+        # ASGI iterates the body on the event loop, so pages are fetched in a thread there.
+        streamed = aiterate_in_thread(body) if asynchronous else body
+        response = StreamingHttpResponse(streamed, content_type=content_type)
+        filename = self._build_export_filename(export_format, compress=compress)
         response["Content-Disposition"] = f'attachment; filename="{filename}"'
         return response
-
-    @staticmethod
-    def _json_default(value):
-        if isinstance(value, datetime):
-            return value.isoformat()
-        return str(value)
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from auditlog.infrastructure import partitions
+
+
+class Command(BaseCommand):
+    help = "Управляет помесячными партициями таблицы аудита (только PostgreSQL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help="Перевести таблицу аудита на партиции; существующие события попадут в legacy-партицию.",
+        )
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=int(getattr(settings, "AUDIT_PARTITION_MONTHS_AHEAD", 3)),
+            help="Сколько месяцев вперёд держать готовые партиции (по умолчанию из AUDIT_PARTITION_MONTHS_AHEAD).",
+        )
+
+    def handle(self, *args, **options):
+        if not partitions.partitioning_supported():
+            raise CommandError("Партиционирование аудита поддерживается только на PostgreSQL")
+        months_ahead = int(options["months_ahead"])
+        if months_ahead < 0:
+            raise CommandError("--months-ahead должно быть >= 0")
+
+        if options["convert"]:
+            partitions.convert_to_partitioned(months_ahead=months_ahead)
+            self.stdout.write(self.style.SUCCESS("Таблица аудита переведена на партиции"))
+        elif not partitions.is_partitioned():
+            raise CommandError("Таблица аудита не партиционирована: запустите с --convert")
+
+        try:
+            created = partitions.ensure_monthly_partitions(months_ahead=months_ahead)
+        except DatabaseError as exc:
+            raise CommandError(f"Не удалось создать помесячные партиции аудита: {exc}") from exc
+        for name in created:
+            self.stdout.write(f"Создана партиция {name}")
+        for partition in partitions.list_partitions():
+            bound = partition.upper_bound.isoformat() if partition.upper_bound else "—"
+            self.stdout.write(f"{partition.name}: до {bound}, ~{partition.estimated_rows} событий")
@@ -1,14 +1,21 @@
 from __future__ import annotations
 
+import time
+
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 
+from auditlog.application.rollup_service import delete_counters_before, delete_rollups_before
+from auditlog.infrastructure import partitions
 from auditlog.models import AuditEvent
 
 
 class Command(BaseCommand):
-    help = "Удаляет события аудита старше N дней."
+    help = (
+        "Удаляет события аудита старше N дней: целыми партициями на PostgreSQL "
+        "после audit_partitions --convert, иначе пачками."
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -17,12 +24,66 @@ class Command(BaseCommand):
             default=int(getattr(settings, "AUDIT_RETENTION_DAYS", 180)),
             help="Период хранения в днях (по умолчанию из AUDIT_RETENTION_DAYS).",
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=int(getattr(settings, "AUDIT_RETENTION_BATCH_SIZE", 5000)),
+            help="Размер пачки построчного удаления (по умолчанию из AUDIT_RETENTION_BATCH_SIZE).",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Пауза между пачками в секундах, чтобы не нагружать БД.",
+        )
 
     def handle(self, *args, **options):
+        self.verbosity = int(options.get("verbosity", 1))
         days = int(options["days"])
         if days < 1:
             raise CommandError("--days должно быть >= 1")
+        batch_size = int(options["batch_size"])
+        if batch_size < 1:
+            raise CommandError("--batch-size должно быть >= 1")
 
         cutoff = timezone.now() - timezone.timedelta(days=days)
-        deleted, _details = AuditEvent.objects.filter(created_at__lt=cutoff).delete()
-        self.stdout.write(self.style.SUCCESS(f"Удалено {deleted} событий аудита старше {days} дней"))
+        dropped = 0
+        if partitions.is_partitioned():
+            dropped = self._drop_partitions(cutoff)
+        deleted = self._delete_in_batches(cutoff, batch_size=batch_size, pause=float(options["pause"]))
+        delete_rollups_before(cutoff)
+        delete_counters_before(cutoff)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Удалено {deleted} событий аудита старше {days} дней"
+                + (f", удалено партиций: {dropped}" if dropped else "")
+            )
+        )
+
+    def _drop_partitions(self, cutoff) -> int:
+        expired = partitions.expired_partitions(cutoff)
+        for partition in expired:
+            partitions.drop_partition(partition.name)
+            self._progress(f"Партиция {partition.name} удалена (~{partition.estimated_rows} событий)")
+        return len(expired)
+
+    def _delete_in_batches(self, cutoff, *, batch_size: int, pause: float) -> int:
+        """Remaining old rows (or all of them without partitions) in short transactions."""
+        stale = AuditEvent.objects.filter(created_at__lt=cutoff).order_by("created_at", "id")
+        total = 0
+        while True:
+            ids = list(stale.values_list("id", flat=True)[:batch_size])
+            if not ids:
+                return total
+            # AuditEvent has no dependents, so this is a single fast DELETE without the collector.
+            deleted, _details = AuditEvent.objects.filter(id__in=ids).delete()
+            total += deleted
+            self._progress(f"Удалено {total} событий…")
+            if len(ids) < batch_size:
+                return total
+            if pause > 0:
+                time.sleep(pause)
+
+    def _progress(self, message: str) -> None:
+        if self.verbosity >= 1:
+            self.stdout.write(message)
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from auditlog.application.rollup_service import compact_action_rollups, compacted_until
+
+
+class Command(BaseCommand):
+    help = "Собирает почасовые счётчики событий аудита по действиям для API /actions/."
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            hours = compact_action_rollups()
+            if not hours:
+                break
+            total += hours
+        watermark = compacted_until()
+        until = watermark.isoformat() if watermark else "—"
+        self.stdout.write(self.style.SUCCESS(f"Свёрнуто часов: {total}; счётчики готовы до {until}"))
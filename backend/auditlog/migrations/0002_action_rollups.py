@@ -0,0 +1,40 @@
+# Generated by Django 4.1.13 on 2026-10-17 00:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditlog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditActionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('action', models.CharField(max_length=128)),
+                ('protocol', models.CharField(blank=True, max_length=16, null=True)),
+                ('success', models.BooleanField(default=False)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AuditRollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('compacted_until', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='auditactionrollup',
+            index=models.Index(fields=['hour', 'action'], name='audit_rollup_hour_action_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='auditactionrollup',
+            constraint=models.UniqueConstraint(fields=('hour', 'action', 'protocol', 'success'), name='audit_rollup_bucket_uniq'),
+        ),
+    ]
@@ -0,0 +1,142 @@
+import logging
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import DatabaseError, migrations, models
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Substr
+
+logger = logging.getLogger("auditlog")
+
+PROMOTED_COLUMNS = {"room_slug": 128, "endpoint": 64, "reason": 64}
+BACKFILL_BATCH_SIZE = 10000
+
+# Expression indexes matching what Django emits for ``__icontains`` on PostgreSQL.
+TRIGRAM_INDEXES = {
+    "audit_evt_path_trgm_idx": "path",
+    "audit_evt_username_trgm_idx": "actor_username_snapshot",
+}
+
+
+def backfill_promoted_columns(apps, schema_editor):
+    AuditEvent = apps.get_model("auditlog", "AuditEvent")
+    manager = AuditEvent.objects.using(schema_editor.connection.alias)
+    last_id = manager.order_by("-id").values_list("id", flat=True).first()
+    if last_id is None:
+        return
+    values = {
+        column: Substr(KeyTextTransform(column, "metadata"), 1, max_length)
+        for column, max_length in PROMOTED_COLUMNS.items()
+    }
+    # Only rows that carry one of the keys are rewritten. Id ranges keep each
+    # UPDATE short; the migration is not atomic, so every batch commits.
+    carrying = manager.filter(metadata__has_any_keys=list(PROMOTED_COLUMNS))
+    for start in range(0, last_id + 1, BACKFILL_BATCH_SIZE):
+        carrying.filter(id__gte=start, id__lt=start + BACKFILL_BATCH_SIZE).update(**values)
+
+
+def _is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = %s",
+        [table],
+    )
+    return cursor.fetchone() is not None
+
+
+def _can_index_concurrently(schema_editor, model):
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        # Partitioned parents cannot be indexed concurrently.
+        return not _is_partitioned(cursor, model._meta.db_table)
+
+
+class AddIndexConcurrentlyIfSupported(AddIndexConcurrently):
+    """``CREATE INDEX CONCURRENTLY`` where PostgreSQL allows it, a plain index elsewhere."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if _can_index_concurrently(schema_editor, model):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if _can_index_concurrently(schema_editor, model):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+    table = apps.get_model("auditlog", "AuditEvent")._meta.db_table
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except DatabaseError as exc:
+            logger.warning("pg_trgm is unavailable, skipping audit trigram indexes: %s", exc)
+            return
+        # Partitioned parents cannot be indexed concurrently.
+        concurrently = "" if _is_partitioned(cursor, table) else "CONCURRENTLY "
+        for name, column in TRIGRAM_INDEXES.items():
+            cursor.execute(
+                f"CREATE INDEX {concurrently}IF NOT EXISTS {connection.ops.quote_name(name)} "
+                f"ON {connection.ops.quote_name(table)} "
+                f"USING gin (UPPER({connection.ops.quote_name(column)}::text) gin_trgm_ops)"
+            )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        for name in TRIGRAM_INDEXES:
+            cursor.execute(f"DROP INDEX IF EXISTS {connection.ops.quote_name(name)}")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('auditlog', '0002_action_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditevent',
+            name='endpoint',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='auditevent',
+            name='reason',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='auditevent',
+            name='room_slug',
+            field=models.CharField(blank=True, max_length=128, null=True),
+        ),
+        # Backfill before indexing so the rewrite does not maintain three
+        # extra indexes, then build them without blocking writes.
+        migrations.RunPython(backfill_promoted_columns, migrations.RunPython.noop),
+        AddIndexConcurrentlyIfSupported(
+            model_name='auditevent',
+            index=models.Index(fields=['room_slug', 'created_at'], name='audit_evt_room_created_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='auditevent',
+            index=models.Index(fields=['endpoint', 'created_at'], name='audit_evt_endpoint_created_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='auditevent',
+            index=models.Index(fields=['reason', 'created_at'], name='audit_evt_reason_created_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.1.13 on 2026-10-17 00:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditlog', '0003_promoted_metadata_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditActionCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minute', models.DateTimeField()),
+                ('action', models.CharField(max_length=128)),
+                ('protocol', models.CharField(blank=True, max_length=16, null=True)),
+                ('success', models.BooleanField(default=False)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='auditactioncounter',
+            index=models.Index(fields=['minute', 'action'], name='audit_counter_min_action_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='auditactioncounter',
+            constraint=models.UniqueConstraint(fields=('minute', 'action', 'protocol', 'success'), name='audit_counter_bucket_uniq'),
+        ),
+    ]
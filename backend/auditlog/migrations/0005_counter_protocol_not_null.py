@@ -0,0 +1,41 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:45
+
+from django.db import migrations, models
+from django.db.models import Q, Sum
+
+
+def merge_null_protocol_buckets(apps, schema_editor):
+    """Fold NULL-protocol rows into one "" bucket per (minute, action, success).
+
+    NULLs were distinct in the unique constraint, so concurrent flushes could
+    leave several rows for the same bucket.
+    """
+    AuditActionCounter = apps.get_model("auditlog", "AuditActionCounter")
+    blank = Q(protocol__isnull=True) | Q(protocol="")
+    keys = (
+        AuditActionCounter.objects.filter(protocol__isnull=True)
+        .values_list("minute", "action", "success")
+        .distinct()
+        .order_by()
+    )
+    for minute, action, success in list(keys):
+        rows = AuditActionCounter.objects.filter(blank, minute=minute, action=action, success=success)
+        total = rows.aggregate(total=Sum("count"))["total"] or 0
+        rows.delete()
+        AuditActionCounter.objects.create(minute=minute, action=action, protocol="", success=success, count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditlog', '0004_action_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_null_protocol_buckets, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='auditactioncounter',
+            name='protocol',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+    ]
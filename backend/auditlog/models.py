@@ -1,3 +1,3 @@
-from .infrastructure.models import AuditEvent
+from .infrastructure.models import AuditActionCounter, AuditActionRollup, AuditEvent, AuditRollupWatermark
 
-__all__ = ["AuditEvent"]
+__all__ = ["AuditActionCounter", "AuditActionRollup", "AuditEvent", "AuditRollupWatermark"]
@@ -1,14 +1,21 @@
+import gzip
 import json
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import AsyncClient, TestCase, override_settings
 from django.urls import reverse
 
+from auditlog.application.export_service import EXPORT_FIELDNAMES
 from auditlog.models import AuditEvent
 
 User = get_user_model()
 
 
+def _body(response) -> bytes:
+    return b"".join(response.streaming_content)
+
+
 class AuditAdminExportTests(TestCase):
     def setUp(self):
         self.admin_user = User.objects.create_user(
@@ -63,7 +70,7 @@ class AuditAdminExportTests(TestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertIn("application/json", response["Content-Type"])
-        payload = json.loads(response.content.decode("utf-8"))
+        payload = json.loads(_body(response).decode("utf-8"))
         self.assertEqual(len(payload), 1)
         self.assertEqual(payload[0]["action"], "auth.login.success")
         self.assertEqual(payload[0]["statusCode"], 200)
@@ -77,11 +84,61 @@ class AuditAdminExportTests(TestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertIn("text/csv", response["Content-Type"])
-        body = response.content.decode("utf-8")
+        body = _body(response).decode("utf-8")
         self.assertIn("chat.message.forbidden", body)
         self.assertNotIn("auth.login.success", body)
 
+    @override_settings(AUDIT_EXPORT_CHUNK_SIZE=1)
+    async def test_asgi_export_streams_pages_inside_the_event_loop(self):
+        client = AsyncClient()
+        await sync_to_async(client.force_login)(self.admin_user)
+        response = await client.get(self.export_url, {"format": "ndjson", "gzip": "1", "method": "POST"})
+
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        actions = [json.loads(line)["action"] for line in gzip.decompress(body).decode("utf-8").splitlines()]
+        self.assertEqual(actions, ["chat.message.forbidden", "auth.login.success"])
+
     def test_non_staff_cannot_export(self):
         self.client.force_login(self.member)
         response = self.client.get(self.export_url, {"format": "json"})
         self.assertIn(response.status_code, {302, 403})
+
+    @override_settings(AUDIT_EXPORT_CHUNK_SIZE=1)
+    def test_json_export_streams_across_keyset_pages(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.get(self.export_url, {"format": "json", "method": "POST"})
+
+        self.assertTrue(response.streaming)
+        body = _body(response).decode("utf-8")
+        payload = json.loads(body)
+        self.assertEqual(
+            [row["action"] for row in payload],
+            ["chat.message.forbidden", "auth.login.success"],
+        )
+        self.assertEqual(body, json.dumps(payload, ensure_ascii=False, indent=2))
+
+    def test_empty_csv_export_has_header_only(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.get(self.export_url, {"format": "csv", "action": "missing.action"})
+
+        self.assertEqual(_body(response).decode("utf-8").strip(), ",".join(EXPORT_FIELDNAMES))
+
+    @override_settings(AUDIT_EXPORT_CHUNK_SIZE=1)
+    def test_gzip_ndjson_export_can_resume_from_cursor(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.get(self.export_url, {"format": "ndjson", "gzip": "1", "method": "POST"})
+
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn('.ndjson.gz"', response["Content-Disposition"])
+        lines = [json.loads(line) for line in gzip.decompress(_body(response)).decode("utf-8").splitlines()]
+        self.assertEqual(len(lines), 2)
+
+        resumed = self.client.get(self.export_url, {"format": "ndjson", "method": "POST", "cursor": lines[0]["cursor"]})
+        resumed_lines = _body(resumed).decode("utf-8").splitlines()
+        self.assertEqual([json.loads(line)["id"] for line in resumed_lines], [lines[1]["id"]])
+
+    def test_unknown_format_is_rejected(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.get(self.export_url, {"format": "xml"})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import threading
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from auditlog.application import write_service
+from auditlog.infrastructure.batch_writer import AuditBatchWriter
+from auditlog.models import AuditEvent
+
+
+class AuditBatchWriterTests(SimpleTestCase):
+    def test_rows_are_written_in_batches_and_drained_on_close(self):
+        batches = []
+        writer = AuditBatchWriter(batch_size=3, flush_interval=5)
+        with patch(
+            "auditlog.infrastructure.batch_writer.AuditEventRepository.bulk_create",
+            side_effect=lambda rows: batches.append([row["action"] for row in rows]),
+        ):
+            for index in range(7):
+                self.assertTrue(writer.submit({"action": f"event.{index}"}))
+            writer.close()
+
+        self.assertEqual(sum(batches, []), [f"event.{index}" for index in range(7)])
+        self.assertTrue(all(len(batch) <= 3 for batch in batches))
+        self.assertEqual(len(batches[0]), 3)
+        self.assertFalse(writer._thread.is_alive())
+
+    def test_full_queue_drops_and_counts(self):
+        release = threading.Event()
+        writer = AuditBatchWriter(queue_size=1, batch_size=1, flush_interval=0, block_timeout=0.01)
+        dropped_before = writer.dropped.value
+        with patch(
+            "auditlog.infrastructure.batch_writer.AuditEventRepository.bulk_create",
+            side_effect=lambda rows: release.wait(5),
+        ):
+            results = [writer.submit({"action": "event"}, block=False) for _ in range(5)]
+            results.append(writer.submit({"action": "event"}))
+            release.set()
+            writer.close()
+
+        self.assertIn(False, results)
+        self.assertEqual(writer.dropped.value - dropped_before, results.count(False))
+
+    def test_failed_batch_is_retried_row_by_row(self):
+        created = []
+        writer = AuditBatchWriter(batch_size=10, flush_interval=0.5)
+        with patch(
+            "auditlog.infrastructure.batch_writer.AuditEventRepository.bulk_create",
+            side_effect=RuntimeError("boom"),
+        ), patch(
+            "auditlog.infrastructure.batch_writer.AuditEventRepository.create",
+            side_effect=lambda **row: created.append(row["action"]),
+        ), self.assertLogs("auditlog", level="WARNING"):
+            writer.submit({"action": "a"})
+            writer.submit({"action": "b"})
+            writer.close()
+
+        self.assertEqual(created, ["a", "b"])
+
+    def test_submit_after_close_is_dropped(self):
+        writer = AuditBatchWriter()
+        writer.close()
+        self.assertFalse(writer.submit({"action": "late"}))
+
+
+class AuditBatchWriterIntegrationTests(TransactionTestCase):
+    @override_settings(AUDIT_BATCH_WRITER=True)
+    def test_write_event_goes_through_the_queue(self):
+        writer = AuditBatchWriter(batch_size=10, flush_interval=0.01)
+        with patch("auditlog.application.write_service.get_audit_writer", return_value=writer), patch(
+            "auditlog.application.write_service.AuditEventRepository.create"
+        ) as direct_create:
+            write_service.audit_security_event("batched.event", reason="test")
+            writer.close()
+
+        direct_create.assert_not_called()
+        self.assertTrue(AuditEvent.objects.filter(action="batched.event").exists())
+
+    @override_settings(AUDIT_BATCH_WRITER=True)
+    def test_full_queue_drops_noise_but_inserts_security_events_directly(self):
+        release = threading.Event()
+        writer = AuditBatchWriter(queue_size=1, batch_size=1, flush_interval=0, block_timeout=0)
+        with patch("auditlog.application.write_service.get_audit_writer", return_value=writer), patch(
+            "auditlog.infrastructure.batch_writer.AuditEventRepository.bulk_create",
+            side_effect=lambda rows: release.wait(5),
+        ):
+            # One row blocks the flusher, the next fills the queue.
+            for _ in range(3):
+                writer.submit({"action": "filler"})
+            write_service.write_event("ws.message.sent", protocol="ws")
+            write_service.write_event("auth.login.failed", protocol="http", status_code=401)
+            write_service.write_event("ws.connect.denied", protocol="ws", reason="rate_limited")
+            write_service.write_event("auth.login.success", protocol="http", status_code=200)
+            release.set()
+            writer.close()
+
+        self.assertEqual(
+            set(AuditEvent.objects.values_list("action", flat=True)),
+            {"auth.login.failed", "ws.connect.denied", "auth.login.success"},
+        )
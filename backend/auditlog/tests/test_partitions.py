@@ -0,0 +1,94 @@
+from contextlib import nullcontext
+from datetime import date, datetime
+from datetime import timezone as dt_timezone
+from unittest.mock import MagicMock, patch
+
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError
+from django.test import SimpleTestCase
+
+from auditlog.infrastructure import partitions
+
+
+class AuditPartitionHelpersTests(SimpleTestCase):
+    def test_month_arithmetic_and_names(self):
+        self.assertEqual(partitions.add_months(date(2026, 11, 1), 2), date(2027, 1, 1))
+        self.assertEqual(partitions.add_months(date(2026, 1, 1), -1), date(2025, 12, 1))
+        self.assertEqual(partitions.partition_name(date(2026, 3, 1)), "auditlog_auditevent_p202603")
+
+    def test_parse_upper_bound(self):
+        self.assertEqual(
+            partitions.parse_upper_bound("FOR VALUES FROM ('2026-10-01 00:00:00+00') TO ('2026-11-01 00:00:00+00')"),
+            datetime(2026, 11, 1, tzinfo=dt_timezone.utc),
+        )
+        self.assertEqual(
+            partitions.parse_upper_bound("FOR VALUES FROM (MINVALUE) TO ('2026-11-01 00:00:00')"),
+            datetime(2026, 11, 1, tzinfo=dt_timezone.utc),
+        )
+        self.assertIsNone(partitions.parse_upper_bound("DEFAULT"))
+
+    def test_parent_index_sql_targets_partitioned_table(self):
+        sql = partitions._parent_index_sql(
+            "CREATE INDEX auditlog_auditevent_action_1a2b ON public.auditlog_auditevent_legacy USING btree (action)",
+            "auditlog_auditevent_action_1a2b",
+        )
+        self.assertEqual(sql, 'CREATE INDEX "auditlog_auditevent_action_1a2b" ON "auditlog_auditevent" USING btree (action)')
+
+    def test_sqlite_is_not_partitioned(self):
+        self.assertFalse(partitions.is_partitioned())
+        with self.assertRaises(CommandError):
+            call_command("audit_partitions", "--convert")
+
+
+class EnsureMonthlyPartitionsTests(SimpleTestCase):
+    def setUp(self):
+        self.cursor = MagicMock()
+        connection = MagicMock()
+        connection.cursor.return_value.__enter__.return_value = self.cursor
+        connection.ops.quote_name = lambda name: f'"{name}"'
+        existing = [
+            partitions.AuditPartition(partitions.DEFAULT_PARTITION, None, 10),
+            partitions.AuditPartition(
+                partitions.LEGACY_PARTITION, datetime(2026, 11, 1, tzinfo=dt_timezone.utc), 100
+            ),
+        ]
+        for patcher in (
+            patch.object(partitions, "connection", connection),
+            patch.object(partitions.transaction, "atomic", nullcontext),
+            patch.object(partitions, "list_partitions", return_value=existing),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _statements(self):
+        return [" ".join(call.args[0].split()) for call in self.cursor.execute.call_args_list]
+
+    def test_rows_caught_by_default_partition_are_moved_into_the_new_month(self):
+        # Ноябрь уже лежит в DEFAULT, декабря там нет.
+        self.cursor.fetchone.side_effect = [(True,), (False,)]
+
+        created = partitions.ensure_monthly_partitions(months_ahead=2, today=date(2026, 10, 17))
+
+        self.assertEqual(created, ["auditlog_auditevent_p202611", "auditlog_auditevent_p202612"])
+        statements = self._statements()
+        self.assertTrue(statements[0].startswith('SELECT EXISTS (SELECT 1 FROM "auditlog_auditevent_default"'))
+        self.assertEqual(
+            statements[1], 'ALTER TABLE "auditlog_auditevent" DETACH PARTITION "auditlog_auditevent_default"'
+        )
+        self.assertTrue(statements[2].startswith('CREATE TABLE IF NOT EXISTS "auditlog_auditevent_p202611"'))
+        self.assertIn('DELETE FROM "auditlog_auditevent_default"', statements[3])
+        self.assertIn('INSERT INTO "auditlog_auditevent_p202611" SELECT * FROM moved', statements[3])
+        self.assertEqual(
+            statements[4], 'ALTER TABLE "auditlog_auditevent" ATTACH PARTITION "auditlog_auditevent_default" DEFAULT'
+        )
+        self.assertTrue(statements[6].startswith('CREATE TABLE IF NOT EXISTS "auditlog_auditevent_p202612"'))
+        self.assertEqual(len(statements), 7)
+        self.assertEqual(self.cursor.execute.call_args_list[3].args[1], ["2026-11-01", "2026-12-01"])
+
+    def test_command_reports_database_errors(self):
+        self.cursor.execute.side_effect = DatabaseError("updated partition constraint would be violated")
+        with patch.object(partitions, "partitioning_supported", return_value=True), patch.object(
+            partitions, "is_partitioned", return_value=True
+        ):
+            with self.assertRaisesMessage(CommandError, "updated partition constraint would be violated"):
+                call_command("audit_partitions", "--months-ahead", "12")
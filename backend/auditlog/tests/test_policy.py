@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from unittest.mock import Mock, patch
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from auditlog.application import query_service, write_service
+from auditlog.domain.context import AuditQueryFilters
+from auditlog.domain.policy import (
+    AGGREGATE,
+    ALWAYS_PERSIST,
+    DEFAULT_POLICY_RULES,
+    LOG,
+    SAMPLE,
+    AuditPolicy,
+    AuditPolicyEngine,
+    parse_policy,
+    parse_rule,
+)
+from auditlog.infrastructure.counters import AuditCounterAggregator
+from auditlog.infrastructure.repository import AuditActionCounterRepository
+from auditlog.models import AuditActionCounter, AuditEvent
+
+
+class AuditPolicyEngineTests(SimpleTestCase):
+    def test_parse_rules_and_policies(self):
+        self.assertEqual(parse_policy("log"), AuditPolicy(mode=LOG))
+        self.assertEqual(parse_policy(" Sample:0.25 "), AuditPolicy(mode=SAMPLE, sample_rate=0.25))
+        self.assertEqual(parse_rule("ws.message.*=aggregate"), ("ws.message.*", AuditPolicy(mode=AGGREGATE)))
+        for invalid in ("drop", "sample", "sample:0", "sample:1.5", "log:0.5"):
+            with self.assertRaises(ValueError, msg=invalid):
+                parse_policy(invalid)
+        for invalid in ("ws.message.sent", "=log"):
+            with self.assertRaises(ValueError, msg=invalid):
+                parse_rule(invalid)
+
+    def test_default_rules(self):
+        engine = AuditPolicyEngine(DEFAULT_POLICY_RULES)
+        self.assertEqual(engine.resolve("ws.message.sent", success=True).mode, AGGREGATE)
+        self.assertEqual(engine.resolve("ws.connect.accepted", success=True).mode, SAMPLE)
+        self.assertEqual(engine.resolve("ws.direct_inbox.mark_read.success", success=True).mode, LOG)
+        self.assertIs(engine.resolve("ws.connect.denied", success=False), ALWAYS_PERSIST)
+        self.assertIs(engine.resolve("http.request", success=True), ALWAYS_PERSIST)
+
+    def test_failures_and_security_actions_are_always_persisted(self):
+        engine = AuditPolicyEngine(["*=log"])
+        self.assertEqual(engine.resolve("ws.message.sent", success=True).mode, LOG)
+        self.assertIs(engine.resolve("ws.message.sent", success=False), ALWAYS_PERSIST)
+        self.assertIs(engine.resolve("auth.login.success", success=True), ALWAYS_PERSIST)
+        self.assertIs(engine.resolve("user.username.changed", success=True), ALWAYS_PERSIST)
+
+    def test_first_matching_rule_wins(self):
+        engine = AuditPolicyEngine(["ws.message.sent=persist", "ws.message.*=log"])
+        self.assertEqual(engine.resolve("ws.message.sent", success=True), ALWAYS_PERSIST)
+        self.assertEqual(engine.resolve("ws.message.edited", success=True).mode, LOG)
+
+
+@override_settings(AUDIT_POLICY=True, AUDIT_POLICY_RULES=[])
+class AuditPolicyWriteTests(TestCase):
+    def setUp(self):
+        self.aggregator = Mock()
+        patcher = patch("auditlog.application.write_service.get_counter_aggregator", return_value=self.aggregator)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_aggregated_event_skips_sanitizing_logging_and_insert(self):
+        with patch("auditlog.application.write_service._safe_metadata") as safe_metadata, patch(
+            "auditlog.application.write_service._audit_logger.info"
+        ) as logger_mock:
+            write_service.write_event("ws.message.sent", protocol="ws", room_slug="public", message_length=5)
+
+        self.aggregator.add.assert_called_once_with("ws.message.sent", "ws", True)
+        safe_metadata.assert_not_called()
+        logger_mock.assert_not_called()
+        self.assertFalse(AuditEvent.objects.filter(action="ws.message.sent").exists())
+
+    def test_sampled_events_are_stored_or_counted(self):
+        with patch("auditlog.application.write_service.random.random", return_value=0.05):
+            write_service.write_event("ws.connect.accepted", protocol="ws", endpoint="chat")
+        with patch("auditlog.application.write_service.random.random", return_value=0.5):
+            write_service.write_event("ws.connect.accepted", protocol="ws", endpoint="chat")
+
+        stored = AuditEvent.objects.get(action="ws.connect.accepted")
+        self.assertEqual(stored.metadata["sample_rate"], 0.1)
+        self.aggregator.add.assert_called_once_with("ws.connect.accepted", "ws", True)
+
+    def test_log_only_and_failed_events(self):
+        with patch("auditlog.application.write_service._audit_logger.info") as logger_mock:
+            write_service.write_event("ws.direct_inbox.mark_read.success", protocol="ws")
+            write_service.write_event("ws.message.sent", protocol="ws", success=False)
+
+        self.assertEqual(logger_mock.call_count, 2)
+        self.assertFalse(AuditEvent.objects.filter(action="ws.direct_inbox.mark_read.success").exists())
+        self.assertTrue(AuditEvent.objects.filter(action="ws.message.sent", success=False).exists())
+        self.aggregator.add.assert_not_called()
+
+    @override_settings(AUDIT_POLICY_RULES=["ws.message.sent=persist"])
+    def test_extra_rules_take_precedence(self):
+        write_service.write_event("ws.message.sent", protocol="ws")
+        self.assertTrue(AuditEvent.objects.filter(action="ws.message.sent").exists())
+        self.aggregator.add.assert_not_called()
+
+    @override_settings(AUDIT_POLICY_RULES=["ws.message.sent=drop"])
+    def test_invalid_rule_is_reported(self):
+        with self.assertRaises(ImproperlyConfigured):
+            write_service.write_event("ws.message.sent", protocol="ws")
+
+    @override_settings(AUDIT_POLICY=False)
+    def test_disabled_policy_persists_everything(self):
+        write_service.write_event("ws.message.sent", protocol="ws")
+        self.assertTrue(AuditEvent.objects.filter(action="ws.message.sent").exists())
+        self.aggregator.add.assert_not_called()
+
+
+class AuditCounterAggregatorTests(TestCase):
+    def setUp(self):
+        patcher = patch.object(AuditCounterAggregator, "_ensure_running")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_flush_adds_counts_per_minute_bucket(self):
+        aggregator = AuditCounterAggregator()
+        minute = datetime(2026, 10, 17, 12, 0, tzinfo=dt_timezone.utc)
+        for _ in range(3):
+            aggregator.add("ws.message.sent", "ws", True, now=minute.timestamp() + 5)
+        aggregator.add("ws.message.sent", "ws", True, now=minute.timestamp() + 65)
+        self.assertEqual(aggregator.flush(), 2)
+        aggregator.add("ws.message.sent", "ws", True, now=minute.timestamp() + 30)
+        self.assertEqual(aggregator.flush(), 1)
+        self.assertEqual(aggregator.flush(), 0)
+
+        counts = dict(AuditActionCounter.objects.values_list("minute", "count"))
+        self.assertEqual(counts, {minute: 4, minute + timedelta(minutes=1): 1})
+
+    def test_missing_protocol_shares_one_bucket(self):
+        minute = datetime(2026, 10, 17, 12, 0, tzinfo=dt_timezone.utc)
+        aggregator = AuditCounterAggregator()
+        aggregator.add("auth.login.success", None, True, now=minute.timestamp())
+        aggregator.add("auth.login.success", "", True, now=minute.timestamp() + 1)
+        self.assertEqual(aggregator.flush(), 1)
+        AuditActionCounterRepository.increment(
+            minute=minute, action="auth.login.success", protocol=None, success=True, count=3
+        )
+
+        self.assertEqual(
+            list(AuditActionCounter.objects.values_list("protocol", "count")),
+            [("", 5)],
+        )
+
+    def test_counters_are_included_in_action_counts(self):
+        now = timezone.now()
+        AuditEvent.objects.create(action="ws.message.sent", protocol="ws", success=True)
+        AuditActionCounter.objects.create(
+            minute=now - timedelta(minutes=1), action="ws.message.sent", protocol="ws", success=True, count=41
+        )
+        AuditActionCounter.objects.create(
+            minute=now - timedelta(days=2), action="ws.disconnect", protocol="ws", success=True, count=7
+        )
+
+        counts = query_service.list_action_counts(AuditQueryFilters(protocol="ws"))
+        self.assertEqual(counts, [{"action": "ws.message.sent", "count": 42}, {"action": "ws.disconnect", "count": 7}])
+
+        recent = query_service.list_action_counts(AuditQueryFilters(date_from=now - timedelta(hours=1)))
+        self.assertEqual(recent, [{"action": "ws.message.sent", "count": 42}])
+
+        by_actor = query_service.list_action_counts(AuditQueryFilters(actor_username="alice"))
+        self.assertEqual(by_actor, [])
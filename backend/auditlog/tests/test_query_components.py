@@ -55,6 +55,7 @@ class AuditQueryComponentsTests(TestCase):
             actor_user_id_snapshot=1,
             actor_username_snapshot="alice",
             metadata={"room_slug": "abc"},
+            room_slug="abc",
         )
         self.second = AuditEvent.objects.create(
             action="room.write",
@@ -67,6 +68,7 @@ class AuditQueryComponentsTests(TestCase):
             actor_user_id_snapshot=2,
             actor_username_snapshot="bob",
             metadata={"room_slug": "xyz"},
+            room_slug="xyz",
         )
         AuditEvent.objects.filter(pk=self.first.pk).update(created_at=now - timedelta(minutes=2))
         AuditEvent.objects.filter(pk=self.second.pk).update(created_at=now - timedelta(minutes=1))
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from auditlog.application import query_service
+from auditlog.application.rollup_service import action_counts_from_rollups, compact_action_rollups
+from auditlog.domain.context import AuditQueryFilters
+from auditlog.models import AuditActionRollup, AuditEvent
+
+BASE = datetime(2026, 5, 1, 10, 0, tzinfo=dt_timezone.utc)
+
+
+@override_settings(AUDIT_ACTION_ROLLUPS=True)
+class AuditActionRollupTests(TestCase):
+    def _event(self, action, at, *, protocol="http", success=True, **fields):
+        event = AuditEvent.objects.create(action=action, protocol=protocol, success=success, **fields)
+        AuditEvent.objects.filter(pk=event.pk).update(created_at=at)
+        return event
+
+    def setUp(self):
+        self._event("auth.login.success", BASE + timedelta(minutes=5))
+        self._event("auth.login.success", BASE + timedelta(minutes=50))
+        self._event("auth.login.failed", BASE + timedelta(hours=1, minutes=10), success=False)
+        self._event("ws.connect.accepted", BASE + timedelta(hours=1, minutes=20), protocol="ws")
+        self._event("auth.login.success", BASE + timedelta(hours=3, minutes=1))
+
+    def _raw_counts(self, filters):
+        with override_settings(AUDIT_ACTION_ROLLUPS=False):
+            return query_service.list_action_counts(filters)
+
+    def test_compaction_builds_hourly_buckets(self):
+        hours = compact_action_rollups(until=BASE + timedelta(hours=2))
+
+        self.assertEqual(hours, 2)
+        buckets = {
+            (row.hour, row.action, row.protocol, row.success): row.count
+            for row in AuditActionRollup.objects.all()
+        }
+        self.assertEqual(
+            buckets,
+            {
+                (BASE, "auth.login.success", "http", True): 2,
+                (BASE + timedelta(hours=1), "auth.login.failed", "http", False): 1,
+                (BASE + timedelta(hours=1), "ws.connect.accepted", "ws", True): 1,
+            },
+        )
+
+    def test_rollups_match_raw_counts_for_time_windows(self):
+        compact_action_rollups(until=BASE + timedelta(hours=2))
+        windows = [
+            AuditQueryFilters(),
+            AuditQueryFilters(protocol="http"),
+            AuditQueryFilters(success=False),
+            AuditQueryFilters(date_from=BASE + timedelta(minutes=30)),
+            AuditQueryFilters(date_from=BASE, date_to=BASE + timedelta(hours=1, minutes=15)),
+        ]
+        for filters in windows:
+            with self.subTest(filters=filters):
+                self.assertIsNotNone(action_counts_from_rollups(filters))
+                self.assertEqual(query_service.list_action_counts(filters), self._raw_counts(filters))
+
+    def test_rollups_are_used_for_whole_hours(self):
+        compact_action_rollups(until=BASE + timedelta(hours=2))
+        with patch("auditlog.application.query_service.apply_filters") as raw_path:
+            counts = query_service.list_action_counts(AuditQueryFilters())
+
+        raw_path.assert_not_called()
+        self.assertEqual(
+            counts,
+            [
+                {"action": "auth.login.success", "count": 3},
+                {"action": "auth.login.failed", "count": 1},
+                {"action": "ws.connect.accepted", "count": 1},
+            ],
+        )
+
+    def test_ad_hoc_filters_fall_back_to_raw_table(self):
+        compact_action_rollups(until=BASE + timedelta(hours=2))
+        self.assertIsNone(action_counts_from_rollups(AuditQueryFilters(ip="203.0.113.1")))
+        self.assertIsNone(action_counts_from_rollups(AuditQueryFilters(actor_user_id=1)))
+
+    def test_compaction_is_idempotent_and_command_catches_up(self):
+        compact_action_rollups(until=BASE + timedelta(hours=1))
+        stdout = StringIO()
+        with patch("auditlog.application.rollup_service.timezone.now", return_value=BASE + timedelta(hours=5)):
+            call_command("compact_audit_rollups", stdout=stdout)
+
+        # The lag keeps the 14:00 hour open until 15:05.
+        self.assertIn("Свёрнуто часов: 3", stdout.getvalue())
+        self.assertEqual(compact_action_rollups(until=BASE + timedelta(hours=4)), 0)
+        self.assertEqual(
+            sum(AuditActionRollup.objects.values_list("count", flat=True)),
+            AuditEvent.objects.count(),
+        )
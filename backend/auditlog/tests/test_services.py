@@ -1,4 +1,5 @@
 from datetime import timedelta
+from io import StringIO
 
 from django.contrib.auth import get_user_model
 from django.core.management import call_command
@@ -49,3 +50,21 @@ class AuditSignalsAndCleanupTests(TestCase):
         self.assertFalse(AuditEvent.objects.filter(id=old_event.pk).exists())
         self.assertTrue(AuditEvent.objects.filter(id=fresh_event.pk).exists())
 
+
+    def test_cleanup_command_deletes_in_batches_with_progress(self):
+        events = [
+            AuditEvent.objects.create(action="http.request", protocol="http", success=True, metadata={})
+            for _ in range(5)
+        ]
+        AuditEvent.objects.filter(id__in=[event.pk for event in events[:4]]).update(
+            created_at=timezone.now() - timedelta(days=365)
+        )
+        stdout = StringIO()
+
+        call_command("cleanup_audit_events", days=180, batch_size=3, stdout=stdout)
+
+        remaining = AuditEvent.objects.filter(id__in=[event.pk for event in events])
+        self.assertEqual(list(remaining.values_list("id", flat=True)), [events[4].pk])
+        output = stdout.getvalue()
+        self.assertIn("Удалено 3 событий", output)
+        self.assertIn("Удалено 4 событий аудита старше 180 дней", output)
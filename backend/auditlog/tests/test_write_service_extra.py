@@ -2,16 +2,19 @@
 
 from __future__ import annotations
 
+from importlib import import_module
 from types import SimpleNamespace
 from unittest.mock import Mock, patch
 
+from django.apps import apps
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
-from django.db import OperationalError
+from django.db import OperationalError, connection
 from django.test import RequestFactory, TestCase
 from django.urls import ResolverMatch
 
 from auditlog.application import write_service
+from auditlog.models import AuditEvent
 
 User = get_user_model()
 
@@ -105,6 +108,58 @@ class AuditWriteServiceExtraTests(TestCase):
         self.assertEqual(persisted_payload["actor_user_id_snapshot"], 12)
         self.assertEqual(persisted_payload["actor_username_snapshot"], "actor")
 
+    def test_write_event_promotes_hot_metadata_keys_to_columns(self):
+        write_service.write_event(
+            "ws.connect.denied",
+            protocol="ws",
+            endpoint="chat",
+            reason="r" * 100,
+            room_slug="public",
+            code=4403,
+        )
+        write_service.write_event("custom.event", metadata={"room_slug": ""})
+
+        denied = AuditEvent.objects.get(action="ws.connect.denied")
+        self.assertEqual(denied.room_slug, "public")
+        self.assertEqual(denied.endpoint, "chat")
+        self.assertEqual(denied.reason, "r" * 64)
+        self.assertEqual(denied.metadata["reason"], "r" * 100)
+        custom = AuditEvent.objects.get(action="custom.event")
+        self.assertIsNone(custom.room_slug)
+        self.assertIsNone(custom.endpoint)
+
+    def test_migration_backfills_promoted_columns_from_metadata(self):
+        migration = import_module("auditlog.migrations.0003_promoted_metadata_columns")
+        event = AuditEvent.objects.create(
+            action="ws.message.rejected",
+            metadata={"endpoint": "chat", "reason": "invalid_json", "room_slug": "s" * 200},
+        )
+        untouched = AuditEvent.objects.create(action="custom.event", metadata={"extra": "value"})
+
+        migration.backfill_promoted_columns(apps, SimpleNamespace(connection=connection))
+
+        event.refresh_from_db()
+        untouched.refresh_from_db()
+        self.assertEqual(event.endpoint, "chat")
+        self.assertEqual(event.reason, "invalid_json")
+        self.assertEqual(event.room_slug, "s" * 128)
+        self.assertIsNone(untouched.room_slug)
+        self.assertIsNone(untouched.reason)
+
+    def test_migration_backfills_before_building_indexes_concurrently(self):
+        migration = import_module("auditlog.migrations.0003_promoted_metadata_columns")
+        operations = migration.Migration.operations
+        backfill = next(
+            i for i, op in enumerate(operations) if getattr(op, "code", None) is migration.backfill_promoted_columns
+        )
+        index_positions = [
+            i for i, op in enumerate(operations) if isinstance(op, migration.AddIndexConcurrentlyIfSupported)
+        ]
+        self.assertFalse(migration.Migration.atomic)
+        self.assertEqual(len(index_positions), 3)
+        self.assertLess(backfill, min(index_positions))
+        self.assertFalse(migration._can_index_concurrently(SimpleNamespace(connection=connection), AuditEvent))
+
     def test_audit_http_and_ws_helpers_forward_to_write_event(self):
         request = self.factory.get("/api/test/?a=1")
         request.user = AnonymousUser()
@@ -20,6 +20,8 @@ from rest_framework.response import Response
 from messages.models import Message, MessageAttachment, MessageReadState
 from messages.serializers import MessageSerializer
 from roles.access import ensure_can_read_or_404, has_permission
+from roles.infrastructure.membership_sync import current_seq as current_sync_seq
+from roles.infrastructure.membership_sync import is_stale as sync_cursor_is_stale
 from roles.models import Membership
 from roles.permissions import Perm
 from rooms.models import Room
@@ -31,9 +33,14 @@ from .services import (
     MessageValidationError,
     add_reaction,
     delete_message,
+    direct_chat_memberships,
+    direct_chat_removals,
+    direct_peers,
     edit_message,
     get_unread_counts,
     mark_read as service_mark_read,
+    my_reaction_emojis,
+    record_new_messages,
     remove_reaction,
 )
 from rooms.services import (
@@ -49,6 +56,9 @@ from rooms.services import (
 from users.identity import get_user_by_public_username, normalize_public_username, user_public_username
 
 from .constants import PUBLIC_ROOM_NAME, PUBLIC_ROOM_SLUG
+from . import history_cache
+from .cursor import decode_cursor, decode_sync_cursor, encode_cursor, encode_sync_cursor
+from .frames import framed_event
 from chat_app_django.media_utils import build_profile_url_from_request, serialize_avatar_crop
 
 User = get_user_model()
@@ -301,57 +311,84 @@ direct_start = DirectStartApiView.as_view()
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def direct_chats(request):
-    membership_qs = (
-        Membership.objects.filter(
-            user=request.user,
-            room__kind=Room.Kind.DIRECT,
-            is_banned=False,
-        )
-        .select_related("room")
-        .order_by("-joined_at")
-    )
+    limit = None
+    limit_raw = request.query_params.get("limit")
+    if limit_raw is not None:
+        try:
+            limit = _parse_positive_int(limit_raw, "limit")
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=http_status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, max(1, int(getattr(settings, "CHAT_DIRECT_CHATS_MAX_PAGE_SIZE", 200))))
 
-    seen_room_ids: set[int] = set()
-    items = []
-    for membership in membership_qs:
-        room = membership.room
-        room_pk = getattr(room, "pk", None)
-        if room_pk is None:
-            continue
-        if room_pk in seen_room_ids:
+    cursors = {}
+    for param, decode in (("cursor", decode_cursor), ("since", decode_sync_cursor)):
+        raw = request.query_params.get(param)
+        if not raw:
             continue
-        seen_room_ids.add(room_pk)
+        cursors[param] = decode(raw)
+        if cursors[param] is None:
+            return Response(
+                {"error": f"Некорректный параметр '{param}'"},
+                status=http_status.HTTP_400_BAD_REQUEST,
+            )
+    before = cursors.get("cursor")
+    since = cursors.get("since")
+    if since is not None and sync_cursor_is_stale(request.user.pk, since):
+        return Response(
+            {"error": "Курсор синхронизации устарел, загрузите список заново"},
+            status=http_status.HTTP_410_GONE,
+        )
 
-        pair = parse_pair_key_users(room.direct_pair_key)
-        if not pair or request.user.pk not in pair:
-            continue
+    paginated = limit is not None or since is not None
+    # Read before the listing: every change numbered up to this value has
+    # already committed, so the listing below cannot miss it.
+    sync_seq = current_sync_seq(request.user.pk) if paginated and before is None else None
 
-        last_message = Message.objects.filter(room=room).order_by("-date_added", "-id").first()
+    memberships = direct_chat_memberships(
+        request.user,
+        before=before,
+        since=since,
+        limit=limit + 1 if limit is not None else None,
+    )
+    has_more = limit is not None and len(memberships) > limit
+    if has_more:
+        memberships = memberships[:limit]
 
-        peer = direct_peer_for_user(room, request.user)
+    rooms = [
+        membership.room
+        for membership in memberships
+        if request.user.pk in (parse_pair_key_users(membership.room.direct_pair_key) or ())
+    ]
+    peers = direct_peers(request.user, [room.pk for room in rooms])
+
+    items = []
+    for room in rooms:
+        peer = peers.get(room.pk)
         if not peer:
             continue
-
-        sort_key = (
-            last_message.date_added.timestamp()
-            if last_message is not None
-            else membership.joined_at.timestamp()
-        )
+        last_message = room.last_message
         items.append(
             {
                 "slug": room.slug,
                 "peer": _serialize_peer(request, peer),
                 "lastMessage": last_message.message_content if last_message else "",
                 "lastMessageAt": last_message.date_added.isoformat() if last_message else None,
-                "sortKey": sort_key,
             }
         )
 
-    items.sort(key=lambda item: item["sortKey"], reverse=True)
-    for item in items:
-        item.pop("sortKey", None)
-
-    return Response({"items": items})
+    payload = {"items": items}
+    if since is not None:
+        payload["removed"] = direct_chat_removals(request.user, since=since) if before is None else []
+    if paginated:
+        last_room = memberships[-1].room if has_more else None
+        payload["pagination"] = {
+            "limit": limit,
+            "hasMore": has_more,
+            "nextCursor": encode_cursor(last_room.last_activity_at, last_room.pk) if last_room else None,
+            # Only the first page reports it; later pages keep the first value.
+            "syncCursor": encode_sync_cursor(sync_seq) if sync_seq is not None else None,
+        }
+    return Response(payload)
 
 
 @api_view(["GET"])
@@ -447,11 +484,26 @@ def room_messages(request, room_slug):
             except ValueError as exc:
                 return Response({"error": str(exc)}, status=http_status.HTTP_400_BAD_REQUEST)
 
-        messages_qs = (
-            Message.objects.filter(room=room)
-            .select_related("user", "user__profile", "reply_to", "reply_to__user")
-            .prefetch_related("attachments", "reactions")
-        )
+        if before_id is None and history_cache.history_cache_ttl() and limit <= history_cache.history_cache_size():
+            page = history_cache.get_page(room.pk) or history_cache.fill_page(room.pk)
+            entries = page["messages"][-limit:]
+            has_more = bool(page["has_more"]) or len(page["messages"]) > limit
+            return Response(
+                {
+                    "messages": history_cache.render_messages(
+                        entries,
+                        build_media_url=lambda name: _build_profile_pic_url(request, name),
+                        my_reactions=my_reaction_emojis(request.user, [entry["id"] for entry in entries]),
+                    ),
+                    "pagination": {
+                        "limit": limit,
+                        "hasMore": has_more,
+                        "nextBefore": entries[0]["id"] if has_more and entries else None,
+                    },
+                }
+            )
+
+        messages_qs = history_cache.history_queryset().filter(room=room)
         if before_id is not None:
             messages_qs = messages_qs.filter(id__lt=before_id)
 
@@ -470,6 +522,7 @@ def room_messages(request, room_slug):
                 "request": request,
                 "build_profile_pic_url": lambda pic: _build_profile_pic_url(request, pic),
                 "serialize_avatar_crop": serialize_avatar_crop,
+                "my_reactions": my_reaction_emojis(request.user, [msg.pk for msg in batch]),
             },
         )
 
@@ -505,7 +558,7 @@ def _broadcast_to_room(room: Room, event: dict):
         return
     room_identifier = room.pk if getattr(room, "pk", None) else room.slug
     group_name = f"chat_room_{room_identifier}"
-    async_to_sync(channel_layer.group_send)(group_name, event)
+    async_to_sync(channel_layer.group_send)(group_name, framed_event(event))
 
 
 def _ensure_room_read_access(request, room: Room):
@@ -854,7 +907,10 @@ def upload_attachments(request, room_slug):
     if reply_to_id:
         message_kwargs["reply_to_id"] = reply_to_id
 
-    msg = Message.objects.create(**message_kwargs)
+    with transaction.atomic():
+        msg = Message.objects.create(**message_kwargs)
+        # Appended to the history cache below, once the attachments exist.
+        record_new_messages([msg], append_to_history=False)
 
     from messages.thumbnail import generate_thumbnail
 
@@ -879,6 +935,7 @@ def upload_attachments(request, room_slug):
 
         attachments_data.append(_serialize_attachment_item(request, attachment))
 
+    history_cache.append_messages([msg])
     profile_url = _build_profile_pic_url(request, image) if image else None
     _broadcast_to_room(room, {
         "type": "chat_message",
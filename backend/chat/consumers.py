@@ -1,32 +1,38 @@
 """WebSocket consumer for chat rooms."""
 
-import asyncio
 import json
 import time
+from dataclasses import dataclass
 
-from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.conf import settings
-from django.core.exceptions import ObjectDoesNotExist
 from django.db import IntegrityError, OperationalError, ProgrammingError
 
+from chat_app_django.db_executor import db_to_async
 from chat_app_django.ip_utils import get_client_ip_from_scope
 from chat_app_django.media_utils import build_profile_url, serialize_avatar_crop
+from chat_app_django.metrics import histogram
 from chat_app_django.security.audit import audit_ws_event
-from chat_app_django.security.rate_limit import DbRateLimiter, RateLimitPolicy
+from chat_app_django.security.rate_limit import RateLimitPolicy, is_rate_limited
+from chat_app_django.timer_wheel import get_timer_wheel
 
 from direct_inbox.state import (
     mark_read,
     mark_unread,
     user_group_name,
 )
-from messages.models import Message
+from friends.application.friend_service import is_blocked_between_ids
 from roles.access import can_read, can_write
 from roles.models import Membership
 from rooms.models import Room
+from rooms.services import parse_pair_key_users
 from users.identity import user_public_username
 
+from . import frames
 from .constants import CHAT_CLOSE_IDLE_CODE, PUBLIC_ROOM_NAME, PUBLIC_ROOM_SLUG
+from .message_writer import get_message_writer, write_behind_enabled
+from .sender import SenderSnapshot, load_sender_snapshot, profile_group_name
+from .services import MessageDraft, persist_messages
 from .utils import is_valid_room_slug as _is_valid_room_slug
 
 
@@ -37,7 +43,21 @@ def _ws_connect_rate_limited(scope, endpoint: str) -> bool:
     ip = get_client_ip_from_scope(scope) or "unknown"
     scope_key = f"rl:ws:connect:{endpoint}:{ip}"
     policy = RateLimitPolicy(limit=limit, window_seconds=window)
-    return DbRateLimiter.is_limited(scope_key=scope_key, policy=policy)
+    return is_rate_limited(scope_key=scope_key, policy=policy)
+
+
+CONNECT_LATENCY = histogram("chat.ws.connect")
+
+
+@dataclass
+class ConnectBundle:
+    """Connect-time state of a chat socket, resolved in one thread hop."""
+
+    room: Room | None = None
+    denied: tuple[str, int] | None = None
+    sender: SenderSnapshot | None = None
+    actor_username: str = ""
+    direct_peer_id: int | None = None
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
@@ -47,6 +67,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
     direct_inbox_unread_ttl = int(getattr(settings, "DIRECT_INBOX_UNREAD_TTL", 30 * 24 * 60 * 60))
 
     async def connect(self):
+        with CONNECT_LATENCY.time():
+            await self._connect()
+
+    async def _connect(self):
         user = self.scope.get("user")
         if user is None:
             audit_ws_event("ws.connect.denied", self.scope, endpoint="chat", reason="missing_user", code=4401)
@@ -65,54 +89,49 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.close(code=4404)
             return
 
-        if await sync_to_async(_ws_connect_rate_limited)(self.scope, "chat"):
-            audit_ws_event("ws.connect.denied", self.scope, endpoint="chat", reason="rate_limited", code=4429)
-            await self.close(code=4429)
-            return
-
-        if room_slug != PUBLIC_ROOM_SLUG and not _is_valid_room_slug(room_slug):
-            audit_ws_event("ws.connect.denied", self.scope, endpoint="chat", reason="invalid_slug", code=4404, room_slug=room_slug)
-            await self.close(code=4404)
-            return
-
-        room = await self._load_room(room_slug)
-        if not room:
-            audit_ws_event("ws.connect.denied", self.scope, endpoint="chat", reason="room_not_found", code=4404, room_slug=room_slug)
-            await self.close(code=4404)
-            return
-
-        if not await self._can_read(room, user):
-            audit_ws_event("ws.connect.denied", self.scope, endpoint="chat", reason="forbidden", code=4403, room_slug=room_slug)
-            await self.close(code=4403)
+        bundle = await self._connect_bundle(room_slug, user)
+        if bundle.denied:
+            reason, code = bundle.denied
+            # Rate limiting is checked before the slug is validated.
+            details = {} if reason == "rate_limited" else {"room_slug": room_slug}
+            audit_ws_event("ws.connect.denied", self.scope, endpoint="chat", reason=reason, code=code, **details)
+            await self.close(code=code)
             return
 
-        self.actor_username = await self._resolve_public_username(user)
+        room = bundle.room
+        is_authenticated = getattr(user, "is_authenticated", False)
+        if is_authenticated:
+            self.sender = bundle.sender
+            if room.kind == Room.Kind.DIRECT:
+                self.direct_peer_id = bundle.direct_peer_id
+        self.actor_username = bundle.actor_username
         self.room = room
         self.room_name = room.slug
         room_identifier = room.pk if getattr(room, "pk", None) else room.slug
         self.room_group_name = f"chat_room_{room_identifier}"
 
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+        if is_authenticated:
+            self.profile_group_name = profile_group_name(user.pk)
+            await self.channel_layer.group_add(self.profile_group_name, self.channel_name)
         await self.accept()
         audit_ws_event("ws.connect.accepted", self.scope, endpoint="chat", room_slug=self.room_name)
 
         self._last_activity = time.monotonic()
         self._last_typing_broadcast = 0.0
-        self._idle_task = None
+        self._idle_timer = None
         if self.chat_idle_timeout > 0:
-            self._idle_task = asyncio.create_task(self._idle_watchdog())
+            self._idle_timer = get_timer_wheel().schedule(self.chat_idle_timeout, self._idle_watchdog)
 
     async def disconnect(self, code):
-        idle_task = getattr(self, "_idle_task", None)
-        if idle_task:
-            idle_task.cancel()
-            try:
-                await idle_task
-            except asyncio.CancelledError:
-                pass
+        idle_timer = getattr(self, "_idle_timer", None)
+        if idle_timer:
+            idle_timer.cancel()
 
         if hasattr(self, "room_group_name"):
             await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        if hasattr(self, "profile_group_name"):
+            await self.channel_layer.group_discard(self.profile_group_name, self.channel_name)
         audit_ws_event(
             "ws.disconnect",
             self.scope,
@@ -198,17 +217,15 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.send(text_data=json.dumps({"error": "slow_mode"}))
             return
 
-        username = (getattr(self, "actor_username", "") or "").strip()
-        if not username:
-            username = await self._resolve_public_username(user)
-            self.actor_username = username
+        sender = getattr(self, "sender", None)
+        if sender is None:
+            sender = self.sender = await self._load_sender(user)
+        username = sender.username.strip() if sender else ""
         if not username:
             audit_ws_event("ws.message.rejected", self.scope, endpoint="chat", reason="invalid_user")
             return
         room_slug = self.room.slug
-
-        profile_name, avatar_crop = await self._get_profile_avatar_state(user)
-        profile_url = build_profile_url(self.scope, profile_name)
+        profile_url = sender.profile_url(self.scope)
 
         reply_to_id = text_data_json.get("replyTo")
         if reply_to_id is not None:
@@ -217,7 +234,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             except (TypeError, ValueError):
                 reply_to_id = None
 
-        saved_message = await self.save_message(message, user, username, profile_name, self.room, reply_to_id)
+        saved_message = await self.save_message(message, user, username, sender.avatar_path, self.room, reply_to_id)
         created_at = saved_message.date_added.isoformat()
         audit_ws_event(
             "ws.message.sent",
@@ -227,21 +244,23 @@ class ChatConsumer(AsyncWebsocketConsumer):
             message_length=len(message),
         )
 
-        reply_to_data = await self._get_reply_data(saved_message) if reply_to_id else None
+        reply_to_data = await self._get_reply_data(saved_message) if saved_message.reply_to_id else None
 
         await self.channel_layer.group_send(
             self.room_group_name,
-            {
-                "type": "chat_message",
-                "message": message,
-                "username": username,
-                "profile_pic": profile_url,
-                "avatar_crop": avatar_crop,
-                "room": room_slug,
-                "id": saved_message.pk,
-                "createdAt": created_at,
-                "replyTo": reply_to_data,
-            },
+            frames.framed_event(
+                {
+                    "type": "chat_message",
+                    "message": message,
+                    "username": username,
+                    "profile_pic": profile_url,
+                    "avatar_crop": sender.avatar_crop,
+                    "room": room_slug,
+                    "id": saved_message.pk,
+                    "createdAt": created_at,
+                    "replyTo": reply_to_data,
+                }
+            ),
         )
 
         if self.room.kind == Room.Kind.DIRECT:
@@ -265,32 +284,51 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def chat_message(self, event):
         self._last_activity = time.monotonic()
-        await self.send(
-            text_data=json.dumps(
-                {
-                    "message": event["message"],
-                    "username": event["username"],
-                    "profile_pic": event["profile_pic"],
-                    "avatar_crop": event.get("avatar_crop"),
-                    "room": event["room"],
-                    "id": event.get("id"),
-                    "createdAt": event.get("createdAt") or event.get("date_added"),
-                    "replyTo": event.get("replyTo"),
-                    "attachments": event.get("attachments", []),
-                }
-            )
-        )
+        await self.send(text_data=frames.event_frame(event, frames.message_payload))
 
-    async def _idle_watchdog(self):
-        interval = max(10, min(60, self.chat_idle_timeout))
-        while True:
-            await asyncio.sleep(interval)
-            if (time.monotonic() - self._last_activity) <= self.chat_idle_timeout:
-                continue
-            await self.close(code=CHAT_CLOSE_IDLE_CODE)
-            break
+    async def chat_profile_changed(self, event):
+        """Reload the sender snapshot after the user's profile or username changed."""
+        user = self.scope.get("user")
+        if user is None or not getattr(user, "is_authenticated", False):
+            return
+        self.sender = await self._load_sender(user)
+        self.actor_username = self.sender.username if self.sender else ""
+
+    async def _idle_watchdog(self) -> float | None:
+        """Timer-wheel callback: closes an idle socket, otherwise re-arms for the remaining time."""
+        idle_for = time.monotonic() - self._last_activity
+        if idle_for <= self.chat_idle_timeout:
+            return self.chat_idle_timeout - idle_for
+        await self.close(code=CHAT_CLOSE_IDLE_CODE)
+        return None
+
+    @db_to_async
+    def _connect_bundle(self, room_slug: str, user) -> ConnectBundle:
+        """Rate limit, room, read access and sender identity in a single hop.
+
+        Reading the permission mask also warms the permission cache that
+        later ``can_write`` checks are served from.
+        """
+        if _ws_connect_rate_limited(self.scope, "chat"):
+            return ConnectBundle(denied=("rate_limited", 4429))
+        if room_slug != PUBLIC_ROOM_SLUG and not _is_valid_room_slug(room_slug):
+            return ConnectBundle(denied=("invalid_slug", 4404))
+        room = self._load_room(room_slug)
+        if not room:
+            return ConnectBundle(denied=("room_not_found", 4404))
+        if not can_read(room, user):
+            return ConnectBundle(denied=("forbidden", 4403))
+
+        bundle = ConnectBundle(room=room)
+        if not getattr(user, "is_authenticated", False):
+            bundle.actor_username = user_public_username(user)
+            return bundle
+        bundle.sender = load_sender_snapshot(user.pk)
+        bundle.actor_username = bundle.sender.username if bundle.sender else ""
+        if room.kind == Room.Kind.DIRECT:
+            bundle.direct_peer_id = self._direct_peer_id(room, user)
+        return bundle
 
-    @sync_to_async
     def _load_room(self, slug: str):
         try:
             if slug == PUBLIC_ROOM_SLUG:
@@ -312,71 +350,60 @@ class ChatConsumer(AsyncWebsocketConsumer):
         except (OperationalError, ProgrammingError, IntegrityError):
             return None
 
-    @sync_to_async
-    def _can_read(self, room: Room, user) -> bool:
-        return can_read(room, user)
-
-    @sync_to_async
+    @db_to_async
     def _can_write(self, room: Room, user) -> bool:
         return can_write(room, user)
 
-    @sync_to_async
+    @db_to_async
     def _resolve_public_username(self, user) -> str:
         return user_public_username(user)
 
-    @sync_to_async
-    def save_message(self, message, user, username, profile_pic, room, reply_to_id=None):
-        kwargs = {
-            "message_content": message,
-            "username": username,
-            "user": user,
-            "profile_pic": profile_pic,
-            "room": room,
-        }
-        if reply_to_id is not None:
-            exists = Message.objects.filter(
-                pk=reply_to_id, room=room, is_deleted=False,
-            ).exists()
-            if exists:
-                kwargs["reply_to_id"] = reply_to_id
-        return Message.objects.create(**kwargs)
-
-    @sync_to_async
-    def _get_profile_avatar_state(self, user):
-        try:
-            profile = user.profile
-            image = getattr(profile, "image", None)
-            name = getattr(image, "name", "") or ""
-            return name, serialize_avatar_crop(profile)
-        except (AttributeError, ObjectDoesNotExist):
-            return "", None
-
-    @sync_to_async
+    async def save_message(self, message, user, username, profile_pic, room, reply_to_id=None):
+        draft = MessageDraft(
+            room=room,
+            user=user,
+            username=username,
+            content=message,
+            profile_pic=profile_pic,
+            reply_to_id=reply_to_id,
+        )
+        if write_behind_enabled():
+            return await get_message_writer().submit(draft)
+        saved = await db_to_async(persist_messages)([draft])
+        return saved[0]
+
+    @db_to_async
+    def _load_sender(self, user):
+        return load_sender_snapshot(user.pk)
+
+    @db_to_async
     def _is_blocked_in_dm(self, room: Room, user) -> bool:
         """Check if either user in a DM has blocked the other."""
-        from friends.application.friend_service import is_blocked_between
         if room.kind != Room.Kind.DIRECT:
             return False
-        other = Membership.objects.filter(room=room).exclude(user=user).values_list("user", flat=True).first()
-        if not other:
+        if not hasattr(self, "direct_peer_id"):
+            self.direct_peer_id = self._direct_peer_id(room, user)
+        if self.direct_peer_id is None:
             return False
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        other_user = User.objects.filter(pk=other).first()
-        if not other_user:
-            return False
-        return is_blocked_between(user, other_user)
+        return is_blocked_between_ids(user.pk, self.direct_peer_id)
+
+    def _direct_peer_id(self, room: Room, user) -> int | None:
+        """The other DM participant, taken from ``direct_pair_key`` when possible."""
+        pair = parse_pair_key_users(room.direct_pair_key)
+        if pair and user.pk in pair:
+            return pair[1] if pair[0] == user.pk else pair[0]
+        return Membership.objects.filter(room=room).exclude(user=user).values_list("user_id", flat=True).first()
 
-    @sync_to_async
+    @db_to_async
     def _rate_limited(self, user) -> bool:
         """Checks chat message rate limit for the current user."""
         limit = int(getattr(settings, "CHAT_MESSAGE_RATE_LIMIT", 20))
         window = int(getattr(settings, "CHAT_MESSAGE_RATE_WINDOW", 10))
         scope_key = f"rl:chat:message:{user.pk}"
         policy = RateLimitPolicy(limit=limit, window_seconds=window)
-        return DbRateLimiter.is_limited(scope_key=scope_key, policy=policy)
+        return is_rate_limited(scope_key=scope_key, policy=policy)
 
-    @sync_to_async
+    @db_to_async
     def _slow_mode_limited(self, user) -> bool:
         """Checks group slow mode: 1 message per slow_mode_seconds per user."""
         room = getattr(self, "room", None)
@@ -387,7 +414,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return False
         scope_key = f"rl:slow:{room.pk}:{user.pk}"
         policy = RateLimitPolicy(limit=1, window_seconds=slow)
-        return DbRateLimiter.is_limited(scope_key=scope_key, policy=policy)
+        return is_rate_limited(scope_key=scope_key, policy=policy)
 
     # ── Typing indicator ────────────────────────────────────────────────
 
@@ -409,26 +436,24 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return
         await self.channel_layer.group_send(
             self.room_group_name,
-            {
-                "type": "chat_typing",
-                "username": username,
-                "userId": user.pk,
-                "sender_channel": self.channel_name,
-            },
+            frames.framed_event(
+                {
+                    "type": "chat_typing",
+                    "username": username,
+                    "userId": user.pk,
+                    "sender_channel": self.channel_name,
+                }
+            ),
         )
 
     async def chat_typing(self, event):
         if event.get("sender_channel") == self.channel_name:
             return
-        await self.send(text_data=json.dumps({
-            "type": "typing",
-            "username": event["username"],
-            "userId": event["userId"],
-        }))
+        await self.send(text_data=frames.event_frame(event, frames.typing_payload))
 
     # ── Reply data helper ─────────────────────────────────────────────
 
-    @sync_to_async
+    @db_to_async
     def _get_reply_data(self, saved_message):
         reply = saved_message.reply_to
         if not reply:
@@ -445,51 +470,23 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def chat_message_edit(self, event):
         self._last_activity = time.monotonic()
-        await self.send(text_data=json.dumps({
-            "type": "message_edit",
-            "messageId": event["messageId"],
-            "content": event["content"],
-            "editedAt": event["editedAt"],
-            "editedBy": event["editedBy"],
-        }))
+        await self.send(text_data=frames.event_frame(event, frames.message_edit_payload))
 
     async def chat_message_delete(self, event):
         self._last_activity = time.monotonic()
-        await self.send(text_data=json.dumps({
-            "type": "message_delete",
-            "messageId": event["messageId"],
-            "deletedBy": event["deletedBy"],
-        }))
+        await self.send(text_data=frames.event_frame(event, frames.message_delete_payload))
 
     async def chat_reaction_add(self, event):
         self._last_activity = time.monotonic()
-        await self.send(text_data=json.dumps({
-            "type": "reaction_add",
-            "messageId": event["messageId"],
-            "emoji": event["emoji"],
-            "userId": event["userId"],
-            "username": event["username"],
-        }))
+        await self.send(text_data=frames.event_frame(event, frames.reaction_add_payload))
 
     async def chat_reaction_remove(self, event):
         self._last_activity = time.monotonic()
-        await self.send(text_data=json.dumps({
-            "type": "reaction_remove",
-            "messageId": event["messageId"],
-            "emoji": event["emoji"],
-            "userId": event["userId"],
-            "username": event["username"],
-        }))
+        await self.send(text_data=frames.event_frame(event, frames.reaction_remove_payload))
 
     async def chat_read_receipt(self, event):
         self._last_activity = time.monotonic()
-        await self.send(text_data=json.dumps({
-            "type": "read_receipt",
-            "userId": event["userId"],
-            "username": event["username"],
-            "lastReadMessageId": event["lastReadMessageId"],
-            "roomSlug": event["roomSlug"],
-        }))
+        await self.send(text_data=frames.event_frame(event, frames.read_receipt_payload))
 
     # ── Mark read via WS ──────────────────────────────────────────────
 
@@ -517,7 +514,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return
         await self._do_mark_read(user, self.room, last_read_id)
 
-    @sync_to_async
+    @db_to_async
     def _do_mark_read(self, user, room, last_read_id):
         from .services import mark_read as service_mark_read
         try:
@@ -531,15 +528,15 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return
         room_identifier = room.pk if getattr(room, "pk", None) else room.slug
         group_name = f"chat_room_{room_identifier}"
-        async_to_sync(channel_layer.group_send)(group_name, {
+        async_to_sync(channel_layer.group_send)(group_name, frames.framed_event({
             "type": "chat_read_receipt",
             "userId": user.pk,
             "username": user_public_username(user),
             "lastReadMessageId": state.last_read_message_id,
             "roomSlug": room.slug,
-        })
+        }))
 
-    @sync_to_async
+    @db_to_async
     def _build_direct_inbox_targets(self, room_id: int, sender_id: int, message: str, created_at: str):
         room = Room.objects.filter(id=room_id, kind=Room.Kind.DIRECT).first()
         if not room:
@@ -0,0 +1,26 @@
+"""Opaque cursors for chat listings.
+
+Keyset cursors are the shared ``(timestamp, id)`` positions; sync cursors
+carry the change number a client has already seen.
+"""
+
+from __future__ import annotations
+
+from chat_app_django.cursor_utils import decode_cursor, decode_payload, encode_cursor, encode_payload
+
+__all__ = ["decode_cursor", "decode_sync_cursor", "encode_cursor", "encode_sync_cursor"]
+
+
+def encode_sync_cursor(seq: int) -> str:
+    return encode_payload({"seq": int(seq)})
+
+
+def decode_sync_cursor(value: str | None) -> int | None:
+    payload = decode_payload(value)
+    if payload is None:
+        return None
+    try:
+        seq = int(payload["seq"])
+    except Exception:
+        return None
+    return seq if seq >= 0 else None
@@ -0,0 +1,125 @@
+"""Client frames for chat room group events, encoded once per broadcast.
+
+A room event fans out to every socket in the group, so the sender encodes the
+outgoing JSON frame a single time (with ``ujson``) and ships the text in the
+event's ``frame`` key. Consumers forward it unchanged. Routing hints that
+are not part of the client payload, such as ``sender_channel`` for typing
+self-suppression, stay as separate event keys.
+
+Events without a ``frame`` (e.g. sent by an older worker during a rolling
+deploy) are still encoded by the receiving consumer.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import Any
+
+import ujson
+
+ROUTING_KEYS = ("sender_channel",)
+
+
+def encode_frame(payload: dict[str, Any]) -> str:
+    return ujson.dumps(payload, ensure_ascii=False, escape_forward_slashes=False)
+
+
+def message_payload(event: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "message": event["message"],
+        "username": event["username"],
+        "profile_pic": event["profile_pic"],
+        "avatar_crop": event.get("avatar_crop"),
+        "room": event["room"],
+        "id": event.get("id"),
+        "createdAt": event.get("createdAt") or event.get("date_added"),
+        "replyTo": event.get("replyTo"),
+        "attachments": event.get("attachments", []),
+    }
+
+
+def typing_payload(event: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "type": "typing",
+        "username": event["username"],
+        "userId": event["userId"],
+    }
+
+
+def message_edit_payload(event: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "type": "message_edit",
+        "messageId": event["messageId"],
+        "content": event["content"],
+        "editedAt": event["editedAt"],
+        "editedBy": event["editedBy"],
+    }
+
+
+def message_delete_payload(event: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "type": "message_delete",
+        "messageId": event["messageId"],
+        "deletedBy": event["deletedBy"],
+    }
+
+
+def _reaction_payload(kind: str) -> Callable[[dict[str, Any]], dict[str, Any]]:
+    def build(event: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "type": kind,
+            "messageId": event["messageId"],
+            "emoji": event["emoji"],
+            "userId": event["userId"],
+            "username": event["username"],
+        }
+
+    return build
+
+
+reaction_add_payload = _reaction_payload("reaction_add")
+reaction_remove_payload = _reaction_payload("reaction_remove")
+
+
+def read_receipt_payload(event: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "type": "read_receipt",
+        "userId": event["userId"],
+        "username": event["username"],
+        "lastReadMessageId": event["lastReadMessageId"],
+        "roomSlug": event["roomSlug"],
+    }
+
+
+PAYLOAD_BUILDERS: dict[str, Callable[[dict[str, Any]], dict[str, Any]]] = {
+    "chat_message": message_payload,
+    "chat_typing": typing_payload,
+    "chat_message_edit": message_edit_payload,
+    "chat_message_delete": message_delete_payload,
+    "chat_reaction_add": reaction_add_payload,
+    "chat_reaction_remove": reaction_remove_payload,
+    "chat_read_receipt": read_receipt_payload,
+}
+
+
+def framed_event(event: dict[str, Any]) -> dict[str, Any]:
+    """Replace the fields of a room event with its pre-encoded client frame.
+
+    Event types without a client frame are returned unchanged.
+    """
+    build = PAYLOAD_BUILDERS.get(event.get("type", ""))
+    if build is None:
+        return event
+    framed = {"type": event["type"], "frame": encode_frame(build(event))}
+    for key in ROUTING_KEYS:
+        if key in event:
+            framed[key] = event[key]
+    return framed
+
+
+def event_frame(event: dict[str, Any], build: Callable[[dict[str, Any]], dict[str, Any]]) -> str:
+    """Return the frame shipped with ``event``, encoding it only if it was not."""
+    frame = event.get("frame")
+    if isinstance(frame, str):
+        return frame
+    return encode_frame(build(event))
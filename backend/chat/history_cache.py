@@ -0,0 +1,258 @@
+"""Cache of the latest serialized history page per room.
+
+The newest ``CHAT_HISTORY_CACHE_SIZE`` messages of a room are kept as
+``MessageSerializer`` output in the shared cache, so the cursor-less
+``room_messages`` request (every room join) skips the joins, prefetches and
+serialization. Only viewer-independent data is cached:
+
+* media fields hold storage names and are signed per request on read;
+* reaction ``me`` flags are filled from the caller's own reactions;
+* author names, avatars and crops are re-read for the page's authors on
+  every read (one query), so renames and avatar changes show up at once.
+  The cached values are only a fallback for authors that no longer exist.
+
+New messages are appended after commit; edits, deletions, reactions and
+attachment uploads invalidate the page. Each room has a generation counter
+that every change bumps, and a page is served only while its tag matches the
+current generation. A page built from a read that raced with a write is
+therefore never trusted, and no lock is needed.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+from chat_app_django.media_utils import serialize_avatar_crop
+from messages.models import Message
+from messages.serializers import MessageSerializer
+from users.identity import user_public_username
+
+AUTHOR_FIELD = "_author"
+
+
+def history_cache_ttl() -> int:
+    return max(0, int(getattr(settings, "CHAT_HISTORY_CACHE_TTL", 0)))
+
+
+def history_cache_size() -> int:
+    default = int(getattr(settings, "CHAT_MESSAGES_PAGE_SIZE", 50))
+    return max(1, int(getattr(settings, "CHAT_HISTORY_CACHE_SIZE", default)))
+
+
+def page_key(room_id: int) -> str:
+    return f"chat:history:{room_id}:page"
+
+
+def generation_key(room_id: int) -> str:
+    return f"chat:history:{room_id}:gen"
+
+
+def history_queryset():
+    """Queryset shared by the history endpoint and the cache filler."""
+    return (
+        Message.objects
+        .select_related("user", "user__profile", "reply_to", "reply_to__user")
+        .prefetch_related("attachments")
+    )
+
+
+def _media_name(field_file) -> str | None:
+    if not field_file:
+        return None
+    return getattr(field_file, "name", None) or str(field_file)
+
+
+def _serialize(messages: Iterable[Message]) -> list[dict[str, Any]]:
+    messages = list(messages)
+    entries = list(
+        MessageSerializer(
+            messages,
+            many=True,
+            context={
+                "build_profile_pic_url": _media_name,
+                "serialize_avatar_crop": serialize_avatar_crop,
+                "my_reactions": {},
+            },
+        ).data
+    )
+    for msg, entry in zip(messages, entries):
+        if msg.user_id:
+            entry[AUTHOR_FIELD] = msg.user_id
+        reply = msg.reply_to
+        if entry.get("replyTo") and reply is not None and not reply.is_deleted and reply.user_id:
+            entry["replyTo"] = {**entry["replyTo"], AUTHOR_FIELD: reply.user_id}
+    return entries
+
+
+def _load_authors(entries: Iterable[dict[str, Any]]) -> dict[int, dict[str, Any]]:
+    """Current public name, avatar name and crop of the authors in ``entries``."""
+    ids = set()
+    for entry in entries:
+        for item in (entry, entry.get("replyTo") or {}):
+            if item.get(AUTHOR_FIELD):
+                ids.add(item[AUTHOR_FIELD])
+    if not ids:
+        return {}
+    authors = {}
+    for user in get_user_model().objects.select_related("profile").filter(pk__in=ids):
+        profile = getattr(user, "profile", None)
+        authors[user.pk] = {
+            "username": user_public_username(user),
+            "profilePic": _media_name(getattr(profile, "image", None)),
+            "avatarCrop": serialize_avatar_crop(profile),
+        }
+    return authors
+
+
+def _generation(room_id: int) -> int | None:
+    value = cache.get(generation_key(room_id))
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _bump_generation(room_id: int) -> int:
+    key = generation_key(room_id)
+    # Seeded from the clock so a lost counter never revalidates an old page.
+    cache.add(key, int(time.time() * 1000), timeout=None)
+    try:
+        return int(cache.incr(key))
+    except ValueError:
+        generation = int(time.time() * 1000)
+        cache.set(key, generation, timeout=None)
+        return generation
+
+
+def get_page(room_id: int) -> dict[str, Any] | None:
+    """Return ``{"messages", "has_more"}`` for the room, or ``None`` on a miss."""
+    if not history_cache_ttl():
+        return None
+    found = cache.get_many([page_key(room_id), generation_key(room_id)])
+    page = found.get(page_key(room_id))
+    generation = found.get(generation_key(room_id))
+    if not isinstance(page, dict) or generation is None or page.get("generation") != generation:
+        return None
+    return page
+
+
+def fill_page(room_id: int) -> dict[str, Any]:
+    """Load the newest page from the database and cache it for later reads."""
+    size = history_cache_size()
+    generation = _generation(room_id)
+    if generation is None:
+        generation = _bump_generation(room_id)
+    batch = list(history_queryset().filter(room_id=room_id).order_by("-id")[: size + 1])
+    has_more = len(batch) > size
+    batch = batch[:size]
+    batch.reverse()
+    page = {"generation": generation, "messages": _serialize(batch), "has_more": has_more}
+    ttl = history_cache_ttl()
+    if ttl:
+        cache.set(page_key(room_id), page, timeout=ttl)
+    return page
+
+
+def invalidate_room(room_id: int) -> None:
+    if history_cache_ttl():
+        _bump_generation(room_id)
+
+
+def invalidate_room_on_commit(room_id: int) -> None:
+    if history_cache_ttl():
+        transaction.on_commit(lambda: invalidate_room(room_id))
+
+
+def append_messages(messages: Iterable[Message]) -> None:
+    """Append freshly committed messages to the cached pages of their rooms."""
+    ttl = history_cache_ttl()
+    if not ttl:
+        return
+    per_room: dict[int, list[int]] = defaultdict(list)
+    for msg in messages:
+        per_room[msg.room_id].append(msg.pk)
+    if not per_room:
+        return
+
+    keys = [key for room_id in per_room for key in (page_key(room_id), generation_key(room_id))]
+    found = cache.get_many(keys)
+    for room_id, message_ids in per_room.items():
+        page = found.get(page_key(room_id))
+        generation = found.get(generation_key(room_id))
+        if not isinstance(page, dict) or generation is None or page.get("generation") != generation:
+            # Nothing trusted to append to; the next reader refills.
+            continue
+        cached = page.get("messages") or []
+        last_id = cached[-1]["id"] if cached else 0
+        new_generation = _bump_generation(room_id)
+        if min(message_ids) <= last_id or new_generation != generation + 1:
+            # Out-of-order commit or a concurrent change: leave the page invalidated.
+            continue
+        fresh = _serialize(history_queryset().filter(pk__in=message_ids).order_by("id"))
+        combined = cached + fresh
+        size = history_cache_size()
+        cache.set(
+            page_key(room_id),
+            {
+                "generation": new_generation,
+                "messages": combined[-size:],
+                "has_more": bool(page.get("has_more")) or len(combined) > size,
+            },
+            timeout=ttl,
+        )
+
+
+def append_messages_on_commit(messages: Iterable[Message]) -> None:
+    if history_cache_ttl():
+        messages = list(messages)
+        transaction.on_commit(lambda: append_messages(messages))
+
+
+def render_messages(
+    entries: list[dict[str, Any]],
+    *,
+    build_media_url: Callable[[str], str | None],
+    my_reactions: dict[int, set[str]],
+) -> list[dict[str, Any]]:
+    """Attach current author fields, sign media names and set reaction ``me`` flags."""
+    authors = _load_authors(entries)
+    rendered = []
+    for entry in entries:
+        item = dict(entry)
+        author = authors.get(item.pop(AUTHOR_FIELD, None))
+        if author:
+            item["username"] = author["username"]
+            if not item.get("isDeleted"):
+                item["profilePic"] = author["profilePic"] or item.get("profilePic")
+                item["avatarCrop"] = author["avatarCrop"]
+        if item.get("replyTo"):
+            reply = dict(item["replyTo"])
+            reply_author = authors.get(reply.pop(AUTHOR_FIELD, None))
+            if reply_author:
+                reply["username"] = reply_author["username"]
+            item["replyTo"] = reply
+        if item.get("profilePic"):
+            item["profilePic"] = build_media_url(item["profilePic"])
+        attachments = []
+        for attachment in item.get("attachments") or []:
+            attachment = dict(attachment)
+            for field in ("url", "thumbnailUrl"):
+                if attachment.get(field):
+                    attachment[field] = build_media_url(attachment[field])
+            attachments.append(attachment)
+        item["attachments"] = attachments
+        mine = my_reactions.get(item["id"], set())
+        item["reactions"] = [
+            {**reaction, "me": reaction["emoji"] in mine}
+            for reaction in item.get("reactions") or []
+        ]
+        rendered.append(item)
+    return rendered
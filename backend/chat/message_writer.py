@@ -0,0 +1,152 @@
+"""Write-behind pipeline that coalesces chat messages into bulk inserts.
+
+Consumers on the same event loop submit drafts to a shared writer; a single
+flusher task waits at most ``max_delay`` seconds (or until ``max_batch_size``
+drafts are queued) and persists the batch with one ``bulk_create``. Futures
+are resolved in submission order, which is also the order ids are assigned,
+so senders resume (and broadcast) in id order within a worker.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import weakref
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+from chat_app_django.db_executor import db_to_async
+
+from messages.models import Message
+
+from .services import MessageDraft, persist_messages
+
+logger = logging.getLogger("chat.message_writer")
+
+
+@dataclass
+class _PendingWrite:
+    draft: MessageDraft
+    future: asyncio.Future = field(repr=False)
+
+
+def _persist_batch(drafts: list[MessageDraft]) -> list[Message | Exception]:
+    """Persist a batch; on failure retry row by row so one bad draft does not sink the rest."""
+    try:
+        return list(persist_messages(drafts))
+    except Exception:
+        logger.warning("Batched message insert failed, retrying row by row", exc_info=True)
+
+    results: list[Message | Exception] = []
+    for draft in drafts:
+        try:
+            results.append(persist_messages([draft])[0])
+        except Exception as exc:
+            results.append(exc)
+    return results
+
+
+class MessageWriteBehind:
+    """Per-event-loop message batcher with bounded latency."""
+
+    def __init__(self, *, max_batch_size: int = 100, max_delay: float = 0.005):
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_delay = max(0.0, float(max_delay))
+        self._queue: asyncio.Queue[_PendingWrite] = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+        self._inflight: asyncio.Future | None = None
+
+    async def submit(self, draft: MessageDraft) -> Message:
+        loop = asyncio.get_running_loop()
+        pending = _PendingWrite(draft=draft, future=loop.create_future())
+        self._queue.put_nowait(pending)
+        self._ensure_running()
+        return await pending.future
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _collect_batch(self, batch: list[_PendingWrite]) -> None:
+        loop = asyncio.get_running_loop()
+        batch.append(await self._queue.get())
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+    async def _run(self) -> None:
+        while True:
+            batch: list[_PendingWrite] = []
+            try:
+                await self._collect_batch(batch)
+            finally:
+                # Runs on cancellation too: drafts already dequeued are still written.
+                if batch:
+                    self._inflight = asyncio.ensure_future(self._flush(batch))
+            # Shielded so a cancelled flusher never strands a half-written batch.
+            await asyncio.shield(self._inflight)
+
+    async def _flush(self, batch: list[_PendingWrite]) -> None:
+        drafts = [pending.draft for pending in batch]
+        try:
+            results = await db_to_async(_persist_batch)(drafts)
+        except Exception as exc:
+            results = [exc] * len(batch)
+        for pending, result in zip(batch, results):
+            if pending.future.done():
+                continue
+            if isinstance(result, Exception):
+                pending.future.set_exception(result)
+            else:
+                pending.future.set_result(result)
+
+    async def close(self) -> None:
+        """Flush everything queued so far and stop the flusher task."""
+        task = self._task
+        self._task = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self._inflight is not None:
+            await self._inflight
+            self._inflight = None
+        while not self._queue.empty():
+            batch = []
+            while not self._queue.empty() and len(batch) < self.max_batch_size:
+                batch.append(self._queue.get_nowait())
+            await self._flush(batch)
+
+
+_writers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, MessageWriteBehind]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def write_behind_enabled() -> bool:
+    return bool(getattr(settings, "CHAT_MESSAGE_WRITE_BEHIND", False))
+
+
+def get_message_writer() -> MessageWriteBehind:
+    """Return the writer bound to the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    writer = _writers.get(loop)
+    if writer is None:
+        writer = MessageWriteBehind(
+            max_batch_size=int(getattr(settings, "CHAT_MESSAGE_BATCH_MAX_SIZE", 100)),
+            max_delay=int(getattr(settings, "CHAT_MESSAGE_BATCH_MAX_DELAY_MS", 5)) / 1000,
+        )
+        _writers[loop] = writer
+    return writer
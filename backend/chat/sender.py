@@ -0,0 +1,91 @@
+"""Connection-scoped snapshot of the sending user's public identity.
+
+A chat socket resolves its user's public username, avatar and crop once at
+connect, so sending a message does no ORM work and no header parsing. The
+signed avatar URL is re-signed from the cached path before it expires.
+
+Profile and username changes are pushed to the user's open chat and
+presence sockets through a per-user group, and each socket then reloads
+its snapshot.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+
+from chat_app_django.media_utils import build_profile_url, serialize_avatar_crop
+from users.identity import user_public_username
+
+PROFILE_CHANGED_EVENT = "chat_profile_changed"
+
+
+def profile_group_name(user_id: int) -> str:
+    return f"chat_profile_{int(user_id)}"
+
+
+def avatar_url_refresh_interval() -> float:
+    """Seconds a signed avatar URL is reused; leaves a margin before it expires."""
+    ttl = max(1, int(getattr(settings, "MEDIA_URL_TTL_SECONDS", 300)))
+    return max(1, ttl - min(60, ttl // 2))
+
+
+@dataclass
+class SenderSnapshot:
+    username: str
+    avatar_path: str
+    avatar_crop: dict[str, float] | None
+    avatar_url: str | None = None
+    avatar_url_refresh_at: float = 0.0
+
+    def profile_url(self, scope: dict[str, Any]) -> str | None:
+        """Signed avatar URL for ``scope``, re-signed only when close to expiry."""
+        now = time.monotonic()
+        if now >= self.avatar_url_refresh_at:
+            self.avatar_url = build_profile_url(scope, self.avatar_path)
+            self.avatar_url_refresh_at = now + avatar_url_refresh_interval()
+        return self.avatar_url
+
+
+def load_sender_snapshot(user_id: int) -> SenderSnapshot | None:
+    """Read the user's current public identity in one query (sync).
+
+    The user is re-read rather than taken from the socket scope, whose cached
+    profile would be stale after a change notification.
+    """
+    user = get_user_model().objects.select_related("profile").filter(pk=user_id).first()
+    if user is None:
+        return None
+    try:
+        profile = user.profile
+    except ObjectDoesNotExist:
+        profile = None
+    image = getattr(profile, "image", None)
+    return SenderSnapshot(
+        username=user_public_username(user),
+        avatar_path=getattr(image, "name", "") or "",
+        avatar_crop=serialize_avatar_crop(profile),
+    )
+
+
+def notify_profile_changed(user_id: int) -> None:
+    """Tell the user's open chat sockets to reload their sender snapshot."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(
+        profile_group_name(user_id),
+        {"type": PROFILE_CHANGED_EVENT, "userId": int(user_id)},
+    )
+
+
+def notify_profile_changed_on_commit(user_id: int) -> None:
+    transaction.on_commit(lambda: notify_profile_changed(user_id))
@@ -3,9 +3,15 @@
 from __future__ import annotations
 
 import time
+from collections import Counter
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from typing import Any
 
 from django.conf import settings
-from django.db import OperationalError, transaction
+from django.db import OperationalError, connection, transaction
+from django.db.models import Count, F, Min, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
 
 from messages.models import Message, MessageReadState, Reaction
@@ -13,6 +19,8 @@ from roles.access import has_permission
 from roles.permissions import Perm
 from rooms.models import Room
 
+from . import history_cache
+
 
 # ── Exceptions ─────────────────────────────────────────────────────────
 
@@ -32,6 +40,105 @@ class MessageValidationError(MessageError):
     pass
 
 
+# ── Create ─────────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class MessageDraft:
+    """A chat message accepted by a consumer but not yet persisted."""
+
+    room: Room
+    user: Any
+    username: str
+    content: str
+    profile_pic: str = ""
+    reply_to_id: int | None = None
+
+
+def _load_reply_targets(drafts: Sequence[MessageDraft]) -> dict[int, Message]:
+    reply_ids = {draft.reply_to_id for draft in drafts if draft.reply_to_id is not None}
+    if not reply_ids:
+        return {}
+    targets = (
+        Message.objects.filter(pk__in=reply_ids, is_deleted=False)
+        .select_related("user", "user__profile")
+    )
+    return {target.pk: target for target in targets}
+
+
+def persist_messages(drafts: Sequence[MessageDraft]) -> list[Message]:
+    """Insert drafts in one round-trip and return them in the same order.
+
+    Reply targets are validated with a single query and attached to the
+    returned messages, so reading ``message.reply_to`` needs no extra query.
+    Ids are assigned in draft order.
+    """
+    if not drafts:
+        return []
+
+    targets = _load_reply_targets(drafts)
+    messages: list[Message] = []
+    for draft in drafts:
+        msg = Message(
+            message_content=draft.content,
+            username=draft.username,
+            user=draft.user,
+            profile_pic=draft.profile_pic,
+            room=draft.room,
+        )
+        target = targets.get(draft.reply_to_id) if draft.reply_to_id is not None else None
+        if target is not None and target.room_id == draft.room.pk:
+            msg.reply_to = target
+        messages.append(msg)
+
+    with transaction.atomic():
+        if len(messages) > 1 and connection.features.can_return_rows_from_bulk_insert:
+            Message.objects.bulk_create(messages)
+        else:
+            for msg in messages:
+                msg.save(force_insert=True)
+        record_new_messages(messages)
+    return messages
+
+
+def record_new_messages(messages: Iterable[Message], *, append_to_history: bool = True) -> None:
+    """Apply per-room side effects of freshly inserted messages.
+
+    Call inside the transaction that inserted them. With
+    ``append_to_history=False`` the caller appends them to the history cache
+    itself, once rows they own (attachments) are saved.
+    """
+    messages = list(messages)
+    _advance_last_message(messages)
+    if unread_counters_enabled():
+        _bump_unread_counters(messages)
+    if append_to_history:
+        history_cache.append_messages_on_commit(messages)
+
+
+def _advance_last_message(messages: Sequence[Message]) -> None:
+    newest: dict[int, Message] = {}
+    for msg in messages:
+        current = newest.get(msg.room_id)
+        if current is None or msg.pk > current.pk:
+            newest[msg.room_id] = msg
+    for room_id, msg in newest.items():
+        # Guarded by id so concurrent writers can only move the pointer forward.
+        Room.objects.filter(pk=room_id).filter(
+            Q(last_message__isnull=True) | Q(last_message_id__lt=msg.pk)
+        ).update(last_message=msg, last_activity_at=msg.date_added)
+    direct_room_ids = [room_id for room_id, msg in newest.items() if msg.room.kind == Room.Kind.DIRECT]
+    if direct_room_ids:
+        _bump_direct_sync(room_id__in=direct_room_ids)
+
+
+def _bump_direct_sync(**membership_filters) -> None:
+    """Give the inbox rows of the matching DM memberships a new change number."""
+    from roles.infrastructure.membership_sync import bump_memberships
+    from roles.models import Membership
+
+    bump_memberships(Membership.objects.filter(**membership_filters))
+
+
 # ── Edit / Delete ──────────────────────────────────────────────────────
 
 def _load_message_or_raise(room: Room, message_id: int) -> Message:
@@ -89,6 +196,9 @@ def edit_message(user, room: Room, message_id: int, new_content: str) -> Message
         msg.message_content = new_content
         msg.edited_at = timezone.now()
         msg.save(update_fields=["message_content", "edited_at", "original_content"])
+        history_cache.invalidate_room_on_commit(room.pk)
+        if room.kind == Room.Kind.DIRECT:
+            _bump_direct_sync(room_id=room.pk, room__last_message_id=msg.pk)
 
     return msg
 
@@ -105,6 +215,11 @@ def delete_message(user, room: Room, message_id: int) -> Message:
         msg.deleted_at = timezone.now()
         msg.deleted_by = user
         msg.save(update_fields=["is_deleted", "deleted_at", "deleted_by"])
+        history_cache.invalidate_room_on_commit(room.pk)
+        if room.kind == Room.Kind.DIRECT:
+            _bump_direct_sync(room_id=room.pk, room__last_message_id=msg.pk)
+        if unread_counters_enabled():
+            _drop_unread_counters(msg)
 
     return msg
 
@@ -120,21 +235,110 @@ def add_reaction(user, room: Room, message_id: int, emoji: str) -> Reaction:
     if not has_permission(room, user, Perm.ADD_REACTIONS):
         raise MessageForbiddenError("Отсутствует разрешение ADD_REACTIONS")
 
-    msg = Message.objects.filter(pk=message_id, room=room, is_deleted=False).first()
-    if not msg:
-        raise MessageNotFoundError("Сообщение не найдено")
+    with transaction.atomic():
+        # The row lock serializes concurrent updates of the reaction summary.
+        msg = (
+            Message.objects.select_for_update()
+            .filter(pk=message_id, room=room, is_deleted=False)
+            .only("id", "room_id", "reaction_counts")
+            .first()
+        )
+        if not msg:
+            raise MessageNotFoundError("Сообщение не найдено")
 
-    reaction, _created = Reaction.objects.get_or_create(
-        message=msg, user=user, emoji=emoji,
-    )
+        reaction, created = Reaction.objects.get_or_create(
+            message=msg, user=user, emoji=emoji,
+        )
+        if created:
+            _save_reaction_counts(msg, _adjust_reaction_counts(msg.reaction_counts, emoji, 1))
     return reaction
 
 
 def remove_reaction(user, room: Room, message_id: int, emoji: str) -> None:
     """Remove an emoji reaction. Idempotent (no error if not found)."""
-    Reaction.objects.filter(
-        message_id=message_id, message__room=room, user=user, emoji=emoji,
-    ).delete()
+    with transaction.atomic():
+        msg = (
+            Message.objects.select_for_update()
+            .filter(pk=message_id, room=room)
+            .only("id", "room_id", "reaction_counts")
+            .first()
+        )
+        if not msg:
+            return
+        deleted, _ = Reaction.objects.filter(message=msg, user=user, emoji=emoji).delete()
+        if deleted:
+            _save_reaction_counts(msg, _adjust_reaction_counts(msg.reaction_counts, emoji, -deleted))
+
+
+def _adjust_reaction_counts(counts, emoji: str, delta: int) -> list[list[Any]]:
+    """Apply ``delta`` to ``emoji`` in a ``[[emoji, count], ...]`` summary, keeping order."""
+    result: list[list[Any]] = []
+    found = False
+    for entry in counts or []:
+        try:
+            name, count = entry[0], int(entry[1])
+        except (TypeError, ValueError, IndexError, KeyError):
+            continue
+        if name == emoji:
+            found = True
+            count += delta
+        if count > 0:
+            result.append([name, count])
+    if not found and delta > 0:
+        result.append([emoji, delta])
+    return result
+
+
+def _save_reaction_counts(msg: Message, counts: list[list[Any]]) -> None:
+    msg.reaction_counts = counts
+    Message.objects.filter(pk=msg.pk).update(reaction_counts=counts)
+    history_cache.invalidate_room_on_commit(msg.room_id)
+
+
+def recount_reactions(message_ids: Iterable[int]) -> None:
+    """Rebuild the reaction summary of ``message_ids`` from their ``Reaction`` rows.
+
+    Emojis are ordered by their oldest remaining reaction. Only summaries
+    that changed are written.
+    """
+    ids = sorted(set(message_ids))
+    if not ids:
+        return
+    with transaction.atomic():
+        messages = list(
+            Message.objects.select_for_update()
+            .filter(pk__in=ids)
+            .order_by("pk")
+            .only("id", "room_id", "reaction_counts")
+        )
+        if not messages:
+            return
+        counts: dict[int, list[list[Any]]] = {msg.pk: [] for msg in messages}
+        rows = (
+            Reaction.objects.filter(message_id__in=list(counts))
+            .values("message_id", "emoji")
+            .annotate(count=Count("id"), first_at=Min("created_at"))
+            .order_by("message_id", "first_at", "emoji")
+        )
+        for row in rows:
+            counts[row["message_id"]].append([row["emoji"], row["count"]])
+        for msg in messages:
+            if msg.reaction_counts != counts[msg.pk]:
+                _save_reaction_counts(msg, counts[msg.pk])
+
+
+def my_reaction_emojis(user, message_ids: Iterable[int]) -> dict[int, set[str]]:
+    """Emojis ``user`` reacted with, per message id (one query)."""
+    result: dict[int, set[str]] = {}
+    if not getattr(user, "is_authenticated", False):
+        return result
+    ids = list(message_ids)
+    if not ids:
+        return result
+    rows = Reaction.objects.filter(user=user, message_id__in=ids).values_list("message_id", "emoji")
+    for message_id, emoji in rows:
+        result.setdefault(message_id, set()).add(emoji)
+    return result
 
 
 # ── Read State ─────────────────────────────────────────────────────────
@@ -152,11 +356,18 @@ def mark_read(user, room: Room, last_read_message_id: int) -> MessageReadState:
                     user=user, room=room,
                     defaults={"last_read_message_id": last_read_message_id},
                 )
+                update_fields = []
                 if not created:
                     current_id = state.last_read_message_id or 0
                     if last_read_message_id > current_id:
                         state.last_read_message_id = last_read_message_id
-                        state.save(update_fields=["last_read_message_id", "last_read_at"])
+                        update_fields = ["last_read_message_id", "last_read_at"]
+                if unread_counters_enabled() and (created or update_fields or state.unread_count is None):
+                    # The row lock above orders this recount against concurrent increments.
+                    state.unread_count = _unread_messages(user, room.pk, state.last_read_message_id).count()
+                    update_fields = [*(update_fields or ["last_read_at"]), "unread_count"]
+                if update_fields:
+                    state.save(update_fields=update_fields)
             return state
         except OperationalError:
             if attempt == max_retries - 1:
@@ -165,27 +376,174 @@ def mark_read(user, room: Room, last_read_message_id: int) -> MessageReadState:
     raise OperationalError("база данных заблокирована")
 
 
-def get_unread_counts(user) -> list[dict]:
-    """Get unread message counts for all rooms the user is a member of."""
+# ── Direct chats ───────────────────────────────────────────────────────
+
+def direct_chat_memberships(
+    user,
+    *,
+    before: tuple[Any, int] | None = None,
+    since: int | None = None,
+    limit: int | None = None,
+) -> list:
+    """DM memberships of ``user``, most recently active room first.
+
+    One query over the ``(kind, last_activity_at, id)`` room index. ``before``
+    is a keyset position ``(last_activity_at, room_id)`` from a previous page;
+    ``since`` keeps only memberships whose change number is above it.
+    """
     from roles.models import Membership
 
     memberships = (
-        Membership.objects.filter(user=user, is_banned=False)
-        .select_related("room")
+        Membership.objects.filter(user=user, room__kind=Room.Kind.DIRECT, is_banned=False)
+        .select_related("room", "room__last_message")
+        .order_by("-room__last_activity_at", "-room_id")
+    )
+    if before is not None:
+        activity_at, room_id = before
+        memberships = memberships.filter(
+            Q(room__last_activity_at__lt=activity_at)
+            | Q(room__last_activity_at=activity_at, room_id__lt=room_id)
+        )
+    if since is not None:
+        memberships = memberships.filter(sync_seq__gt=since)
+    if limit is not None:
+        memberships = memberships[:limit]
+    return list(memberships)
+
+
+def direct_chat_removals(user, *, since: int) -> list[str]:
+    """Slugs of DMs ``user`` lost (ban or deleted membership) after ``since``."""
+    from roles.models import Membership, MembershipTombstone
+
+    memberships = Membership.objects.filter(user=user, room__kind=Room.Kind.DIRECT)
+    banned = memberships.filter(is_banned=True, sync_seq__gt=since).values_list("room__slug", flat=True)
+    removed = set(banned)
+    removed.update(
+        MembershipTombstone.objects.filter(user_id=user.pk, sync_seq__gt=since).values_list("room_slug", flat=True)
+    )
+    if removed:
+        # A dialog that was removed and then re-created is reported as present.
+        removed.difference_update(
+            memberships.filter(is_banned=False, room__slug__in=removed).values_list("room__slug", flat=True)
+        )
+    return sorted(removed)
+
+
+def direct_peers(user, room_ids: Iterable[int]) -> dict[int, Any]:
+    """Map each direct room to its other participant, in one query."""
+    from roles.models import Membership
+
+    peers: dict[int, Any] = {}
+    rows = (
+        Membership.objects.filter(room_id__in=list(room_ids))
+        .exclude(user=user)
+        .select_related("user", "user__profile")
+        .order_by("room_id", "id")
     )
+    for membership in rows:
+        peers.setdefault(membership.room_id, membership.user)
+    return peers
+
+
+# ── Unread counts ──────────────────────────────────────────────────────
+
+def unread_counters_enabled() -> bool:
+    return bool(getattr(settings, "CHAT_UNREAD_COUNTERS_MATERIALIZED", False))
 
-    result = []
-    for ms in memberships:
-        room = ms.room
-        read_state = MessageReadState.objects.filter(user=user, room=room).first()
-        last_read_id = read_state.last_read_message_id if read_state else 0
-        unread = (
-            Message.objects
-            .filter(room=room, is_deleted=False, id__gt=(last_read_id or 0))
-            .exclude(user=user)
-            .count()
+
+def _unread_messages(user, room_id, last_read_id):
+    """Messages in a room newer than ``last_read_id`` written by someone else."""
+    return (
+        Message.objects
+        .filter(room_id=room_id, is_deleted=False, id__gt=Coalesce(last_read_id, Value(0)))
+        .exclude(user=user)
+    )
+
+
+def _unread_count_subquery(user, last_read_id) -> Subquery:
+    return Subquery(
+        _unread_messages(user, OuterRef("room_id"), last_read_id)
+        .order_by()
+        .values("room_id")
+        .annotate(total=Count("id"))
+        .values("total")[:1]
+    )
+
+
+def _bump_unread_counters(messages: Iterable[Message]) -> None:
+    per_sender: Counter[tuple[int, int | None]] = Counter(
+        (msg.room_id, msg.user_id) for msg in messages
+    )
+    for (room_id, sender_id), added in per_sender.items():
+        states = MessageReadState.objects.filter(room_id=room_id, unread_count__isnull=False)
+        if sender_id is not None:
+            states = states.exclude(user_id=sender_id)
+        states.update(unread_count=F("unread_count") + added)
+
+
+def _drop_unread_counters(message: Message) -> None:
+    states = MessageReadState.objects.filter(room_id=message.room_id, unread_count__gt=0).filter(
+        Q(last_read_message_id__lt=message.pk) | Q(last_read_message__isnull=True)
+    )
+    if message.user_id is not None:
+        states = states.exclude(user_id=message.user_id)
+    states.update(unread_count=Greatest(F("unread_count") - 1, Value(0)))
+
+
+def _materialized_unread_counts(user, memberships) -> list[dict]:
+    read_states = MessageReadState.objects.filter(user=user, room_id=OuterRef("room_id"))
+    rows = list(
+        memberships
+        .annotate(counter=Subquery(read_states.values("unread_count")[:1]))
+        .values_list("room_id", "room__slug", "counter")
+    )
+    missing = [room_id for room_id, _slug, counter in rows if counter is None]
+    if missing:
+        # Backfill once per (user, room) in a single statement; afterwards the
+        # counters are maintained on insert, delete and mark-read.
+        MessageReadState.objects.bulk_create(
+            [MessageReadState(user=user, room_id=room_id) for room_id in missing],
+            ignore_conflicts=True,
+        )
+        backfilled = MessageReadState.objects.filter(
+            user=user, room_id__in=missing, unread_count__isnull=True
+        )
+        backfilled.update(
+            unread_count=Coalesce(_unread_count_subquery(user, OuterRef("last_read_message_id")), Value(0))
+        )
+        counters = dict(
+            MessageReadState.objects.filter(user=user, room_id__in=missing)
+            .values_list("room_id", "unread_count")
         )
-        if unread > 0:
-            result.append({"roomSlug": room.slug, "unreadCount": unread})
+        rows = [
+            (room_id, slug, counters.get(room_id) if counter is None else counter)
+            for room_id, slug, counter in rows
+        ]
+    return [
+        {"roomSlug": slug, "unreadCount": counter}
+        for _room_id, slug, counter in rows
+        if counter
+    ]
 
-    return result
+
+def get_unread_counts(user) -> list[dict]:
+    """Get unread message counts for all rooms the user is a member of."""
+    from roles.models import Membership
+
+    memberships = Membership.objects.filter(user=user, is_banned=False)
+    if unread_counters_enabled():
+        return _materialized_unread_counts(user, memberships)
+
+    last_read = Subquery(
+        MessageReadState.objects
+        .filter(user=user, room_id=OuterRef("room_id"))
+        .values("last_read_message_id")[:1]
+    )
+    rows = (
+        memberships
+        .annotate(last_read_id=last_read)
+        .annotate(unread=Coalesce(_unread_count_subquery(user, OuterRef("last_read_id")), Value(0)))
+        .filter(unread__gt=0)
+        .values_list("room__slug", "unread")
+    )
+    return [{"roomSlug": slug, "unreadCount": unread} for slug, unread in rows]
@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from messages.models import Reaction
+
+from .services import recount_reactions
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def recount_reactions_of_deleted_user(sender, instance, **kwargs):
+    # The user's reactions go away in the cascade, past remove_reaction();
+    # rebuild the summaries of the messages they were on once it commits.
+    message_ids = list(Reaction.objects.filter(user=instance).values_list("message_id", flat=True).distinct())
+    if message_ids:
+        transaction.on_commit(lambda: recount_reactions(message_ids))
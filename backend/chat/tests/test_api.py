@@ -4,17 +4,30 @@
 
 
 import json
+from datetime import timedelta
+from io import StringIO
 from urllib.parse import parse_qs, urlparse
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.db import OperationalError
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
 from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 from chat import api
+from chat.services import (
+    MessageDraft,
+    add_reaction,
+    delete_message,
+    edit_message,
+    persist_messages,
+    record_new_messages,
+)
 from chat_app_django import media_utils as utils
 from messages.models import Message
-from roles.models import Membership
+from roles.models import Membership, MembershipTombstone
 from rooms.models import Room
 from rooms.services import ensure_membership
 
@@ -362,6 +375,31 @@ class RoomMessagesApiTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.json()['messages']), 1)
 
+    def test_room_messages_read_reaction_aggregates(self):
+        """Проверяет сценарий `test_room_messages_read_reaction_aggregates`."""
+        room = self._create_direct_room()
+        message = Message.objects.create(
+            username=self.owner.username, user=self.owner, room=room, message_content='hello',
+        )
+        add_reaction(self.owner, room, message.pk, '👍')
+        add_reaction(self.member, room, message.pk, '👍')
+        add_reaction(self.owner, room, message.pk, '🔥')
+
+        self.client.force_login(self.member)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/chat/rooms/{room.slug}/messages/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['messages'][0]['reactions'],
+            [
+                {'emoji': '👍', 'count': 2, 'me': True},
+                {'emoji': '🔥', 'count': 1, 'me': False},
+            ],
+        )
+        reaction_queries = [q['sql'] for q in queries.captured_queries if 'messages_reaction' in q['sql']]
+        self.assertEqual(len(reaction_queries), 1)
+        self.assertIn('user_id', reaction_queries[0])
+
     def test_room_messages_invalid_limit_returns_400(self):
         """Проверяет сценарий `test_room_messages_invalid_limit_returns_400`."""
         response = self.client.get('/api/chat/rooms/public/messages/?limit=bad')
@@ -482,6 +520,163 @@ class DirectApiTests(TestCase):
         self.assertEqual(items[0]['slug'], slug)
 
 
+    def _send(self, slug, author, content):
+        """Сохраняет сообщение через общий путь вставки."""
+        room = Room.objects.get(slug=slug)
+        return persist_messages(
+            [MessageDraft(room=room, user=author, username=author.username, content=content)]
+        )[0]
+
+    def test_direct_chats_ordered_by_last_activity_with_constant_queries(self):
+        """Список диалогов упорядочен по последней активности и строится константным числом запросов."""
+        self.client.force_login(self.owner)
+        first_slug = self._post_start('peer').json()['slug']
+        second_slug = self._post_start('other').json()['slug']
+        self._send(second_slug, self.other, 'older')
+        self._send(first_slug, self.peer, 'newest')
+
+        # Сессия, пользователь, диалоги, собеседники, audit-запись.
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/chat/direct/chats/')
+
+        items = response.json()['items']
+        self.assertEqual([item['slug'] for item in items], [first_slug, second_slug])
+        self.assertEqual(items[0]['lastMessage'], 'newest')
+        self.assertIsNotNone(items[0]['lastMessageAt'])
+        self.assertNotIn('pagination', response.json())
+
+    def test_direct_chats_keyset_pagination(self):
+        """Проверяет постраничную выдачу диалогов по курсору."""
+        self.client.force_login(self.owner)
+        slugs = [self._post_start(name).json()['slug'] for name in ('peer', 'other')]
+        self._send(slugs[0], self.owner, 'bump')
+
+        first_page = self.client.get('/api/chat/direct/chats/', {'limit': 1}).json()
+        self.assertEqual([item['slug'] for item in first_page['items']], [slugs[0]])
+        self.assertTrue(first_page['pagination']['hasMore'])
+
+        second_page = self.client.get(
+            '/api/chat/direct/chats/',
+            {'limit': 1, 'cursor': first_page['pagination']['nextCursor']},
+        ).json()
+        self.assertEqual([item['slug'] for item in second_page['items']], [slugs[1]])
+        self.assertFalse(second_page['pagination']['hasMore'])
+        self.assertIsNone(second_page['pagination']['nextCursor'])
+
+        bad = self.client.get('/api/chat/direct/chats/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(bad.status_code, 400)
+
+    def test_direct_chats_since_returns_only_changed_dialogs(self):
+        """Курсор `since` возвращает только диалоги, изменившиеся после синхронизации."""
+        self.client.force_login(self.owner)
+        first_slug = self._post_start('peer').json()['slug']
+        second_slug = self._post_start('other').json()['slug']
+
+        initial = self.client.get('/api/chat/direct/chats/', {'limit': 10}).json()
+        self.assertEqual({item['slug'] for item in initial['items']}, {first_slug, second_slug})
+        sync_cursor = initial['pagination']['syncCursor']
+        self.assertIsNotNone(sync_cursor)
+
+        unchanged = self.client.get('/api/chat/direct/chats/', {'since': sync_cursor}).json()
+        self.assertEqual(unchanged['items'], [])
+        self.assertEqual(unchanged['pagination']['syncCursor'], sync_cursor)
+
+        self._send(first_slug, self.peer, 'new activity')
+        changed = self.client.get('/api/chat/direct/chats/', {'since': sync_cursor}).json()
+        self.assertEqual([item['slug'] for item in changed['items']], [first_slug])
+        self.assertEqual(changed['items'][0]['lastMessage'], 'new activity')
+        self.assertNotEqual(changed['pagination']['syncCursor'], sync_cursor)
+
+        bad = self.client.get('/api/chat/direct/chats/', {'since': '%%%'})
+        self.assertEqual(bad.status_code, 400)
+
+    def _sync(self, since):
+        """Инкрементальная синхронизация списка диалогов."""
+        response = self.client.get('/api/chat/direct/chats/', {'since': since})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        return [item['slug'] for item in body['items']], body['removed'], body['pagination']['syncCursor']
+
+    def test_direct_chats_since_includes_late_commits(self):
+        """Запись со старым временем, закоммиченная после синхронизации, не теряется."""
+        self.client.force_login(self.owner)
+        first_slug = self._post_start('peer').json()['slug']
+        second_slug = self._post_start('other').json()['slug']
+        _items, _removed, cursor = self._sync(self.client.get(
+            '/api/chat/direct/chats/', {'limit': 10},
+        ).json()['pagination']['syncCursor'])
+
+        # Сообщение в первом диалоге получило время раньше, но закоммичено позже.
+        started_at = timezone.now()
+        self._send(second_slug, self.other, 'committed first')
+        items, _removed, cursor = self._sync(cursor)
+        self.assertEqual(items, [second_slug])
+        with transaction.atomic():
+            late = Message.objects.create(
+                room=Room.objects.get(slug=first_slug),
+                user=self.peer,
+                username=self.peer.username,
+                message_content='committed late',
+                date_added=started_at - timedelta(seconds=1),
+            )
+            record_new_messages([late])
+
+        items, removed, _cursor = self._sync(cursor)
+        self.assertEqual(items, [first_slug])
+        self.assertEqual(removed, [])
+
+    def test_direct_chats_since_tracks_edits_deletes_and_removals(self):
+        """Правка и удаление последнего сообщения, бан и выход двигают курсор синхронизации."""
+        self.client.force_login(self.owner)
+        first_slug = self._post_start('peer').json()['slug']
+        second_slug = self._post_start('other').json()['slug']
+        first_room = Room.objects.get(slug=first_slug)
+        last = self._send(first_slug, self.peer, 'hello')
+        cursor = self.client.get('/api/chat/direct/chats/', {'limit': 10}).json()['pagination']['syncCursor']
+
+        edit_message(self.peer, first_room, last.pk, 'hello again')
+        items, _removed, cursor = self._sync(cursor)
+        self.assertEqual(items, [first_slug])
+        self.assertEqual(self._sync(cursor), ([], [], cursor))
+
+        delete_message(self.peer, first_room, last.pk)
+        items, _removed, cursor = self._sync(cursor)
+        self.assertEqual(items, [first_slug])
+
+        membership = Membership.objects.get(room=first_room, user=self.owner)
+        membership.is_banned = True
+        membership.save(update_fields=['is_banned'])
+        Membership.objects.filter(room__slug=second_slug, user=self.owner).delete()
+        items, removed, cursor = self._sync(cursor)
+        self.assertEqual(items, [])
+        self.assertEqual(removed, sorted([first_slug, second_slug]))
+
+        self._post_start('other')
+        items, removed, _cursor = self._sync(cursor)
+        self.assertEqual(items, [second_slug])
+        self.assertEqual(removed, [])
+
+    def test_direct_chats_since_older_than_pruned_tombstones_requires_reload(self):
+        """После чистки надгробий курсор старше удалённых записей получает 410, свежий работает."""
+        self.client.force_login(self.owner)
+        first_slug = self._post_start('peer').json()['slug']
+        cursor = self.client.get('/api/chat/direct/chats/', {'limit': 10}).json()['pagination']['syncCursor']
+
+        Membership.objects.filter(room__slug=first_slug, user=self.owner).delete()
+        _items, removed, fresh_cursor = self._sync(cursor)
+        self.assertEqual(removed, [first_slug])
+        MembershipTombstone.objects.update(removed_at=timezone.now() - timedelta(days=60))
+
+        stdout = StringIO()
+        call_command('cleanup_membership_tombstones', days=30, stdout=stdout)
+
+        self.assertFalse(MembershipTombstone.objects.exists())
+        self.assertIn('Удалено 1 надгробий', stdout.getvalue())
+        stale = self.client.get('/api/chat/direct/chats/', {'since': cursor})
+        self.assertEqual(stale.status_code, 410)
+        self.assertEqual(self._sync(fresh_cursor)[:2], ([], []))
+
+
 class ChatApiExtraCoverageTests(TestCase):
     """Группирует тестовые сценарии класса `ChatApiExtraCoverageTests`."""
     def setUp(self):
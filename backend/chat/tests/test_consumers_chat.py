@@ -279,6 +279,30 @@ class ChatConsumerTests(TransactionTestCase):
         async_to_sync(run)()
         self.assertTrue(Message.objects.filter(room=self.private_room, message_content='hello').exists())
 
+    @override_settings(CHAT_MESSAGE_WRITE_BEHIND=True, CHAT_MESSAGE_BATCH_MAX_DELAY_MS=1)
+    def test_write_behind_mode_persists_and_broadcasts_reply(self):
+        """Write-behind mode keeps the broadcast payload including reply data."""
+        original = Message.objects.create(
+            username=self.owner.username,
+            user=self.owner,
+            room=self.private_room,
+            message_content='original',
+        )
+
+        async def run():
+            communicator, connected, _ = await self._connect('/ws/chat/private123/', user=self.member)
+            self.assertTrue(connected)
+            await communicator.send_to(text_data=json.dumps({'message': 'batched', 'replyTo': original.pk}))
+            event = json.loads(await communicator.receive_from(timeout=2))
+            self.assertEqual(event.get('message'), 'batched')
+            self.assertEqual(event['replyTo']['id'], original.pk)
+            self.assertEqual(event['replyTo']['content'], 'original')
+            await communicator.disconnect()
+
+        async_to_sync(run)()
+        saved = Message.objects.get(room=self.private_room, message_content='batched')
+        self.assertEqual(saved.reply_to_id, original.pk)
+
 
     def test_direct_message_notifies_participants_in_inbox_channel(self):
         """Проверяет сценарий `test_direct_message_notifies_participants_in_inbox_channel`."""
@@ -16,11 +16,15 @@ from django.test import TestCase, override_settings
 from django.utils import timezone
 
 from chat.constants import CHAT_CLOSE_IDLE_CODE
+from chat.sender import notify_profile_changed, profile_group_name
 from chat.consumers import (
+    CONNECT_LATENCY,
     ChatConsumer,
     _ws_connect_rate_limited,
 )
 from chat.utils import is_valid_room_slug as _is_valid_room_slug
+from chat_app_django.media_utils import build_profile_url
+from chat_app_django.state_store import local_set
 from direct_inbox.consumers import DirectInboxConsumer
 from presence.constants import PRESENCE_CLOSE_IDLE_CODE
 from presence.consumers import PresenceConsumer, _ws_connect_rate_limited as _presence_ws_connect_rate_limited
@@ -116,14 +120,15 @@ class ChatConsumerInternalTests(TestCase):
         """Проверяет сценарий `test_slug_validation_handles_invalid_regex`."""
         self.assertFalse(_is_valid_room_slug('private123'))
 
-    def test_get_profile_avatar_state_returns_empty_when_profile_missing(self):
-        """Проверяет сценарий `test_get_profile_avatar_state_returns_empty_when_profile_missing`."""
+    def test_load_sender_returns_empty_avatar_when_profile_missing(self):
+        """Проверяет сценарий `test_load_sender_returns_empty_avatar_when_profile_missing`."""
         consumer = self._consumer()
-        user_without_profile = SimpleNamespace()
+        self.user.profile.delete()
 
-        name, crop = async_to_sync(consumer._get_profile_avatar_state)(user_without_profile)
-        self.assertEqual(name, '')
-        self.assertIsNone(crop)
+        sender = async_to_sync(consumer._load_sender)(self.user)
+        self.assertEqual(sender.username, 'chat_internal_user')
+        self.assertEqual(sender.avatar_path, '')
+        self.assertIsNone(sender.avatar_crop)
 
     @override_settings(CHAT_MESSAGE_RATE_LIMIT=2, CHAT_MESSAGE_RATE_WINDOW=60)
     def test_rate_limit_counts_and_resets(self):
@@ -195,26 +200,12 @@ class ChatConsumerInternalTests(TestCase):
     def test_disconnect_discards_group_when_present(self):
         """Проверяет сценарий `test_disconnect_discards_group_when_present`."""
         consumer = self._consumer()
-        class _IdleTask:
-            """Группирует тестовые сценарии класса `_IdleTask`."""
-            def __init__(self):
-                """Проверяет сценарий `__init__`."""
-                self.cancel = Mock()
-
-            def __await__(self):
-                """Проверяет сценарий `__await__`."""
-                async def _done():
-                    """Проверяет сценарий `_done`."""
-                    return None
-
-                return _done().__await__()
-
-        idle_task = _IdleTask()
-        consumer._idle_task = idle_task
+        idle_timer = Mock()
+        consumer._idle_timer = idle_timer
 
         async_to_sync(consumer.disconnect)(1000)
 
-        idle_task.cancel.assert_called_once()
+        idle_timer.cancel.assert_called_once()
         consumer.channel_layer.group_discard.assert_awaited_once_with(
             'chat_private123',
             'chat.channel',
@@ -226,14 +217,8 @@ class ChatConsumerInternalTests(TestCase):
         consumer.chat_idle_timeout = 1
         consumer._last_activity = 0.0
 
-        async def _fast_sleep(_interval):
-            """Проверяет сценарий `_fast_sleep`."""
-            return None
-
-        with patch('chat.consumers.asyncio.sleep', new=_fast_sleep), patch(
-            'chat.consumers.time.monotonic', return_value=10.0
-        ):
-            async_to_sync(consumer._idle_watchdog)()
+        with patch('chat.consumers.time.monotonic', return_value=10.0):
+            self.assertIsNone(async_to_sync(consumer._idle_watchdog)())
 
         consumer.close.assert_awaited_once_with(code=CHAT_CLOSE_IDLE_CODE)
 
@@ -323,36 +308,37 @@ class PresenceConsumerInternalTests(TestCase):
         async_to_sync(consumer.presence_update)({'guests': 3})
         consumer.send.assert_awaited_once()
 
-    def test_heartbeat_stops_when_send_raises(self):
-        """Проверяет сценарий `test_heartbeat_stops_when_send_raises`."""
+    def test_heartbeat_rearms_until_send_raises(self):
+        """Heartbeat возвращает задержку следующего пинга и снимается при ошибке send."""
         consumer = self._consumer()
-        consumer.send = AsyncMock(side_effect=RuntimeError('boom'))
 
-        async def _fast_sleep(_interval):
-            """Проверяет сценарий `_fast_sleep`."""
-            return None
+        self.assertEqual(async_to_sync(consumer._heartbeat)(), 5)
+        consumer.send.assert_awaited_once_with(text_data=json.dumps({'type': 'ping'}))
 
-        with patch('presence.consumers.asyncio.sleep', new=_fast_sleep):
-            async_to_sync(consumer._heartbeat)()
-
-        consumer.send.assert_awaited_once()
+        consumer.send = AsyncMock(side_effect=RuntimeError('boom'))
+        self.assertIsNone(async_to_sync(consumer._heartbeat)())
 
     def test_idle_watchdog_closes_on_timeout(self):
         """Проверяет сценарий `test_idle_watchdog_closes_on_timeout`."""
         consumer = self._consumer()
         consumer._last_client_activity = 0.0
 
-        async def _fast_sleep(_interval):
-            """Проверяет сценарий `_fast_sleep`."""
-            return None
-
-        with patch('presence.consumers.asyncio.sleep', new=_fast_sleep), patch(
-            'presence.consumers.time.monotonic', return_value=10.0
-        ):
-            async_to_sync(consumer._idle_watchdog)()
+        with patch('presence.consumers.time.monotonic', return_value=10.0):
+            self.assertIsNone(async_to_sync(consumer._idle_watchdog)())
 
         consumer.close.assert_awaited_once_with(code=PRESENCE_CLOSE_IDLE_CODE)
 
+    def test_idle_watchdog_rearms_for_remaining_time(self):
+        """Активный сокет не закрывается; watchdog ждёт остаток таймаута."""
+        consumer = self._consumer()
+        consumer.presence_idle_timeout = 90
+        consumer._last_client_activity = 100.0
+
+        with patch('presence.consumers.time.monotonic', return_value=130.0):
+            self.assertEqual(async_to_sync(consumer._idle_watchdog)(), 60.0)
+
+        consumer.close.assert_not_awaited()
+
     def test_guest_cache_lifecycle(self):
         """Проверяет сценарий `test_guest_cache_lifecycle`."""
         consumer = self._consumer(user=AnonymousUser())
@@ -369,12 +355,13 @@ class PresenceConsumerInternalTests(TestCase):
     def test_add_guest_handles_invalid_existing_count(self):
         """Проверяет сценарий `test_add_guest_handles_invalid_existing_count`."""
         consumer = self._consumer(user=AnonymousUser())
-        cache.set(consumer.guest_cache_key, {'203.0.113.15': 'bad'}, timeout=300)
+        store = consumer._guest_store()
+        cache.set(store.counter_key('203.0.113.15'), 'bad', timeout=300)
 
         async_to_sync(consumer._add_guest)('203.0.113.15')
 
-        state = cache.get(consumer.guest_cache_key)
-        self.assertEqual(state['203.0.113.15']['count'], 1)
+        self.assertEqual(cache.get(store.counter_key('203.0.113.15')), 1)
+        self.assertEqual(async_to_sync(consumer._get_guest_count)(), 1)
 
     def test_user_presence_lifecycle_and_get_online_cleanup(self):
         """Проверяет сценарий `test_user_presence_lifecycle_and_get_online_cleanup`."""
@@ -395,52 +382,61 @@ class PresenceConsumerInternalTests(TestCase):
         self.assertEqual(async_to_sync(consumer._get_online)(), [])
 
     def test_get_online_and_guest_count_drop_expired_entries(self):
-        """Проверяет сценарий `test_get_online_and_guest_count_drop_expired_entries`."""
+        """Проверяет, что истёкшие ключи участников выпадают из онлайн-индекса."""
         consumer = self._consumer()
-        now = time.time()
-        cache.set(
-            consumer.cache_key,
-            {
-                'active': {'count': 1, 'last_seen': now - 1, 'grace_until': 0},
-                'expired': {'count': 1, 'last_seen': now - 999, 'grace_until': 0},
-                'grace': {'count': 0, 'last_seen': now - 1, 'grace_until': now + 10},
-                'broken': {'count': 'x', 'last_seen': now - 1, 'grace_until': 0},
-            },
-            timeout=300,
-        )
-        cache.set(
-            consumer.guest_cache_key,
-            {
-                '203.0.113.1': {'count': 1, 'last_seen': now - 1, 'grace_until': 0},
-                '203.0.113.2': {'count': 1, 'last_seen': now - 999, 'grace_until': 0},
-            },
-            timeout=300,
-        )
+        store = consumer._user_store()
+        guest_store = consumer._guest_store()
+        async def seed():
+            await store.aconnect('active', {'imageName': None, 'avatarCrop': None})
+            await store.aconnect('expired', {'imageName': None, 'avatarCrop': None})
+            await store.aconnect('grace', {'imageName': None, 'avatarCrop': None})
+            await store.adisconnect('grace', graceful=False)
+            await guest_store.aconnect('203.0.113.1')
+            await guest_store.aconnect('203.0.113.2')
+
+        async_to_sync(seed)()
+        # Имитируем истечение TTL ключей участников.
+        cache.delete(store.member_key('expired'))
+        cache.delete(guest_store.member_key('203.0.113.2'))
 
         online = async_to_sync(consumer._get_online)()
         self.assertEqual({row['username'] for row in online}, {'active', 'grace'})
         self.assertEqual(async_to_sync(consumer._get_guest_count)(), 1)
+        self.assertNotIn('expired', local_set(store.index_key).members())
+
+    def test_get_online_does_not_write_shared_state(self):
+        """Проверяет, что чтение онлайн-списка не перезаписывает кеш."""
+        consumer = self._consumer()
+        async_to_sync(consumer._add_user)(self.user)
+
+        with patch.object(cache, 'set') as cache_set:
+            online = async_to_sync(consumer._get_online)()
+
+        self.assertEqual([row['username'] for row in online], [self.user.username])
+        cache_set.assert_not_called()
 
     def test_touch_user_and_guest_paths(self):
         """Проверяет сценарий `test_touch_user_and_guest_paths`."""
         consumer = self._consumer()
+        store = consumer._user_store()
 
         async_to_sync(consumer._touch_user)(self.user)
-        state = cache.get(consumer.cache_key)
-        self.assertEqual(state[self.user.username]['count'], 1)
+        self.assertEqual(cache.get(store.counter_key(self.user.username)), 1)
+        self.assertIn(self.user.username, async_to_sync(store.aonline)())
 
+        guest_store = consumer._guest_store()
         async_to_sync(consumer._touch_guest)(None)
         async_to_sync(consumer._touch_guest)('203.0.113.20')
-        guest_state = cache.get(consumer.guest_cache_key)
-        self.assertEqual(guest_state['203.0.113.20']['count'], 1)
+        self.assertEqual(cache.get(guest_store.counter_key('203.0.113.20')), 1)
+        self.assertEqual(async_to_sync(guest_store.acount)(), 1)
 
     def test_disconnect_paths_for_guest_and_auth(self):
         """Проверяет сценарий `test_disconnect_paths_for_guest_and_auth`."""
         guest_consumer = self._consumer(user=AnonymousUser())
         guest_consumer.is_guest = True
         guest_consumer.group_name = guest_consumer.group_name_guest
-        guest_consumer._heartbeat_task = None
-        guest_consumer._idle_task = None
+        guest_consumer._heartbeat_timer = None
+        guest_consumer._idle_timer = None
         guest_consumer._remove_guest = AsyncMock()
         guest_consumer._broadcast = AsyncMock()
 
@@ -453,8 +449,8 @@ class PresenceConsumerInternalTests(TestCase):
         auth_consumer = self._consumer()
         auth_consumer.is_guest = False
         auth_consumer.group_name = auth_consumer.group_name_auth
-        auth_consumer._heartbeat_task = None
-        auth_consumer._idle_task = None
+        auth_consumer._heartbeat_timer = None
+        auth_consumer._idle_timer = None
         auth_consumer._remove_user = AsyncMock()
         auth_consumer._broadcast = AsyncMock()
 
@@ -470,12 +466,9 @@ class PresenceConsumerInternalTests(TestCase):
         guest_consumer._add_user = AsyncMock()
         guest_consumer._broadcast = AsyncMock()
 
-        def _fake_task(coro):
-            """Проверяет сценарий `_fake_task`."""
-            coro.close()
-            return AsyncMock(cancel=Mock())
+        wheel = Mock()
 
-        with patch('presence.consumers.asyncio.create_task', side_effect=_fake_task):
+        with patch('presence.consumers.get_timer_wheel', return_value=wheel):
             async_to_sync(guest_consumer.connect)()
 
         guest_consumer._add_guest.assert_awaited_once_with('session-presence-helper')
@@ -487,11 +480,13 @@ class PresenceConsumerInternalTests(TestCase):
         auth_consumer._add_user = AsyncMock()
         auth_consumer._broadcast = AsyncMock()
 
-        with patch('presence.consumers.asyncio.create_task', side_effect=_fake_task):
+        with patch('presence.consumers.get_timer_wheel', return_value=wheel):
             async_to_sync(auth_consumer.connect)()
 
         auth_consumer._add_guest.assert_not_awaited()
         auth_consumer._add_user.assert_awaited_once_with(self.user)
+        self.assertEqual(wheel.schedule.call_count, 4)
+        self.assertIs(auth_consumer._heartbeat_timer, wheel.schedule.return_value)
 
     def test_connect_closes_when_rate_limited(self):
         """Закрывает соединение Presence при превышении connect-rate-limit."""
@@ -562,6 +557,245 @@ class ChatConsumerDirectInboxTargetsTests(TestCase):
 
         self.assertEqual(targets, [])
 
+class ChatConsumerDirectBlockTests(TestCase):
+    """Группирует тестовые сценарии класса `ChatConsumerDirectBlockTests`."""
+    def setUp(self):
+        """Проверяет сценарий `setUp`."""
+        cache.clear()
+        self.owner = User.objects.create_user(username='block_owner', password='pass12345')
+        self.member = User.objects.create_user(username='block_member', password='pass12345')
+        self.room = Room.objects.create(
+            slug='dm_blockcheck',
+            name='blockcheck',
+            kind=Room.Kind.DIRECT,
+            direct_pair_key=f'{self.owner.pk}:{self.member.pk}',
+            created_by=self.owner,
+        )
+
+    def test_peer_is_resolved_from_pair_key_without_queries(self):
+        """Проверяет сценарий `test_peer_is_resolved_from_pair_key_without_queries`."""
+        consumer = ChatConsumer()
+        with self.assertNumQueries(0):
+            self.assertEqual(consumer._direct_peer_id(self.room, self.owner), self.member.pk)
+            self.assertEqual(consumer._direct_peer_id(self.room, self.member), self.owner.pk)
+
+    def test_block_check_costs_no_queries_in_steady_state(self):
+        """Проверяет сценарий `test_block_check_costs_no_queries_in_steady_state`."""
+        consumer = ChatConsumer()
+        consumer.direct_peer_id = self.member.pk
+        self.assertFalse(async_to_sync(consumer._is_blocked_in_dm)(self.room, self.owner))
+        with self.assertNumQueries(0):
+            self.assertFalse(async_to_sync(consumer._is_blocked_in_dm)(self.room, self.owner))
+
+    def test_block_check_sees_new_block(self):
+        """Проверяет сценарий `test_block_check_sees_new_block`."""
+        from friends.application.friend_service import block_user
+
+        consumer = ChatConsumer()
+        consumer.direct_peer_id = self.member.pk
+        self.assertFalse(async_to_sync(consumer._is_blocked_in_dm)(self.room, self.owner))
+        block_user(self.member, 'block_owner')
+        self.assertTrue(async_to_sync(consumer._is_blocked_in_dm)(self.room, self.owner))
+
+
+class ChatConsumerConnectBundleTests(TestCase):
+    """Проверяет, что connect собирает состояние сокета за один переход в поток."""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='bundle_owner', password='pass12345')
+        self.member = User.objects.create_user(username='bundle_member', password='pass12345')
+        self.outsider = User.objects.create_user(username='bundle_outsider', password='pass12345')
+        self.room = Room.objects.create(
+            slug='bundle-room', name='bundle', kind=Room.Kind.PRIVATE, created_by=self.owner
+        )
+        ensure_membership(self.room, self.owner, role_name='Owner')
+        ensure_membership(self.room, self.member, role_name='Member')
+        self.direct_room = Room.objects.create(
+            slug='dm_bundle',
+            name='dm',
+            kind=Room.Kind.DIRECT,
+            direct_pair_key=f'{self.owner.pk}:{self.member.pk}',
+            created_by=self.owner,
+        )
+        ensure_membership(self.direct_room, self.owner)
+        ensure_membership(self.direct_room, self.member)
+
+    def _consumer(self, user, slug):
+        consumer = ChatConsumer()
+        consumer.scope = {
+            'user': user,
+            'url_route': {'kwargs': {'room_name': slug}},
+            'headers': [(b'host', b'localhost:8000')],
+            'client': ('127.0.0.1', 50003),
+        }
+        consumer.channel_name = 'chat.bundle'
+        consumer.channel_layer = SimpleNamespace(group_add=AsyncMock(), group_discard=AsyncMock())
+        consumer.accept = AsyncMock()
+        consumer.close = AsyncMock()
+        consumer.chat_idle_timeout = 0
+        return consumer
+
+    def test_bundle_resolves_room_sender_and_peer(self):
+        """Комната, снимок отправителя и собеседник DM приходят одним вызовом."""
+        consumer = self._consumer(self.member, self.direct_room.slug)
+
+        bundle = async_to_sync(consumer._connect_bundle)(self.direct_room.slug, self.member)
+
+        self.assertIsNone(bundle.denied)
+        self.assertEqual(bundle.room.pk, self.direct_room.pk)
+        self.assertEqual(bundle.actor_username, 'bundle_member')
+        self.assertEqual(bundle.sender.username, 'bundle_member')
+        self.assertEqual(bundle.direct_peer_id, self.owner.pk)
+
+    def test_bundle_reports_denials(self):
+        """Отказы возвращаются с причиной и кодом закрытия."""
+        consumer = self._consumer(self.outsider, self.room.slug)
+        bundle = async_to_sync(consumer._connect_bundle)
+
+        self.assertEqual(bundle('bad/slug', self.outsider).denied, ('invalid_slug', 4404))
+        self.assertEqual(bundle('missing-room', self.outsider).denied, ('room_not_found', 4404))
+        self.assertEqual(bundle(self.room.slug, self.outsider).denied, ('forbidden', 4403))
+        with patch('chat.consumers._ws_connect_rate_limited', return_value=True):
+            self.assertEqual(bundle(self.room.slug, self.member).denied, ('rate_limited', 4429))
+
+    def test_warm_bundle_reads_only_room_and_profile(self):
+        """С прогретым кэшем прав bundle делает два запроса: комната и профиль."""
+        consumer = self._consumer(self.member, self.room.slug)
+        with patch('chat.consumers._ws_connect_rate_limited', return_value=False):
+            async_to_sync(consumer._connect_bundle)(self.room.slug, self.member)
+            with self.assertNumQueries(2):
+                bundle = async_to_sync(consumer._connect_bundle)(self.room.slug, self.member)
+        self.assertIsNone(bundle.denied)
+
+    def test_connect_uses_single_hop_and_records_latency(self):
+        """connect использует один sync-переход и пишет задержку в гистограмму."""
+        consumer = self._consumer(self.member, self.room.slug)
+        before = CONNECT_LATENCY.snapshot()['count']
+
+        with patch('chat.consumers.audit_ws_event'), patch('chat.consumers.db_to_async') as hop:
+            async_to_sync(consumer.connect)()
+
+        hop.assert_not_called()
+        consumer.accept.assert_awaited_once()
+        consumer.close.assert_not_awaited()
+        self.assertEqual(consumer.actor_username, 'bundle_member')
+        consumer.channel_layer.group_add.assert_any_await(f'chat_room_{self.room.pk}', 'chat.bundle')
+        consumer.channel_layer.group_add.assert_any_await(profile_group_name(self.member.pk), 'chat.bundle')
+        self.assertEqual(CONNECT_LATENCY.snapshot()['count'], before + 1)
+
+
+class ChatConsumerSenderSnapshotTests(TestCase):
+    """Проверяет снимок отправителя, который сокет держит между сообщениями."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='snapshot_user', password='pass12345')
+        self.room = Room.objects.create(slug='snapshot-room', name='snapshot', kind=Room.Kind.PUBLIC)
+
+    def _consumer(self):
+        consumer = ChatConsumer()
+        consumer.scope = {
+            'user': self.user,
+            'headers': [(b'host', b'localhost:8000')],
+            'scheme': 'ws',
+            'client': ('127.0.0.1', 50002),
+        }
+        consumer.room = self.room
+        consumer.room_name = self.room.slug
+        consumer.room_group_name = f'chat_room_{self.room.pk}'
+        consumer.channel_name = 'chat.snapshot'
+        consumer.channel_layer = SimpleNamespace(group_send=AsyncMock(), group_discard=AsyncMock())
+        consumer.send = AsyncMock()
+        consumer._can_write = AsyncMock(return_value=True)
+        consumer._rate_limited = AsyncMock(return_value=False)
+        consumer._slow_mode_limited = AsyncMock(return_value=False)
+        consumer.save_message = AsyncMock(
+            side_effect=lambda *args, **kwargs: SimpleNamespace(pk=1, date_added=timezone.now(), reply_to_id=None)
+        )
+        consumer.sender = async_to_sync(consumer._load_sender)(self.user)
+        return consumer
+
+    def _sent_profile_pic(self, consumer):
+        return json.loads(consumer.channel_layer.group_send.await_args.args[1]['frame'])['profile_pic']
+
+    def test_receive_uses_snapshot_without_profile_queries(self):
+        """Сообщение не читает профиль и не пересчитывает подпись URL аватара."""
+        consumer = self._consumer()
+
+        with patch('chat.sender.build_profile_url', wraps=build_profile_url) as build, patch(
+            'chat.consumers.audit_ws_event'
+        ):
+            with self.assertNumQueries(0):
+                async_to_sync(consumer.receive)(json.dumps({'message': 'one'}))
+                async_to_sync(consumer.receive)(json.dumps({'message': 'two'}))
+
+        build.assert_called_once()
+        args = consumer.save_message.await_args.args
+        self.assertEqual(args[2], 'snapshot_user')
+        self.assertEqual(args[3], self.user.profile.image.name)
+        self.assertIn('sig=', self._sent_profile_pic(consumer))
+
+    @override_settings(MEDIA_URL_TTL_SECONDS=120)
+    def test_avatar_url_is_resigned_before_expiry(self):
+        """Подпись URL аватара обновляется до истечения срока действия."""
+        consumer = self._consumer()
+
+        with patch('chat.sender.time.monotonic', return_value=1000.0):
+            first = consumer.sender.profile_url(consumer.scope)
+        with patch('chat.sender.time.monotonic', return_value=1059.0):
+            self.assertIs(consumer.sender.profile_url(consumer.scope), first)
+        with patch('chat.sender.time.monotonic', return_value=1060.0), patch(
+            'chat.sender.build_profile_url', return_value='/fresh'
+        ):
+            self.assertEqual(consumer.sender.profile_url(consumer.scope), '/fresh')
+
+    def test_profile_change_event_reloads_snapshot(self):
+        """Событие об изменении профиля перечитывает снимок из базы."""
+        consumer = self._consumer()
+        profile = self.user.profile
+        profile.username = 'renamed_user'
+        profile.avatar_crop_x = 0.1
+        profile.avatar_crop_y = 0.2
+        profile.avatar_crop_width = 0.5
+        profile.avatar_crop_height = 0.5
+        profile.save()
+
+        async_to_sync(consumer.chat_profile_changed)({'type': 'chat_profile_changed', 'userId': self.user.pk})
+        async_to_sync(consumer.receive)(json.dumps({'message': 'hi'}))
+
+        self.assertEqual(consumer.actor_username, 'renamed_user')
+        self.assertEqual(consumer.save_message.await_args.args[2], 'renamed_user')
+        event = json.loads(consumer.channel_layer.group_send.await_args.args[1]['frame'])
+        self.assertEqual(event['avatar_crop'], {'x': 0.1, 'y': 0.2, 'width': 0.5, 'height': 0.5})
+
+    def test_profile_save_notifies_open_sockets(self):
+        """Изменение аватара или имени рассылает событие в группу пользователя."""
+        profile = self.user.profile
+
+        with patch('chat.sender.notify_profile_changed') as notify:
+            with self.captureOnCommitCallbacks(execute=True):
+                profile.save(update_fields=['last_seen'])
+            notify.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                profile.avatar_crop_x = 0.3
+                profile.save(update_fields=['avatar_crop_x'])
+            notify.assert_called_once_with(self.user.pk)
+
+    def test_profile_changed_event_is_sent_to_user_group(self):
+        """Уведомление уходит в персональную группу пользователя через channel layer."""
+        layer = SimpleNamespace(group_send=AsyncMock())
+
+        with patch('chat.sender.get_channel_layer', return_value=layer):
+            notify_profile_changed(self.user.pk)
+
+        layer.group_send.assert_awaited_once_with(
+            profile_group_name(self.user.pk),
+            {'type': 'chat_profile_changed', 'userId': self.user.pk},
+        )
+
+
 class DirectInboxConsumerInternalTests(TestCase):
     """Группирует тестовые сценарии класса `DirectInboxConsumerInternalTests`."""
     def setUp(self):
@@ -650,22 +884,14 @@ class DirectInboxConsumerInternalTests(TestCase):
 
         heartbeat_consumer = self._consumer()
         heartbeat_consumer.send = AsyncMock(side_effect=RuntimeError('boom'))
-
-        async def _fast_sleep(_interval):
-            """Проверяет сценарий `_fast_sleep`."""
-            return None
-
-        with patch('direct_inbox.consumers.asyncio.sleep', new=_fast_sleep):
-            async_to_sync(heartbeat_consumer._heartbeat)()
+        self.assertIsNone(async_to_sync(heartbeat_consumer._heartbeat)())
 
         idle_consumer = self._consumer()
         idle_consumer.idle_timeout = 1
         idle_consumer._last_client_activity = 0.0
 
-        with patch('direct_inbox.consumers.asyncio.sleep', new=_fast_sleep), patch(
-            'direct_inbox.consumers.time.monotonic', return_value=10.0
-        ):
-            async_to_sync(idle_consumer._idle_watchdog)()
+        with patch('direct_inbox.consumers.time.monotonic', return_value=10.0):
+            self.assertIsNone(async_to_sync(idle_consumer._idle_watchdog)())
 
         idle_consumer.close.assert_awaited_once()
 
@@ -1,16 +1,22 @@
 # pyright: reportAttributeAccessIssue=false, reportGeneralTypeIssues=false
 """Тесты PresenceConsumer."""
 
+import asyncio
 import json
 from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
 
 from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
 from channels.routing import URLRouter
 from channels.testing import WebsocketCommunicator
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from django.test import TransactionTestCase
 
+from presence.broadcaster import PresenceBroadcaster
+from presence.consumers import PresenceConsumer
 from presence.routing import websocket_urlpatterns as presence_urlpatterns
 
 User = get_user_model()
@@ -21,6 +27,7 @@ class PresenceConsumerTests(TransactionTestCase):
     """Проверяет поведение presence websocket для гостей и авторизованных."""
 
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(username='presence_user', password='pass12345')
 
     async def _connect(self, user=None, ip='198.51.100.10', port=55000, session_key: str | None = None):
@@ -123,3 +130,203 @@ class PresenceConsumerTests(TransactionTestCase):
             self.assertEqual(close_code, 4401)
 
         async_to_sync(run)()
+
+    def test_join_is_published_as_sequenced_delta(self):
+        """Вход второго пользователя приходит первому как `presence.delta` с номером последовательности."""
+        other = User.objects.create_user(username='presence_other', password='pass12345')
+
+        async def run():
+            first, connected, _ = await self._connect(user=self.user, port=56001)
+            self.assertTrue(connected)
+            snapshot = json.loads(await first.receive_from(timeout=2))
+            self.assertIn('seq', snapshot)
+            # Первая публикация всегда полный снимок.
+            published = json.loads(await first.receive_from(timeout=2))
+            self.assertEqual(published['seq'], snapshot['seq'] + 1)
+            self.assertIn('online', published)
+            last_seq = published['seq']
+
+            second, connected, _ = await self._connect(user=other, port=56002)
+            self.assertTrue(connected)
+            await second.receive_from(timeout=2)
+
+            delta = None
+            while delta is None:
+                payload = json.loads(await first.receive_from(timeout=2))
+                self.assertEqual(payload['seq'], last_seq + 1)
+                last_seq = payload['seq']
+                if payload.get('type') == 'presence.delta' and any(
+                    row['username'] == other.username for row in payload['joins']
+                ):
+                    delta = payload
+            self.assertEqual(delta['leaves'], [])
+            self.assertNotIn('online', delta)
+
+            await second.disconnect()
+            await first.disconnect()
+
+        with patch.object(PresenceConsumer, 'presence_broadcast_window', 0.01):
+            async_to_sync(run)()
+
+    def test_resync_returns_full_snapshot(self):
+        """По запросу `resync` клиент получает полный снимок состояния."""
+
+        async def run():
+            communicator, connected, _ = await self._connect(user=self.user, port=56011)
+            self.assertTrue(connected)
+            await communicator.receive_from(timeout=2)
+            await communicator.send_to(text_data=json.dumps({'type': 'resync'}))
+            while True:
+                payload = json.loads(await communicator.receive_from(timeout=2))
+                if 'online' in payload and payload.get('type') is None:
+                    break
+            self.assertIn(self.user.username, [row['username'] for row in payload['online']])
+            self.assertIn('seq', payload)
+            await communicator.disconnect()
+
+        async_to_sync(run)()
+
+    def test_ping_touches_presence_without_thread_hop(self):
+        async def run():
+            communicator, connected, _ = await self._connect(self.user)
+            self.assertTrue(connected)
+            await communicator.receive_from(timeout=2)
+            with patch('presence.consumers._to_async', side_effect=AssertionError('thread hop')):
+                await communicator.send_to(text_data=json.dumps({'type': 'ping'}))
+                await communicator.send_to(text_data=json.dumps({'type': 'resync'}))
+                payload = json.loads(await communicator.receive_from(timeout=2))
+            self.assertEqual([row['username'] for row in payload['online']], ['presence_user'])
+            await communicator.disconnect()
+
+        async_to_sync(run)()
+
+    def test_profile_change_refreshes_published_avatar(self):
+        """После смены профиля рассылка несёт новый кроп аватара, а не закешированный при connect."""
+
+        async def run():
+            communicator, connected, _ = await self._connect(user=self.user, port=56021)
+            self.assertTrue(connected)
+            await communicator.receive_from(timeout=2)
+
+            def change_avatar():
+                profile = User.objects.get(pk=self.user.pk).profile
+                profile.avatar_crop_x = 0.5
+                profile.avatar_crop_y = 0.5
+                profile.avatar_crop_width = 0.25
+                profile.avatar_crop_height = 0.25
+                profile.save(
+                    update_fields=['avatar_crop_x', 'avatar_crop_y', 'avatar_crop_width', 'avatar_crop_height']
+                )
+
+            await database_sync_to_async(change_avatar)()
+            await communicator.send_to(text_data=json.dumps({'type': 'ping'}))
+            await communicator.send_to(text_data=json.dumps({'type': 'resync'}))
+            while True:
+                payload = json.loads(await communicator.receive_from(timeout=2))
+                if 'online' not in payload or payload.get('type') is not None:
+                    continue
+                current = next(row for row in payload['online'] if row['username'] == self.user.username)
+                if current['avatarCrop'] is not None:
+                    break
+            self.assertEqual(current['avatarCrop'], {'x': 0.5, 'y': 0.5, 'width': 0.25, 'height': 0.25})
+            await communicator.disconnect()
+
+        async_to_sync(run)()
+
+
+class PresenceBroadcasterTests(TransactionTestCase):
+    """Проверяет схлопывание изменений presence в одну публикацию."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_burst_of_requests_is_published_once(self):
+        consumer = PresenceConsumer()
+        consumer.cache_key = 'presence:auth:burst'
+        consumer.guest_cache_key = 'presence:guest:burst'
+        layer = SimpleNamespace(group_send=AsyncMock())
+        broadcaster = PresenceBroadcaster(
+            user_store=consumer._user_store(),
+            guest_store=consumer._guest_store(),
+            channel_layer=layer,
+            group_auth='auth',
+            group_guest='guest',
+            window=0.01,
+            snapshot_interval=60,
+        )
+
+        async def run():
+            store = consumer._user_store()
+            for index in range(20):
+                await store.aconnect(f'user-{index}', {'imageName': None, 'avatarCrop': None})
+                broadcaster.request()
+            await broadcaster._task
+            return layer.group_send.await_args_list
+
+        calls = async_to_sync(run)()
+        auth_events = [call.args[1] for call in calls if call.args[0] == 'auth']
+        self.assertEqual(len(auth_events), 1)
+        self.assertEqual(auth_events[0]['seq'], 1)
+        self.assertEqual(len(auth_events[0]['online']), 20)
+
+        async def second_round():
+            await consumer._user_store().adisconnect('user-0', graceful=True)
+            layer.group_send.reset_mock()
+            broadcaster.request()
+            await asyncio.wait_for(broadcaster._task, timeout=2)
+            return layer.group_send.await_args_list
+
+        calls = async_to_sync(second_round)()
+        auth_events = [call.args[1] for call in calls if call.args[0] == 'auth']
+        self.assertEqual(
+            auth_events,
+            [{'type': 'presence.delta', 'seq': 2, 'joins': [], 'leaves': ['user-0'], 'guests': 0}],
+        )
+
+    def test_touch_without_changes_is_not_republished(self):
+        """Повторный touch с теми же полями не рассылается как вход и не переписывает опубликованных."""
+        consumer = PresenceConsumer()
+        consumer.cache_key = 'presence:auth:touch'
+        consumer.guest_cache_key = 'presence:guest:touch'
+        layer = SimpleNamespace(group_send=AsyncMock())
+        broadcaster = PresenceBroadcaster(
+            user_store=consumer._user_store(),
+            guest_store=consumer._guest_store(),
+            channel_layer=layer,
+            group_auth='auth',
+            group_guest='guest',
+            window=0,
+            snapshot_interval=60,
+        )
+        payload = {'imageName': 'profile_pics/a.jpg', 'avatarCrop': None}
+
+        async def run():
+            store = consumer._user_store()
+            await store.aconnect('alice', payload)
+            await store.aconnect('bob', payload)
+            await broadcaster.flush()
+            layer.group_send.reset_mock()
+            await store.atouch('alice', dict(payload))
+            await store.aconnect('carol', payload)
+            with patch.object(cache, 'set', wraps=cache.set) as cache_set:
+                await broadcaster.flush()
+            return layer.group_send.await_args_list, [call.args[0] for call in cache_set.call_args_list]
+
+        calls, written_keys = async_to_sync(run)()
+        auth_events = [call.args[1] for call in calls if call.args[0] == 'auth']
+        self.assertEqual(
+            auth_events,
+            [
+                {
+                    'type': 'presence.delta',
+                    'seq': 2,
+                    'joins': [{'username': 'carol', 'imageName': 'profile_pics/a.jpg', 'avatarCrop': None}],
+                    'leaves': [],
+                    'guests': 0,
+                }
+            ],
+        )
+        self.assertEqual(
+            sorted(written_keys),
+            sorted(['presence:auth:touch:published', 'presence:auth:touch:published:member:carol']),
+        )
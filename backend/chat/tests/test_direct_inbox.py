@@ -1,6 +1,7 @@
 
 """Содержит тесты модуля `test_direct_inbox` подсистемы `chat`."""
 
+import threading
 
 from django.core.cache import cache
 from django.test import TestCase
@@ -108,3 +109,17 @@ class DirectInboxCacheTests(TestCase):
             get_unread_state(self.user_id),
             {'dialogs': 2, 'slugs': ['dm_a', 'dm_b'], 'counts': {'dm_a': 1, 'dm_b': 1}},
         )
+
+    def test_concurrent_mark_unread_does_not_lose_increments(self):
+        """Параллельные инкременты одного диалога не теряются."""
+        def worker():
+            for _ in range(25):
+                mark_unread(self.user_id, 'dm_a', ttl_seconds=60)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(get_unread_state(self.user_id)['counts'], {'dm_a': 200})
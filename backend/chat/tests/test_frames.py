@@ -0,0 +1,83 @@
+"""Tests for pre-encoded chat room broadcast frames."""
+
+import json
+from unittest.mock import AsyncMock, patch
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase
+
+from chat import frames
+from chat.consumers import ChatConsumer
+
+
+class ChatFramesTests(SimpleTestCase):
+    def _consumer(self, channel_name="chat.receiver"):
+        consumer = ChatConsumer()
+        consumer.channel_name = channel_name
+        consumer.send = AsyncMock()
+        consumer._last_activity = 0.0
+        return consumer
+
+    def test_framed_event_replaces_fields_with_encoded_frame(self):
+        event = {
+            "type": "chat_message",
+            "message": "привет / hi",
+            "username": "alice",
+            "profile_pic": "/api/auth/media/a.jpg?exp=1&sig=x",
+            "room": "public",
+            "id": 7,
+            "createdAt": "2024-01-01T00:00:00+00:00",
+        }
+
+        framed = frames.framed_event(event)
+
+        self.assertEqual(set(framed), {"type", "frame"})
+        self.assertEqual(json.loads(framed["frame"]), frames.message_payload(event))
+        self.assertIn("привет / hi", framed["frame"])
+
+    def test_framed_event_keeps_routing_keys_and_unknown_types(self):
+        typing = frames.framed_event(
+            {"type": "chat_typing", "username": "alice", "userId": 1, "sender_channel": "chat.sender"}
+        )
+        self.assertEqual(typing["sender_channel"], "chat.sender")
+        self.assertEqual(json.loads(typing["frame"]), {"type": "typing", "username": "alice", "userId": 1})
+
+        revoked = {"type": "chat_membership_revoked", "targetUserId": 3}
+        self.assertIs(frames.framed_event(revoked), revoked)
+
+    def test_consumers_forward_frame_without_re_encoding(self):
+        event = frames.framed_event(
+            {"type": "chat_reaction_add", "messageId": 1, "emoji": "👍", "userId": 2, "username": "bob"}
+        )
+        consumers = [self._consumer(f"chat.receiver.{i}") for i in range(3)]
+
+        with patch("chat.frames.encode_frame") as encode:
+            for consumer in consumers:
+                async_to_sync(consumer.chat_reaction_add)(event)
+
+        encode.assert_not_called()
+        for consumer in consumers:
+            self.assertIs(consumer.send.await_args.kwargs["text_data"], event["frame"])
+
+    def test_typing_frame_is_suppressed_for_sender_only(self):
+        event = frames.framed_event(
+            {"type": "chat_typing", "username": "alice", "userId": 1, "sender_channel": "chat.sender"}
+        )
+        sender = self._consumer("chat.sender")
+        receiver = self._consumer("chat.receiver")
+
+        async_to_sync(sender.chat_typing)(event)
+        async_to_sync(receiver.chat_typing)(event)
+
+        sender.send.assert_not_awaited()
+        receiver.send.assert_awaited_once_with(text_data=event["frame"])
+
+    def test_events_without_frame_are_encoded_by_receiver(self):
+        consumer = self._consumer()
+
+        async_to_sync(consumer.chat_message_delete)(
+            {"type": "chat_message_delete", "messageId": 5, "deletedBy": "alice"}
+        )
+
+        payload = json.loads(consumer.send.await_args.kwargs["text_data"])
+        self.assertEqual(payload, {"type": "message_delete", "messageId": 5, "deletedBy": "alice"})
@@ -0,0 +1,180 @@
+"""Tests for the per-room latest history page cache."""
+
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from chat import history_cache, services
+from chat.services import MessageDraft, persist_messages
+from messages.models import Message
+from rooms.models import Room
+
+User = get_user_model()
+
+
+@override_settings(CHAT_HISTORY_CACHE_TTL=60, CHAT_HISTORY_CACHE_SIZE=3, CHAT_MESSAGES_PAGE_SIZE=3)
+class HistoryCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.author = User.objects.create_user(username="history_author", password="pass12345")
+        self.reader = User.objects.create_user(username="history_reader", password="pass12345")
+        self.room = Room.objects.create(slug="history-room", name="History", kind=Room.Kind.PUBLIC)
+        self.url = f"/api/chat/rooms/{self.room.slug}/messages/"
+
+    def _send(self, *contents):
+        drafts = [
+            MessageDraft(
+                room=self.room,
+                user=self.author,
+                username=self.author.username,
+                content=content,
+            )
+            for content in contents
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            return persist_messages(drafts)
+
+    def _get(self, path=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path or self.url)
+        self.assertEqual(response.status_code, 200)
+        message_reads = [q["sql"] for q in queries.captured_queries if 'FROM "chat_message"' in q["sql"]]
+        return response.json(), message_reads
+
+    def test_latest_page_is_served_from_cache_after_first_read(self):
+        self._send("one", "two", "three", "four")
+
+        first, first_reads = self._get()
+        second, second_reads = self._get()
+
+        self.assertTrue(first_reads)
+        self.assertEqual(second_reads, [])
+        self.assertEqual([m["id"] for m in first["messages"]], [m["id"] for m in second["messages"]])
+        self.assertEqual(first["pagination"], second["pagination"])
+        self.assertEqual([m["content"] for m in second["messages"]], ["two", "three", "four"])
+        self.assertEqual(second["pagination"], {"limit": 3, "hasMore": True, "nextBefore": second["messages"][0]["id"]})
+
+    def test_new_messages_are_appended_without_refill(self):
+        self._send("one")
+        self._get()
+
+        self._send("two", "three", "four")
+        payload, reads = self._get()
+
+        self.assertEqual(reads, [])
+        self.assertEqual([m["content"] for m in payload["messages"]], ["two", "three", "four"])
+        self.assertTrue(payload["pagination"]["hasMore"])
+
+    def test_edit_delete_and_reactions_invalidate_page(self):
+        first, second = self._send("one", "two")
+        self._get()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            services.edit_message(self.author, self.room, first.pk, "edited")
+        payload, reads = self._get()
+        self.assertTrue(reads)
+        self.assertEqual(payload["messages"][0]["content"], "edited")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            services.delete_message(self.author, self.room, second.pk)
+        payload, _ = self._get()
+        self.assertEqual(payload["messages"][1]["content"], "[deleted]")
+
+        with patch("chat.services.has_permission", return_value=True), self.captureOnCommitCallbacks(execute=True):
+            services.add_reaction(self.reader, self.room, first.pk, "👍")
+        payload, _ = self._get()
+        self.assertEqual(payload["messages"][0]["reactions"], [{"emoji": "👍", "count": 1, "me": False}])
+
+    def test_reaction_me_flag_is_per_viewer(self):
+        (msg,) = self._send("one")
+        with patch("chat.services.has_permission", return_value=True), self.captureOnCommitCallbacks(execute=True):
+            services.add_reaction(self.reader, self.room, msg.pk, "👍")
+
+        anonymous, _ = self._get()
+        self.client.force_login(self.reader)
+        mine, reads = self._get()
+
+        self.assertFalse(anonymous["messages"][0]["reactions"][0]["me"])
+        self.assertTrue(mine["messages"][0]["reactions"][0]["me"])
+        self.assertEqual(reads, [])
+
+    def test_media_urls_are_signed_on_read(self):
+        self._send("one")
+        self._get()
+
+        cached = history_cache.get_page(self.room.pk)
+        self.assertEqual(cached["messages"][0]["profilePic"], self.author.profile.image.name)
+
+        with override_settings(MEDIA_URL_TTL_SECONDS=100):
+            early, _ = self._get()
+        with override_settings(MEDIA_URL_TTL_SECONDS=200):
+            late, _ = self._get()
+        self.assertIn("sig=", early["messages"][0]["profilePic"])
+        self.assertNotEqual(early["messages"][0]["profilePic"], late["messages"][0]["profilePic"])
+
+    def test_author_changes_show_on_cached_page(self):
+        (msg,) = self._send("one")
+        reply = Message.objects.create(
+            room=self.room, user=self.reader, username=self.reader.username, message_content="re", reply_to=msg
+        )
+        history_cache.invalidate_room(self.room.pk)
+        self._get()
+
+        profile = self.author.profile
+        profile.username = "renamed_author"
+        profile.avatar_crop_x = 0.1
+        profile.avatar_crop_y = 0.2
+        profile.avatar_crop_width = 0.3
+        profile.avatar_crop_height = 0.4
+        profile.save()
+        payload, reads = self._get()
+
+        self.assertEqual(reads, [])
+        first, second = payload["messages"]
+        self.assertEqual(first["username"], "renamed_author")
+        self.assertEqual(first["avatarCrop"], {"x": 0.1, "y": 0.2, "width": 0.3, "height": 0.4})
+        self.assertEqual(second["id"], reply.pk)
+        self.assertEqual(second["replyTo"]["username"], "renamed_author")
+        self.assertNotIn(history_cache.AUTHOR_FIELD, first)
+        self.assertNotIn(history_cache.AUTHOR_FIELD, second["replyTo"])
+
+    @override_settings(CHAT_ATTACHMENT_ALLOWED_TYPES=["text/plain"])
+    def test_attachment_upload_is_appended_with_its_files(self):
+        self._send("one")
+        self._get()
+        self.client.force_login(self.author)
+
+        with patch("chat.api.history_cache.invalidate_room") as invalidate, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f"/api/chat/rooms/{self.room.slug}/attachments/",
+                data={"files": [SimpleUploadedFile("note.txt", b"hello", content_type="text/plain")]},
+            )
+        self.assertEqual(response.status_code, 201)
+        invalidate.assert_not_called()
+
+        payload, reads = self._get()
+        self.assertEqual(reads, [])
+        self.assertEqual(payload["messages"][-1]["id"], response.json()["id"])
+        self.assertEqual([a["originalFilename"] for a in payload["messages"][-1]["attachments"]], ["note.txt"])
+
+    def test_cursor_requests_and_large_limits_bypass_cache(self):
+        messages = self._send("one", "two", "three", "four")
+        self._get()
+
+        _, reads = self._get(f"{self.url}?before={messages[-1].pk}")
+        self.assertTrue(reads)
+        payload, reads = self._get(f"{self.url}?limit=10")
+        self.assertTrue(reads)
+        self.assertEqual(len(payload["messages"]), 4)
+
+    def test_stale_generation_is_not_served(self):
+        self._send("one")
+        self._get()
+        history_cache.invalidate_room(self.room.pk)
+        self.assertIsNone(history_cache.get_page(self.room.pk))
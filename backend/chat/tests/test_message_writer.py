@@ -0,0 +1,96 @@
+"""Tests for the write-behind chat message batcher."""
+
+import asyncio
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from chat import message_writer
+from chat.message_writer import MessageWriteBehind
+from chat.services import MessageDraft
+from messages.models import Message
+from rooms.models import Room
+
+User = get_user_model()
+
+
+class MessageWriteBehindTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="writer_user", password="pass12345")
+        self.room = Room.objects.create(slug="writer-room", name="Writer", kind=Room.Kind.PUBLIC)
+
+    def _draft(self, content: str, **kwargs) -> MessageDraft:
+        return MessageDraft(room=self.room, user=self.user, username="writer_user", content=content, **kwargs)
+
+    def test_concurrent_submissions_are_flushed_as_one_ordered_batch(self):
+        batches = []
+        original = message_writer.persist_messages
+
+        def _spy(drafts):
+            batches.append(len(drafts))
+            return original(drafts)
+
+        async def run():
+            writer = MessageWriteBehind(max_batch_size=10, max_delay=0.05)
+            try:
+                return await asyncio.gather(*(writer.submit(self._draft(f"m{i}")) for i in range(5)))
+            finally:
+                await writer.close()
+
+        with patch("chat.message_writer.persist_messages", side_effect=_spy):
+            saved = async_to_sync(run)()
+
+        self.assertEqual(batches, [5])
+        self.assertEqual([msg.message_content for msg in saved], [f"m{i}" for i in range(5)])
+        self.assertEqual([msg.pk for msg in saved], sorted(msg.pk for msg in saved))
+        self.assertEqual(Message.objects.filter(room=self.room).count(), 5)
+
+    def test_batch_size_bounds_each_flush(self):
+        batches = []
+        original = message_writer.persist_messages
+
+        def _spy(drafts):
+            batches.append(len(drafts))
+            return original(drafts)
+
+        async def run():
+            writer = MessageWriteBehind(max_batch_size=2, max_delay=0.05)
+            try:
+                await asyncio.gather(*(writer.submit(self._draft(f"m{i}")) for i in range(5)))
+            finally:
+                await writer.close()
+
+        with patch("chat.message_writer.persist_messages", side_effect=_spy):
+            async_to_sync(run)()
+
+        self.assertEqual(batches, [2, 2, 1])
+
+    def test_failed_batch_falls_back_to_rows_and_reports_errors(self):
+        calls = []
+        original = message_writer.persist_messages
+
+        def _flaky(drafts):
+            calls.append(len(drafts))
+            if len(drafts) > 1 or drafts[0].content == "bad":
+                raise RuntimeError("insert failed")
+            return original(drafts)
+
+        async def run():
+            writer = MessageWriteBehind(max_batch_size=10, max_delay=0.05)
+            try:
+                return await asyncio.gather(
+                    writer.submit(self._draft("good")),
+                    writer.submit(self._draft("bad")),
+                    return_exceptions=True,
+                )
+            finally:
+                await writer.close()
+
+        with patch("chat.message_writer.persist_messages", side_effect=_flaky):
+            good, bad = async_to_sync(run)()
+
+        self.assertEqual(calls, [2, 1, 1])
+        self.assertEqual(good.message_content, "good")
+        self.assertIsInstance(bad, RuntimeError)
@@ -5,8 +5,9 @@ from unittest.mock import Mock
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.db import OperationalError
+from django.db import OperationalError, connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from chat import services
@@ -118,6 +119,65 @@ class ChatServicesTests(TestCase):
         services.remove_reaction(self.peer, self.room, msg.pk, "👍")
         self.assertFalse(Reaction.objects.filter(message=msg, user=self.peer, emoji="👍").exists())
 
+    def test_reaction_counts_follow_add_and_remove(self):
+        msg = self._message(user=self.owner)
+        with patch("chat.services.has_permission", return_value=True):
+            services.add_reaction(self.peer, self.room, msg.pk, "👍")
+            services.add_reaction(self.other, self.room, msg.pk, "🔥")
+            services.add_reaction(self.other, self.room, msg.pk, "👍")
+            services.add_reaction(self.other, self.room, msg.pk, "👍")
+
+        msg.refresh_from_db()
+        self.assertEqual(msg.reaction_counts, [["👍", 2], ["🔥", 1]])
+
+        services.remove_reaction(self.peer, self.room, msg.pk, "👍")
+        services.remove_reaction(self.peer, self.room, msg.pk, "👍")
+        services.remove_reaction(self.other, self.room, msg.pk, "🔥")
+        msg.refresh_from_db()
+        self.assertEqual(msg.reaction_counts, [["👍", 1]])
+
+    def test_reaction_counts_follow_user_deletion_cascade(self):
+        first = self._message(user=self.owner, content="first")
+        second = self._message(user=self.owner, content="second")
+        with patch("chat.services.has_permission", return_value=True):
+            services.add_reaction(self.peer, self.room, first.pk, "👍")
+            services.add_reaction(self.other, self.room, first.pk, "🔥")
+            services.add_reaction(self.other, self.room, first.pk, "👍")
+            services.add_reaction(self.other, self.room, second.pk, "🔥")
+
+        # Audit rows of the membership cascade would point at the deleted user.
+        with patch("roles.signals.audit_security_event"), self.captureOnCommitCallbacks(execute=True):
+            self.other.delete()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.reaction_counts, [["👍", 1]])
+        self.assertEqual(second.reaction_counts, [])
+
+    def test_recount_reactions_rebuilds_stale_summaries(self):
+        msg = self._message(user=self.owner)
+        Reaction.objects.create(message=msg, user=self.peer, emoji="👍")
+        Reaction.objects.create(message=msg, user=self.other, emoji="👍")
+        Message.objects.filter(pk=msg.pk).update(reaction_counts=[["👍", 5], ["🔥", 1]])
+
+        services.recount_reactions([msg.pk, 999999])
+
+        msg.refresh_from_db()
+        self.assertEqual(msg.reaction_counts, [["👍", 2]])
+
+    def test_my_reaction_emojis_groups_by_message(self):
+        first = self._message(user=self.owner)
+        second = self._message(user=self.owner)
+        with patch("chat.services.has_permission", return_value=True):
+            services.add_reaction(self.peer, self.room, first.pk, "👍")
+            services.add_reaction(self.peer, self.room, first.pk, "🔥")
+            services.add_reaction(self.other, self.room, second.pk, "👍")
+
+        with self.assertNumQueries(1):
+            mine = services.my_reaction_emojis(self.peer, [first.pk, second.pk])
+        self.assertEqual(mine, {first.pk: {"👍", "🔥"}})
+        self.assertEqual(services.my_reaction_emojis(Mock(is_authenticated=False), [first.pk]), {})
+
     def test_mark_read_requires_existing_message_and_is_monotonic(self):
         first = self._message(user=self.peer, content="one")
         second = self._message(user=self.peer, content="two")
@@ -191,3 +251,94 @@ class ChatServicesTests(TestCase):
         )
         services.mark_read(self.owner, self.room, own_message.pk)
         self.assertEqual(services.get_unread_counts(self.owner), [])
+
+    def test_persist_messages_bulk_inserts_in_order_and_attaches_reply(self):
+        target = self._message(user=self.peer, content="original")
+        other_room = Room.objects.create(slug="svc-room-3", name="Other", kind=Room.Kind.PRIVATE)
+        foreign = Message.objects.create(
+            username=self.peer.username, user=self.peer, room=other_room, message_content="foreign",
+        )
+        drafts = [
+            services.MessageDraft(room=self.room, user=self.owner, username="svc_owner", content="one"),
+            services.MessageDraft(
+                room=self.room, user=self.owner, username="svc_owner", content="two", reply_to_id=target.pk,
+            ),
+            services.MessageDraft(
+                room=self.room, user=self.owner, username="svc_owner", content="three", reply_to_id=foreign.pk,
+            ),
+        ]
+
+        with CaptureQueriesContext(connection) as ctx:
+            saved = services.persist_messages(drafts)
+        statements = [q["sql"] for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+        # Reply lookup, bulk insert, room last-message pointer.
+        self.assertEqual(len(statements), 3)
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.last_message_id, saved[-1].pk)
+        self.assertEqual(self.room.last_activity_at, saved[-1].date_added)
+
+        self.assertEqual([msg.message_content for msg in saved], ["one", "two", "three"])
+        self.assertEqual([msg.pk for msg in saved], sorted(msg.pk for msg in saved))
+        self.assertEqual(saved[1].reply_to_id, target.pk)
+        self.assertIsNone(saved[2].reply_to_id)
+        with self.assertNumQueries(0):
+            self.assertEqual(saved[1].reply_to.user.username, self.peer.username)
+
+    def _second_room(self):
+        room = Room.objects.create(slug="svc-room-4", name="Fourth", kind=Room.Kind.PRIVATE, created_by=self.owner)
+        ensure_membership(room, self.owner, role_name="Owner")
+        ensure_membership(room, self.peer, role_name="Member")
+        return room
+
+    def test_get_unread_counts_uses_single_query(self):
+        second_room = self._second_room()
+        first = self._message(user=self.peer, content="a")
+        self._message(user=self.peer, content="b")
+        self._message(user=self.owner, content="own")
+        Message.objects.create(username="svc_peer", user=self.peer, room=second_room, message_content="c")
+        services.mark_read(self.owner, self.room, first.pk)
+
+        with self.assertNumQueries(1):
+            items = services.get_unread_counts(self.owner)
+
+        self.assertEqual(
+            sorted(items, key=lambda item: item["roomSlug"]),
+            [
+                {"roomSlug": self.room.slug, "unreadCount": 1},
+                {"roomSlug": second_room.slug, "unreadCount": 1},
+            ],
+        )
+
+    @override_settings(CHAT_UNREAD_COUNTERS_MATERIALIZED=True)
+    def test_materialized_unread_counters_follow_insert_delete_and_read(self):
+        second_room = self._second_room()
+        self._message(user=self.peer, content="before backfill")
+        self.assertEqual(services.get_unread_counts(self.owner), [{"roomSlug": self.room.slug, "unreadCount": 1}])
+
+        saved = services.persist_messages(
+            [
+                services.MessageDraft(room=self.room, user=self.peer, username="svc_peer", content="one"),
+                services.MessageDraft(room=self.room, user=self.peer, username="svc_peer", content="two"),
+                services.MessageDraft(room=self.room, user=self.owner, username="svc_owner", content="own"),
+                services.MessageDraft(room=second_room, user=self.peer, username="svc_peer", content="dm"),
+            ]
+        )
+        with self.assertNumQueries(1):
+            items = services.get_unread_counts(self.owner)
+        self.assertEqual(
+            sorted(items, key=lambda item: item["roomSlug"]),
+            [
+                {"roomSlug": self.room.slug, "unreadCount": 3},
+                {"roomSlug": second_room.slug, "unreadCount": 1},
+            ],
+        )
+
+        services.delete_message(self.peer, self.room, saved[0].pk)
+        self.assertEqual(
+            MessageReadState.objects.get(user=self.owner, room=self.room).unread_count,
+            2,
+        )
+
+        services.mark_read(self.owner, self.room, saved[1].pk)
+        services.mark_read(self.owner, second_room, saved[3].pk)
+        self.assertEqual(services.get_unread_counts(self.owner), [])
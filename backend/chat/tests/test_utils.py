@@ -1,6 +1,7 @@
 # pyright: reportAttributeAccessIssue=false
 """Содержит тесты модуля `test_utils` подсистемы `chat`."""
 
+from unittest.mock import patch
 from urllib.parse import parse_qs, urlparse
 
 from django.test import RequestFactory, SimpleTestCase, override_settings
@@ -235,6 +236,20 @@ class BuildProfileUrlTests(_SignedUrlAssertionsMixin, SimpleTestCase):
         self.assertIsNone(url)
 
 
+    @override_settings(MEDIA_URL="/media/", MEDIA_SIGNING_KEY="test-key", MEDIA_URL_TTL_SECONDS=300)
+    def test_shared_expiry_builder_reuses_signatures_within_ttl(self):
+        """Сборщик для presence переиспользует подпись и не выдаёт ссылку дольше TTL."""
+        scope = self._scope(headers=[(b"host", b"example.com")], scheme="wss")
+        build = utils.profile_url_builder(scope, shared_expiry=True)
+        with patch("chat_app_django.media_utils.time.time", return_value=1_000_010):
+            first = build("profile_pics/a.jpg")
+            second = utils.profile_url_builder(scope, shared_expiry=True)("profile_pics/a.jpg")
+        self.assert_signed_media_url(first, "https://example.com")
+        self.assertEqual(first, second)
+        expiry = int(parse_qs(urlparse(first).query)["exp"][0])
+        self.assertLessEqual(expiry, 1_000_010 + 300)
+        self.assertGreater(expiry, 1_000_010 + 300 - 75)
+
 class BuildProfileUrlFromRequestTests(_SignedUrlAssertionsMixin, SimpleTestCase):
     """Группирует тестовые сценарии класса `BuildProfileUrlFromRequestTests`."""
 
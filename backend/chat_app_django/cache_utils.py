@@ -0,0 +1,70 @@
+"""Доступ к нативным структурам Redis за Django cache (hash, set, pipeline).
+
+У ``RedisCache`` нет публичного API для клиента, сериализатора и
+параметров пула. Всё обращение к его приватному устройству собрано в
+``RedisCacheAdapter``: при обновлении Django править нужно только его.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+
+
+class RedisCacheAdapter:
+    """Сервер, сериализация и ключи ``RedisCache`` для прямой работы с Redis."""
+
+    def __init__(self, backend: RedisCache):
+        self.backend = backend
+        self._client = backend._cache
+
+    @property
+    def servers(self) -> tuple[str, ...]:
+        return tuple(self._client._servers)
+
+    @property
+    def url(self) -> str:
+        # Запись всегда идёт на первый сервер, как в RedisCacheClient.
+        return self._client._servers[0]
+
+    def pool_options(self) -> dict[str, Any]:
+        """Параметры пула без ``parser_class``: он у Django синхронный."""
+        return {key: value for key, value in self._client._pool_options.items() if key != "parser_class"}
+
+    def dumps(self, value: Any) -> bytes:
+        return self._client._serializer.dumps(value)
+
+    def loads(self, raw: bytes) -> Any:
+        return self._client._serializer.loads(raw)
+
+    def make_key(self, key: str) -> str:
+        return self.backend.make_and_validate_key(key)
+
+    def timeout(self, timeout: int | None) -> int | None:
+        return self.backend.get_backend_timeout(timeout)
+
+    def sync_client(self, raw_key: str):
+        return self._client.get_client(raw_key, write=True)
+
+
+def redis_cache_adapter(alias: str = "default") -> RedisCacheAdapter | None:
+    """Адаптер для кеша ``alias`` или ``None``, если кеш не Redis."""
+    backend = caches[alias]
+    if not isinstance(backend, RedisCache):
+        return None
+    return RedisCacheAdapter(backend)
+
+
+def redis_client_for(key: str, alias: str = "default"):
+    """Возвращает ``(client, raw_key)`` для ключа кеша или ``None``, если кеш не Redis.
+
+    ``raw_key`` уже содержит префикс и версию Django cache, поэтому нативные
+    структуры живут в том же пространстве имён, что и обычные значения.
+    """
+    adapter = redis_cache_adapter(alias)
+    if adapter is None:
+        return None
+    raw_key = adapter.make_key(key)
+    return adapter.sync_client(raw_key), raw_key
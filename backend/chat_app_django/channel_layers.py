@@ -0,0 +1,152 @@
+"""Redis channel layer с локальным fan-out для больших групп.
+
+Для групп с префиксом из ``local_group_prefixes`` в Redis хранится не каждый
+сокет, а один relay-канал на воркер. ``group_send`` доходит до воркера одним
+сообщением с одним именем канала, а воркер сам раскладывает его по буферам
+своих локальных consumer'ов. Трафик Redis на сообщение становится
+O(воркеров), а не O(сокетов). Вызовы ``group_add``/``group_send`` в коде не
+меняются.
+
+Пока у группы есть локальные участники, relay продлевается в Redis по таймеру
+общего колеса (``timer_wheel``), а не только при новых join'ах.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import logging
+
+from channels_redis.core import RedisChannelLayer
+
+from .timer_wheel import TimerHandle, get_timer_wheel
+
+logger = logging.getLogger("chat_app_django.channel_layers")
+
+# Повтор продления relay после ошибки Redis, секунды.
+RELAY_RETRY_SECONDS = 5.0
+
+
+class LocalFanoutRedisChannelLayer(RedisChannelLayer):
+    def __init__(self, *args, local_group_prefixes=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.local_group_prefixes = tuple(local_group_prefixes)
+        # group -> локальные каналы этого процесса
+        self._local_members: dict[str, set[str]] = {}
+        # relay-канал -> group
+        self._relay_groups: dict[str, str] = {}
+        # group -> таймер продления relay; наличие ключа значит, что relay записан в Redis.
+        self._relay_timers: dict[str, TimerHandle] = {}
+        # group -> [lock, число ожидающих]; ZADD/ZREM relay одной группы идут строго по очереди.
+        self._relay_locks: dict[str, list] = {}
+
+    def _fans_out_locally(self, group: str, channel: str) -> bool:
+        if not self.local_group_prefixes or not group.startswith(self.local_group_prefixes):
+            return False
+        return "!" in channel and self.non_local_name(channel).endswith(f".{self.client_prefix}!")
+
+    def relay_channel(self, group: str) -> str:
+        """Process-local канал, которым воркер представлен в группе ``group``."""
+        digest = hashlib.sha1(group.encode("utf-8")).hexdigest()[:24]
+        return f"specific.{self.client_prefix}!fanout.{digest}"
+
+    @property
+    def relay_refresh_interval(self) -> float:
+        # Redis выкидывает участников старше group_expiry; продлеваем relay заранее.
+        return self.group_expiry / 2
+
+    @contextlib.asynccontextmanager
+    async def _relay_lock(self, group: str):
+        entry = self._relay_locks.get(group)
+        if entry is None:
+            entry = self._relay_locks[group] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._relay_locks[group]
+
+    async def group_add(self, group, channel):
+        if not self._fans_out_locally(group, channel):
+            return await super().group_add(group, channel)
+
+        assert self.valid_group_name(group), "Group name not valid"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        self._local_members.setdefault(group, set()).add(channel)
+        relay = self.relay_channel(group)
+        self._relay_groups[relay] = group
+        if group in self._relay_timers:
+            return
+        async with self._relay_lock(group):
+            # Пока ждали lock, relay мог записать другой join или удалить последний leave.
+            if group in self._relay_timers or not self._local_members.get(group):
+                return
+            await super().group_add(group, relay)
+            self._relay_timers[group] = get_timer_wheel().schedule(
+                self.relay_refresh_interval, lambda: self._refresh_relay(group)
+            )
+
+    async def _refresh_relay(self, group: str) -> float | None:
+        async with self._relay_lock(group):
+            if not self._local_members.get(group):
+                return None
+            try:
+                await super().group_add(group, self.relay_channel(group))
+            except Exception:
+                logger.warning("Failed to refresh fan-out relay for %s", group, exc_info=True)
+                return RELAY_RETRY_SECONDS
+        return self.relay_refresh_interval
+
+    async def group_discard(self, group, channel):
+        if not self._fans_out_locally(group, channel):
+            return await super().group_discard(group, channel)
+
+        members = self._local_members.get(group)
+        if members is None:
+            return
+        members.discard(channel)
+        if members:
+            return
+        del self._local_members[group]
+        async with self._relay_lock(group):
+            # Новый join во время ожидания lock снова держит relay.
+            if self._local_members.get(group):
+                return
+            relay = self.relay_channel(group)
+            self._relay_groups.pop(relay, None)
+            timer = self._relay_timers.pop(group, None)
+            if timer is not None:
+                timer.cancel()
+            await super().group_discard(group, relay)
+
+    def local_channels(self, channel) -> list[str]:
+        """Разворачивает relay-каналы в локальных участников их групп."""
+        channels = channel if isinstance(channel, list) else [channel]
+        expanded: list[str] = []
+        for name in channels:
+            group = self._relay_groups.get(name)
+            if group is not None:
+                expanded.extend(self._local_members.get(group, ()))
+            elif "!fanout." not in name:
+                expanded.append(name)
+            # Relay без локальных участников (последний сокет ушёл) отбрасывается.
+        return expanded
+
+    async def receive_single(self, channel):
+        message_channel, message = await super().receive_single(channel)
+        if "!" not in channel:
+            return message_channel, message
+        # Базовый receive() кладёт сообщение в буфер каждого канала из списка.
+        return self.local_channels(message_channel), message
+
+    async def flush(self):
+        self._local_members.clear()
+        self._relay_groups.clear()
+        for timer in self._relay_timers.values():
+            timer.cancel()
+        self._relay_timers.clear()
+        await super().flush()
@@ -0,0 +1,50 @@
+"""Непрозрачные курсоры постраничной выдачи.
+
+Курсор — base64 от компактного JSON. Keyset-курсор хранит позицию
+``(timestamp, id)``; модули поверх него кладут в payload свои поля.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from typing import Any
+
+from django.utils import timezone
+
+
+def encode_payload(payload: dict[str, Any]) -> str:
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_payload(value: str | None) -> dict[str, Any] | None:
+    """Разбирает курсор; ``None`` для пустого или повреждённого значения."""
+    if not value:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(value.encode("ascii")).decode("utf-8"))
+    except Exception:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+def encode_cursor(at: datetime, object_id: int) -> str:
+    return encode_payload({"ts": at.isoformat(), "id": int(object_id)})
+
+
+def decode_cursor(value: str | None) -> tuple[datetime, int] | None:
+    payload = decode_payload(value)
+    if payload is None:
+        return None
+    try:
+        object_id = int(payload.get("id"))
+        parsed = datetime.fromisoformat(str(payload.get("ts")))
+    except Exception:
+        return None
+
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone=dt_timezone.utc)
+    return parsed, object_id
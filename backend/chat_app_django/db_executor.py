@@ -0,0 +1,115 @@
+"""Ограниченный пул потоков для синхронного I/O WebSocket consumer'ов.
+
+``sync_to_async(thread_sensitive=True)`` выполняет все вызовы процесса в
+одном потоке, поэтому пинги presence, отметки inbox и отправка сообщений
+встают в одну очередь независимо от числа сокетов. Пул из
+``CONSUMER_DB_POOL_SIZE`` потоков выполняет их параллельно. Размер пула
+выбирается под бюджет соединений с БД: у каждого потока своё соединение.
+
+Для пула публикуются метрики ``db_pool.<name>.queue_depth`` (gauge: вызовы,
+ждущие свободного потока) и ``db_pool.<name>.wait`` (гистограмма ожидания,
+мс). При размере 0 пул выключен, и вызовы идут через прежний
+``thread_sensitive`` путь.
+"""
+
+from __future__ import annotations
+
+import functools
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
+
+from asgiref.sync import SyncToAsync, sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .metrics import gauge, histogram
+
+T = TypeVar("T")
+
+
+class DBExecutor:
+    """Пул потоков с метриками глубины очереди и времени ожидания."""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix=f"db-{name}",
+        )
+        self.queue_depth = gauge(f"db_pool.{name}.queue_depth")
+        self.wait = histogram(f"db_pool.{name}.wait")
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        submitted_at = time.perf_counter()
+        self.queue_depth.add(1)
+        queued = threading.Lock()
+        queued.acquire()
+
+        def leave_queue() -> None:
+            # Снимает вызов с очереди ровно один раз: из потока или при отмене.
+            try:
+                queued.release()
+            except RuntimeError:
+                return
+            self.queue_depth.add(-1)
+
+        def call():
+            leave_queue()
+            self.wait.observe((time.perf_counter() - submitted_at) * 1000)
+            # Как channels.db.database_sync_to_async: не держим протухшие соединения.
+            close_old_connections()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                close_old_connections()
+
+        try:
+            return await SyncToAsync(call, thread_sensitive=False, executor=self._executor)()
+        finally:
+            # Отменён до запуска: вызов из очереди так и не взяли.
+            leave_queue()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+_executor: DBExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def db_pool_size() -> int:
+    return max(0, int(getattr(settings, "CONSUMER_DB_POOL_SIZE", 0)))
+
+
+def get_db_executor() -> DBExecutor | None:
+    """Общий пул процесса или ``None``, если пул выключен."""
+    global _executor
+    size = db_pool_size()
+    if not size:
+        return None
+    with _executor_lock:
+        if _executor is None or _executor.max_workers != size:
+            if _executor is not None:
+                _executor.shutdown()
+            _executor = DBExecutor("consumers", size)
+        return _executor
+
+
+def db_to_async(func: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    """Асинхронная обёртка для синхронного I/O consumer'а.
+
+    Пригодна и как декоратор метода: ``self`` передаётся в ``func`` как есть.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        executor = get_db_executor()
+        if executor is None:
+            return await sync_to_async(func, thread_sensitive=True)(*args, **kwargs)
+        return await executor.run(func, *args, **kwargs)
+
+    return wrapper
@@ -8,9 +8,11 @@ from django.db import connections
 from django.db.utils import DatabaseError
 from django.utils import timezone
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 
+from . import metrics
+
 logger = logging.getLogger(__name__)
 
 
@@ -65,3 +67,16 @@ def ready(_request):
         "components": components,
     }
     return Response(payload, status=status_code)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def latency_metrics(_request):
+    """Returns this worker's latency histograms and gauges (staff only)."""
+    return Response(
+        {
+            "timestamp": timezone.now().isoformat(),
+            "histograms": metrics.snapshot_all(),
+            "gauges": metrics.snapshot_gauges(),
+        }
+    )
@@ -4,6 +4,8 @@ import hashlib
 import hmac
 import posixpath
 import time
+from collections.abc import Callable
+from functools import lru_cache
 from ipaddress import ip_address
 from urllib.parse import quote, unquote, urlencode, urlparse
 
@@ -291,6 +293,17 @@ def build_profile_url_from_request(request, image_name: str | None) -> str | Non
 
 def build_profile_url(scope, image_name: str | None) -> str | None:
     """Build absolute avatar URL for WebSocket ASGI scope."""
+    return profile_url_builder(scope)(image_name)
+
+
+def profile_url_builder(scope, *, shared_expiry: bool = False) -> Callable[[str | None], str | None]:
+    """Avatar URL builder for one WebSocket scope; headers are parsed once.
+
+    With ``shared_expiry`` the expiry is rounded down to a quarter of
+    ``MEDIA_URL_TTL_SECONDS`` and signatures are memoized, so signing many
+    avatars for many sockets (presence snapshots) costs one HMAC per image
+    per step instead of one per image per recipient.
+    """
     configured_base = _normalize_base_url(getattr(settings, "PUBLIC_BASE_URL", None))
     origin_base = _normalize_base_url(_first_value(_get_header(scope, b"origin")))
     forwarded_base = _base_from_host_and_scheme(
@@ -302,33 +315,48 @@ def build_profile_url(scope, image_name: str | None) -> str | None:
         "https" if scope.get("scheme") in {"wss", "https"} else "http",
     )
     trusted_hosts = {
-        _hostname_from_base(configured_base),
-        _hostname_from_base(origin_base),
-        _hostname_from_base(forwarded_base),
-        _hostname_from_base(host_base),
+        host
+        for host in (
+            _hostname_from_base(configured_base),
+            _hostname_from_base(origin_base),
+            _hostname_from_base(forwarded_base),
+            _hostname_from_base(host_base),
+        )
+        if host
     }
-    source = _coerce_media_source(image_name, trusted_hosts={h for h in trusted_hosts if h})
-    if not source:
-        return None
-
-    if source.startswith("http://") or source.startswith("https://"):
-        return source
-
-    path = _signed_media_url_path(source)
-    if not path:
-        return None
-
-    base = _pick_base_url(configured_base, forwarded_base, host_base, origin_base)
-    if base:
-        return f"{base}{path}"
+    prefix = _pick_base_url(configured_base, forwarded_base, host_base, origin_base) or ""
+    if not prefix:
+        server = scope.get("server") or (None, None)
+        host_from_server, port_from_server = server
+        if host_from_server:
+            host_value = str(host_from_server)
+            if ":" not in host_value and port_from_server:
+                host_value = f"{host_value}:{port_from_server}"
+            scheme = "https" if scope.get("scheme") in {"wss", "https"} else "http"
+            prefix = f"{scheme}://{host_value}"
+    sign = _shared_signed_media_url_path if shared_expiry else _signed_media_url_path
+
+    def build(image_name: str | None) -> str | None:
+        source = _coerce_media_source(image_name, trusted_hosts=trusted_hosts)
+        if not source:
+            return None
+        if source.startswith("http://") or source.startswith("https://"):
+            return source
+        path = sign(source)
+        if not path:
+            return None
+        return f"{prefix}{path}"
+
+    return build
+
+
+def _shared_signed_media_url_path(image_name: str) -> str | None:
+    ttl_seconds = int(getattr(settings, "MEDIA_URL_TTL_SECONDS", 300))
+    step = max(1, ttl_seconds // 4)
+    expiry = (int(time.time()) + ttl_seconds) // step * step
+    return _memoized_signed_media_url_path(image_name, expiry, _media_signing_key())
 
-    server = scope.get("server") or (None, None)
-    host_from_server, port_from_server = server
-    if host_from_server:
-        host_value = str(host_from_server)
-        if ":" not in host_value and port_from_server:
-            host_value = f"{host_value}:{port_from_server}"
-        scheme = "https" if scope.get("scheme") in {"wss", "https"} else "http"
-        return f"{scheme}://{host_value}{path}"
 
-    return path
+@lru_cache(maxsize=4096)
+def _memoized_signed_media_url_path(image_name: str, expiry: int, _signing_key: bytes) -> str | None:
+    return _signed_media_url_path(image_name, expires_at=expiry)
@@ -0,0 +1,119 @@
+"""Внутрипроцессные гистограммы задержек и gauge'и для горячих путей.
+
+Значения хранятся в памяти воркера и отдаются staff-пользователям через
+``/api/health/metrics/``. Этого хватает, чтобы сравнить задержку до и после
+изменения, не подключая внешнюю систему метрик.
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS_MS: tuple[float, ...] = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами бакетов (в миллисекундах)."""
+
+    def __init__(self, name: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS_MS):
+        self.name = name
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value_ms: float) -> None:
+        index = bisect.bisect_left(self.buckets, value_ms)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value_ms
+            self._count += 1
+
+    @contextmanager
+    def time(self):
+        """Замеряет время блока и записывает его в гистограмму."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe((time.perf_counter() - started) * 1000)
+
+    def snapshot(self) -> dict:
+        """Кумулятивные счётчики бакетов в стиле Prometheus (``le``)."""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+            count = self._count
+        cumulative = []
+        running = 0
+        for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+            running += bucket_count
+            cumulative.append({"le": bound, "count": running})
+        return {"count": count, "sumMs": round(total, 3), "buckets": cumulative}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._sum = 0.0
+            self._count = 0
+
+
+class Gauge:
+    """Текущее значение и максимум за время жизни процесса."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._value = 0
+        self._peak = 0
+
+    def add(self, delta: int) -> None:
+        with self._lock:
+            self._value += delta
+            self._peak = max(self._peak, self._value)
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"value": self._value, "peak": self._peak}
+
+
+_registry: dict[str, Histogram] = {}
+_gauges: dict[str, Gauge] = {}
+_registry_lock = threading.Lock()
+
+
+def histogram(name: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS_MS) -> Histogram:
+    """Возвращает гистограмму по имени, создавая её при первом обращении."""
+    with _registry_lock:
+        found = _registry.get(name)
+        if found is None:
+            found = _registry[name] = Histogram(name, buckets)
+        return found
+
+
+def gauge(name: str) -> Gauge:
+    with _registry_lock:
+        found = _gauges.get(name)
+        if found is None:
+            found = _gauges[name] = Gauge(name)
+        return found
+
+
+def snapshot_all() -> dict[str, dict]:
+    with _registry_lock:
+        histograms = list(_registry.values())
+    return {item.name: item.snapshot() for item in histograms}
+
+
+def snapshot_gauges() -> dict[str, dict]:
+    with _registry_lock:
+        gauges = list(_gauges.values())
+    return {item.name: item.snapshot() for item in gauges}
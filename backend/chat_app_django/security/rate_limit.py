@@ -1,10 +1,13 @@
-"""Централизованный сервис персистентного rate-limit на базе БД."""
+"""Централизованный сервис rate-limit: БД-бэкенд и атомарный бэкенд на кэше (Redis)."""
 
 from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import timedelta
+from typing import Protocol
 
+from django.conf import settings
+from django.core.cache import caches
 from django.db import IntegrityError, transaction
 from django.utils import timezone
 
@@ -27,6 +30,15 @@ class RateLimitPolicy:
         return max(1, int(self.window_seconds))
 
 
+class RateLimiter(Protocol):
+    """Контракт бэкенда rate-limit."""
+
+    @classmethod
+    def is_limited(cls, scope_key: str, policy: RateLimitPolicy) -> bool:
+        """Проверяет и увеличивает счетчик для ключа, возвращая факт блокировки."""
+        ...
+
+
 class DbRateLimiter:
     """Инкапсулирует атомарное rate-limit состояние в таблице БД."""
 
@@ -83,3 +95,72 @@ class DbRateLimiter:
         # Все попытки исчерпаны — fail-closed.
         return True
 
+
+class CacheRateLimiter:
+    """Атомарный fixed-window лимитер поверх Django cache.
+
+    Окно открывается через ``add`` (SET NX EX), счетчик растет через ``incr``
+    (INCR в Redis), поэтому без блокировок строк БД сохраняется та же семантика,
+    что и у ``DbRateLimiter``: не более ``limit`` событий за окно.
+    """
+
+    KEY_PREFIX = "ratelimit"
+    _MAX_RETRIES = 3
+
+    @classmethod
+    def _cache(cls):
+        return caches[getattr(settings, "RATE_LIMIT_CACHE_ALIAS", "default")]
+
+    @classmethod
+    def _key(cls, scope_key: str) -> str:
+        return f"{cls.KEY_PREFIX}:{scope_key}"
+
+    @classmethod
+    def is_limited(cls, scope_key: str, policy: RateLimitPolicy) -> bool:
+        """Проверяет и увеличивает счетчик для ключа, возвращая факт блокировки."""
+        if not scope_key:
+            return True
+
+        limit = policy.normalized_limit()
+        window = policy.normalized_window()
+        key = cls._key(scope_key)
+
+        try:
+            backend = cls._cache()
+            for _attempt in range(cls._MAX_RETRIES):
+                if backend.add(key, 1, timeout=window):
+                    return False
+                try:
+                    count = backend.incr(key)
+                except ValueError:
+                    # Окно истекло между add и incr — открываем новое.
+                    continue
+                return int(count) > limit
+        except Exception:
+            # Security-критичный fail-closed.
+            return True
+
+        return True
+
+
+_BACKENDS: dict[str, type[RateLimiter]] = {
+    "db": DbRateLimiter,
+    "cache": CacheRateLimiter,
+}
+
+
+def get_rate_limiter(scope_key: str) -> type[RateLimiter]:
+    """Выбирает бэкенд по самому длинному совпавшему префиксу scope-ключа."""
+    routes = getattr(settings, "RATE_LIMIT_BACKENDS", {}) or {}
+    best_prefix = ""
+    backend_name = getattr(settings, "RATE_LIMIT_DEFAULT_BACKEND", "db")
+    for prefix, name in routes.items():
+        if scope_key.startswith(prefix) and len(prefix) > len(best_prefix):
+            best_prefix = prefix
+            backend_name = name
+    return _BACKENDS.get(str(backend_name), DbRateLimiter)
+
+
+def is_rate_limited(scope_key: str, policy: RateLimitPolicy) -> bool:
+    """Проверяет лимит через бэкенд, настроенный для префикса ключа."""
+    return get_rate_limiter(scope_key).is_limited(scope_key=scope_key, policy=policy)
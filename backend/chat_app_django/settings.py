@@ -207,7 +207,21 @@ ALLOW_INMEMORY_CHANNEL_LAYER = env_bool("DJANGO_ALLOW_INMEMORY_CHANNEL_LAYER", D
 if REQUIRE_REDIS and not REDIS_URL:
     raise ImproperlyConfigured("REDIS_URL РґРѕР»Р¶РµРЅ Р±С‹С‚СЊ Р·Р°РґР°РЅ РІ production.")
 
-if REDIS_URL:
+# Groups fanned out per worker instead of per socket (see chat_app_django.channel_layers).
+CHANNEL_LAYER_LOCAL_FANOUT = env_bool("CHANNEL_LAYER_LOCAL_FANOUT", True)
+CHANNEL_LAYER_LOCAL_FANOUT_PREFIXES = env_list("CHANNEL_LAYER_LOCAL_FANOUT_PREFIXES", ["chat_room_"])
+
+if REDIS_URL and CHANNEL_LAYER_LOCAL_FANOUT:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "chat_app_django.channel_layers.LocalFanoutRedisChannelLayer",
+            "CONFIG": {
+                "hosts": [REDIS_URL],
+                "local_group_prefixes": CHANNEL_LAYER_LOCAL_FANOUT_PREFIXES,
+            },
+        }
+    }
+elif REDIS_URL:
     CHANNEL_LAYERS = {
         "default": {
             "BACKEND": "channels_redis.core.RedisChannelLayer",
@@ -370,8 +384,26 @@ CHAT_MESSAGE_RATE_LIMIT = int(os.getenv("CHAT_MESSAGE_RATE_LIMIT", "20"))
 CHAT_MESSAGE_RATE_WINDOW = int(os.getenv("CHAT_MESSAGE_RATE_WINDOW", "10"))
 CHAT_MESSAGES_PAGE_SIZE = int(os.getenv("CHAT_MESSAGES_PAGE_SIZE", "50"))
 CHAT_MESSAGES_MAX_PAGE_SIZE = int(os.getenv("CHAT_MESSAGES_MAX_PAGE_SIZE", "200"))
+CHAT_DIRECT_CHATS_MAX_PAGE_SIZE = env_int("CHAT_DIRECT_CHATS_MAX_PAGE_SIZE", 200, minimum=1)
+# Removed-dialog tombstones behind the direct chats `since` cursor (see cleanup_membership_tombstones).
+CHAT_SYNC_TOMBSTONE_RETENTION_DAYS = env_int("CHAT_SYNC_TOMBSTONE_RETENTION_DAYS", 30, minimum=1)
 CHAT_WS_IDLE_TIMEOUT = int(os.getenv("CHAT_WS_IDLE_TIMEOUT", "600"))
 CHAT_ROOM_SLUG_REGEX = os.getenv("CHAT_ROOM_SLUG_REGEX", r"^[A-Za-z0-9_-]{3,60}$")
+# Write-behind batching of WS chat messages (see chat.message_writer).
+CHAT_MESSAGE_WRITE_BEHIND = env_bool("CHAT_MESSAGE_WRITE_BEHIND", False)
+CHAT_MESSAGE_BATCH_MAX_SIZE = env_int("CHAT_MESSAGE_BATCH_MAX_SIZE", 100, minimum=1)
+CHAT_MESSAGE_BATCH_MAX_DELAY_MS = env_int("CHAT_MESSAGE_BATCH_MAX_DELAY_MS", 5, minimum=0)
+# Per-(user, room) unread counters kept in MessageReadState.unread_count.
+# When re-enabling after running with it off, reset the column to NULL first.
+CHAT_UNREAD_COUNTERS_MATERIALIZED = env_bool("CHAT_UNREAD_COUNTERS_MATERIALIZED", False)
+# Cached latest history page per room (see chat.history_cache); 0 disables.
+CHAT_HISTORY_CACHE_TTL = env_int("CHAT_HISTORY_CACHE_TTL", 0, minimum=0)
+CHAT_HISTORY_CACHE_SIZE = env_int("CHAT_HISTORY_CACHE_SIZE", CHAT_MESSAGES_PAGE_SIZE, minimum=1)
+# Cached block state per user pair, refreshed on Friendship changes; 0 disables.
+FRIENDS_BLOCK_CACHE_TTL = env_int("FRIENDS_BLOCK_CACHE_TTL", 300, minimum=0)
+# Thread pool for WS consumer DB/cache calls (see chat_app_django.db_executor);
+# 0 keeps the single thread_sensitive executor. Size it to the DB connection budget.
+CONSUMER_DB_POOL_SIZE = env_int("CONSUMER_DB_POOL_SIZE", 0, minimum=0)
 
 # в”Ђв”Ђ Attachments в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
 CHAT_ATTACHMENT_MAX_SIZE_MB = env_int("CHAT_ATTACHMENT_MAX_SIZE_MB", 10, minimum=1)
@@ -391,6 +423,10 @@ PRESENCE_GRACE = int(os.getenv("PRESENCE_GRACE", "5"))
 PRESENCE_HEARTBEAT = int(os.getenv("PRESENCE_HEARTBEAT", "20"))
 PRESENCE_IDLE_TIMEOUT = int(os.getenv("PRESENCE_IDLE_TIMEOUT", "90"))
 PRESENCE_TOUCH_INTERVAL = int(os.getenv("PRESENCE_TOUCH_INTERVAL", "30"))
+# Presence changes are coalesced over this window into one presence.delta.
+PRESENCE_BROADCAST_WINDOW_MS = env_int("PRESENCE_BROADCAST_WINDOW_MS", 250, minimum=0)
+# Full presence snapshot is published at least this often (seconds).
+PRESENCE_SNAPSHOT_INTERVAL = env_int("PRESENCE_SNAPSHOT_INTERVAL", 60, minimum=1)
 
 DIRECT_INBOX_UNREAD_TTL = int(os.getenv("DIRECT_INBOX_UNREAD_TTL", str(30 * 24 * 60 * 60)))
 DIRECT_INBOX_ACTIVE_TTL = int(os.getenv("DIRECT_INBOX_ACTIVE_TTL", "90"))
@@ -403,9 +439,37 @@ GROUP_MAX_INVITES_PER_ROOM = env_int("GROUP_MAX_INVITES_PER_ROOM", 50, minimum=1
 GROUP_MAX_PINNED_MESSAGES = env_int("GROUP_MAX_PINNED_MESSAGES", 100, minimum=1)
 GROUP_DEFAULT_MAX_MEMBERS = env_int("GROUP_DEFAULT_MAX_MEMBERS", 200000, minimum=1)
 
+# Per-process effective permission cache (0 disables it).
+ROLES_PERMISSION_CACHE_TTL = env_int("ROLES_PERMISSION_CACHE_TTL", 60, minimum=0)
+ROLES_PERMISSION_CACHE_MAX_ENTRIES = env_int("ROLES_PERMISSION_CACHE_MAX_ENTRIES", 50000, minimum=1)
+
 AUDIT_RETENTION_DAYS = env_int("AUDIT_RETENTION_DAYS", 180, minimum=1)
+# Row-by-row retention deletes run in batches of this size (see cleanup_audit_events).
+AUDIT_RETENTION_BATCH_SIZE = env_int("AUDIT_RETENTION_BATCH_SIZE", 5000, minimum=1)
+# Monthly audit partitions prepared ahead of time on PostgreSQL (see audit_partitions).
+AUDIT_PARTITION_MONTHS_AHEAD = env_int("AUDIT_PARTITION_MONTHS_AHEAD", 3, minimum=0)
 AUDIT_API_DEFAULT_LIMIT = env_int("AUDIT_API_DEFAULT_LIMIT", 50, minimum=1)
 AUDIT_API_MAX_LIMIT = env_int("AUDIT_API_MAX_LIMIT", 200, minimum=1)
+# Rows fetched per keyset page while streaming admin exports.
+AUDIT_EXPORT_CHUNK_SIZE = env_int("AUDIT_EXPORT_CHUNK_SIZE", 1000, minimum=1)
+# Serve /api/admin/audit/actions/ from hourly rollups built by compact_audit_rollups.
+AUDIT_ACTION_ROLLUPS = env_bool("AUDIT_ACTION_ROLLUPS", False)
+# Hours are rolled up only once they closed at least this long ago.
+AUDIT_ROLLUP_LAG_SECONDS = env_int("AUDIT_ROLLUP_LAG_SECONDS", 300, minimum=0)
+# Queue audit rows and insert them in batches from a background thread
+# (see auditlog.infrastructure.batch_writer) instead of one INSERT per event.
+AUDIT_BATCH_WRITER = env_bool("AUDIT_BATCH_WRITER", False)
+AUDIT_BATCH_QUEUE_SIZE = env_int("AUDIT_BATCH_QUEUE_SIZE", 10000, minimum=1)
+AUDIT_BATCH_MAX_SIZE = env_int("AUDIT_BATCH_MAX_SIZE", 500, minimum=1)
+AUDIT_BATCH_MAX_DELAY_MS = env_int("AUDIT_BATCH_MAX_DELAY_MS", 200, minimum=0)
+# How long a full queue may block a sync caller before the event is dropped.
+AUDIT_BATCH_BLOCK_MS = env_int("AUDIT_BATCH_BLOCK_MS", 50, minimum=0)
+# Per-action audit policy (see auditlog.domain.policy): successful high-volume
+# WS events are sampled, aggregated into per-minute counters or only logged.
+AUDIT_POLICY = env_bool("AUDIT_POLICY", False)
+# Extra "pattern=mode[:rate]" rules checked before the built-in ones.
+AUDIT_POLICY_RULES = env_list("AUDIT_POLICY_RULES", [])
+AUDIT_COUNTER_FLUSH_SECONDS = env_int("AUDIT_COUNTER_FLUSH_SECONDS", 10, minimum=1)
 
 if REDIS_URL:
     CACHES = {
@@ -422,6 +486,19 @@ else:
     }
 
 
+# Rate-limit backends per scope-key prefix ("db" or "cache"). Hot WS paths
+# go through the atomic cache limiter when a shared Redis cache is present.
+RATE_LIMIT_CACHE_ALIAS = os.getenv("RATE_LIMIT_CACHE_ALIAS", "default")
+RATE_LIMIT_DEFAULT_BACKEND = os.getenv("RATE_LIMIT_DEFAULT_BACKEND", "db")
+RATE_LIMIT_BACKENDS = {
+    prefix: "cache"
+    for prefix in env_list(
+        "RATE_LIMIT_CACHE_PREFIXES",
+        ["rl:chat:message", "rl:ws:connect", "rl:slow"] if REDIS_URL else [],
+    )
+}
+
+
 LOG_LEVEL = os.getenv("DJANGO_LOG_LEVEL", "INFO").upper()
 
 
@@ -0,0 +1,290 @@
+"""Асинхронный доступ к эфемерному состоянию в кеше без переходов в поток.
+
+Presence и direct inbox хранят состояние в Django cache, а пинги и heartbeat
+составляют основную часть WS-трафика. ``get_state_store()`` даёт consumer'ам
+async-интерфейс к тем же данным:
+
+* ``RedisStateStore`` ходит в Redis через ``redis.asyncio`` с теми же
+  ключами (префикс и версия Django cache) и той же сериализацией, что
+  ``RedisCache``. Синхронный код (broadcaster, REST, chat consumer) и
+  async-путь видят одни и те же значения;
+* ``LocalStateStore`` работает с локальным кешем процесса (dev, тесты):
+  операции в памяти выполняются прямо в event loop.
+
+Кроме обычных значений поддерживаются множества (индексы presence) и
+хеши ``поле -> int`` (счётчики непрочитанного).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import weakref
+from collections.abc import Iterable
+from typing import Any, Protocol
+
+from django.core.cache import caches
+from redis.exceptions import ResponseError
+
+from .cache_utils import RedisCacheAdapter, redis_cache_adapter
+
+
+class AsyncStateStore(Protocol):
+    async def get(self, key: str, default: Any = None) -> Any: ...
+
+    async def get_many(self, keys: Iterable[str]) -> dict[str, Any]: ...
+
+    async def set(self, key: str, value: Any, timeout: int | None) -> None: ...
+
+    async def add(self, key: str, value: Any, timeout: int | None) -> bool: ...
+
+    async def delete(self, key: str) -> None: ...
+
+    async def touch(self, key: str, timeout: int | None) -> bool: ...
+
+    async def incr(self, key: str, delta: int = 1) -> int: ...
+
+    async def set_add(self, key: str, *members: str) -> None: ...
+
+    async def set_remove(self, key: str, *members: str) -> None: ...
+
+    async def set_members(self, key: str) -> list[str]: ...
+
+    async def hash_get(self, key: str) -> dict[str, int]: ...
+
+    async def hash_delete(self, key: str, field: str, timeout: int) -> dict[str, int]: ...
+
+
+def _decode(raw: Any) -> str:
+    return raw.decode() if isinstance(raw, bytes) else str(raw)
+
+
+def _int_fields(raw: dict) -> dict[str, int]:
+    result: dict[str, int] = {}
+    for field, value in raw.items():
+        try:
+            result[_decode(field)] = int(value)
+        except (TypeError, ValueError):
+            continue
+    return result
+
+
+# ── Local ─────────────────────────────────────────────────────────────
+
+
+class LocalSet:
+    """Множество в памяти процесса; досягаемость та же, что у локального кеша."""
+
+    def __init__(self) -> None:
+        self._members: set[str] = set()
+        self._lock = threading.Lock()
+
+    def add(self, *members: str) -> None:
+        with self._lock:
+            self._members.update(members)
+
+    def discard(self, *members: str) -> None:
+        with self._lock:
+            self._members.difference_update(members)
+
+    def members(self) -> list[str]:
+        with self._lock:
+            return list(self._members)
+
+
+_local_sets: dict[str, LocalSet] = {}
+_local_sets_lock = threading.Lock()
+_local_hash_lock = threading.Lock()
+
+
+def local_set(name: str) -> LocalSet:
+    with _local_sets_lock:
+        found = _local_sets.get(name)
+        if found is None:
+            found = _local_sets[name] = LocalSet()
+        return found
+
+
+def local_hash_get(key: str) -> dict[str, int]:
+    value = caches["default"].get(key)
+    return _int_fields(value) if isinstance(value, dict) else {}
+
+
+def local_hash_incr(key: str, field: str, amount: int, timeout: int) -> dict[str, int]:
+    """HINCRBY + EXPIRE для локального кеша: хеш лежит в кеше как dict.
+
+    Синхронные ``local_hash_*`` нужны коду без event loop (REST, chat
+    consumer); ``LocalStateStore`` работает через них же.
+    """
+    with _local_hash_lock:
+        current = local_hash_get(key)
+        current[field] = current.get(field, 0) + amount
+        caches["default"].set(key, current, timeout=timeout)
+        return current
+
+
+def local_hash_delete(key: str, field: str, timeout: int) -> dict[str, int]:
+    with _local_hash_lock:
+        current = local_hash_get(key)
+        current.pop(field, None)
+        if current:
+            caches["default"].set(key, current, timeout=timeout)
+        else:
+            caches["default"].delete(key)
+        return current
+
+
+class LocalStateStore:
+    """Локальный кеш процесса; все операции синхронны и не блокируют loop надолго."""
+
+    @property
+    def _cache(self):
+        return caches["default"]
+
+    async def get(self, key, default=None):
+        return self._cache.get(key, default)
+
+    async def get_many(self, keys):
+        return self._cache.get_many(list(keys))
+
+    async def set(self, key, value, timeout):
+        self._cache.set(key, value, timeout=timeout)
+
+    async def add(self, key, value, timeout):
+        return bool(self._cache.add(key, value, timeout=timeout))
+
+    async def delete(self, key):
+        self._cache.delete(key)
+
+    async def touch(self, key, timeout):
+        return bool(self._cache.touch(key, timeout=timeout))
+
+    async def incr(self, key, delta=1):
+        return int(self._cache.incr(key, delta))
+
+    async def set_add(self, key, *members):
+        local_set(key).add(*members)
+
+    async def set_remove(self, key, *members):
+        local_set(key).discard(*members)
+
+    async def set_members(self, key):
+        return local_set(key).members()
+
+    async def hash_get(self, key):
+        return local_hash_get(key)
+
+    async def hash_delete(self, key, field, timeout):
+        return local_hash_delete(key, field, timeout)
+
+
+# ── Redis ─────────────────────────────────────────────────────────────
+
+
+class RedisStateStore:
+    """``redis.asyncio`` поверх сервера и пространства ключей ``RedisCache``."""
+
+    def __init__(self, cache: RedisCacheAdapter):
+        self._cache = cache
+        self._url = cache.url
+        self._options = cache.pool_options()
+        self._clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any] = weakref.WeakKeyDictionary()
+
+    def _client(self):
+        # Соединения redis.asyncio привязаны к event loop.
+        from redis import asyncio as redis_asyncio
+
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = redis_asyncio.Redis.from_url(self._url, **self._options)
+        return client
+
+    def _key(self, key: str) -> str:
+        return self._cache.make_key(key)
+
+    def _timeout(self, timeout):
+        return self._cache.timeout(timeout)
+
+    async def get(self, key, default=None):
+        value = await self._client().get(self._key(key))
+        return default if value is None else self._cache.loads(value)
+
+    async def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = await self._client().mget([self._key(key) for key in keys])
+        return {key: self._cache.loads(value) for key, value in zip(keys, values) if value is not None}
+
+    async def set(self, key, value, timeout):
+        timeout = self._timeout(timeout)
+        if timeout == 0:
+            await self._client().delete(self._key(key))
+            return
+        await self._client().set(self._key(key), self._cache.dumps(value), ex=timeout)
+
+    async def add(self, key, value, timeout):
+        timeout = self._timeout(timeout)
+        if timeout == 0:
+            # Как RedisCache.add с нулевым таймаутом: значение сразу истекает.
+            return not await self._client().exists(self._key(key))
+        return bool(await self._client().set(self._key(key), self._cache.dumps(value), ex=timeout, nx=True))
+
+    async def delete(self, key):
+        await self._client().delete(self._key(key))
+
+    async def touch(self, key, timeout):
+        timeout = self._timeout(timeout)
+        if timeout is None:
+            return bool(await self._client().persist(self._key(key)))
+        return bool(await self._client().expire(self._key(key), timeout))
+
+    async def incr(self, key, delta=1):
+        raw_key = self._key(key)
+        client = self._client()
+        if not await client.exists(raw_key):
+            raise ValueError(f"Key '{raw_key}' not found.")
+        try:
+            return int(await client.incr(raw_key, delta))
+        except ResponseError as exc:
+            # Как у локального кеша: нечисловое значение — ошибка значения.
+            raise ValueError(str(exc)) from exc
+
+    async def set_add(self, key, *members):
+        if members:
+            await self._client().sadd(self._key(key), *members)
+
+    async def set_remove(self, key, *members):
+        if members:
+            await self._client().srem(self._key(key), *members)
+
+    async def set_members(self, key):
+        return [_decode(raw) for raw in await self._client().smembers(self._key(key))]
+
+    async def hash_get(self, key):
+        return _int_fields(await self._client().hgetall(self._key(key)))
+
+    async def hash_delete(self, key, field, timeout):
+        raw_key = self._key(key)
+        async with self._client().pipeline(transaction=True) as pipe:
+            pipe.hdel(raw_key, field).expire(raw_key, timeout).hgetall(raw_key)
+            results = await pipe.execute()
+        return _int_fields(results[-1])
+
+
+_local_store = LocalStateStore()
+_redis_stores: dict[tuple, RedisStateStore] = {}
+
+
+def get_state_store() -> AsyncStateStore:
+    """Хранилище для кеша ``default``: Redis при RedisCache, иначе локальное."""
+    cache = redis_cache_adapter()
+    if cache is None:
+        return _local_store
+    # caches[] отдаёт отдельный экземпляр backend'а на контекст; store общий.
+    config = (cache.servers, cache.backend.key_prefix, cache.backend.version)
+    store = _redis_stores.get(config)
+    if store is None:
+        store = _redis_stores[config] = RedisStateStore(cache)
+    return store
@@ -0,0 +1,125 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+
+from asgiref.sync import async_to_sync
+from channels_redis.core import RedisChannelLayer
+from django.test import SimpleTestCase
+
+from chat_app_django.channel_layers import LocalFanoutRedisChannelLayer
+
+
+class LocalFanoutRedisChannelLayerTests(SimpleTestCase):
+    def setUp(self):
+        self.layer = LocalFanoutRedisChannelLayer(
+            hosts=["redis://localhost:6379/0"],
+            local_group_prefixes=["chat_room_"],
+        )
+        self.redis_add = self._patch("group_add")
+        self.redis_discard = self._patch("group_discard")
+        self.wheel = Mock()
+        wheel_patcher = patch("chat_app_django.channel_layers.get_timer_wheel", return_value=self.wheel)
+        wheel_patcher.start()
+        self.addCleanup(wheel_patcher.stop)
+
+    def _patch(self, name):
+        patcher = patch.object(RedisChannelLayer, name, new_callable=AsyncMock)
+        mock = patcher.start()
+        self.addCleanup(patcher.stop)
+        return mock
+
+    def _local(self, suffix):
+        return f"specific.{self.layer.client_prefix}!{suffix}"
+
+    def test_local_sockets_share_one_relay_membership(self):
+        relay = self.layer.relay_channel("chat_room_1")
+        for i in range(3):
+            async_to_sync(self.layer.group_add)("chat_room_1", self._local(f"c{i}"))
+
+        self.redis_add.assert_awaited_once_with("chat_room_1", relay)
+
+        async_to_sync(self.layer.group_discard)("chat_room_1", self._local("c0"))
+        async_to_sync(self.layer.group_discard)("chat_room_1", self._local("c1"))
+        self.redis_discard.assert_not_awaited()
+        async_to_sync(self.layer.group_discard)("chat_room_1", self._local("c2"))
+        self.redis_discard.assert_awaited_once_with("chat_room_1", relay)
+
+    def test_other_groups_and_foreign_channels_use_redis_membership(self):
+        async_to_sync(self.layer.group_add)("direct_inbox_user_1", self._local("c0"))
+        async_to_sync(self.layer.group_add)("chat_room_1", "specific.otherworker!c0")
+
+        self.assertEqual(
+            [call.args for call in self.redis_add.await_args_list],
+            [("direct_inbox_user_1", self._local("c0")), ("chat_room_1", "specific.otherworker!c0")],
+        )
+
+    def test_relay_message_is_expanded_to_local_members(self):
+        relay = self.layer.relay_channel("chat_room_1")
+        async_to_sync(self.layer.group_add)("chat_room_1", self._local("c0"))
+        async_to_sync(self.layer.group_add)("chat_room_1", self._local("c1"))
+        message = {"type": "chat_message", "frame": "{}"}
+
+        with patch.object(RedisChannelLayer, "receive_single", new_callable=AsyncMock) as receive:
+            receive.return_value = ([relay, self._local("direct")], message)
+            channels, received = async_to_sync(self.layer.receive_single)(
+                f"specific.{self.layer.client_prefix}!"
+            )
+
+        self.assertIs(received, message)
+        self.assertEqual(
+            sorted(channels),
+            sorted([self._local("c0"), self._local("c1"), self._local("direct")]),
+        )
+
+    def test_relay_without_local_members_is_dropped(self):
+        relay = self.layer.relay_channel("chat_room_1")
+        async_to_sync(self.layer.group_add)("chat_room_1", self._local("c0"))
+        async_to_sync(self.layer.group_discard)("chat_room_1", self._local("c0"))
+
+        self.assertEqual(self.layer.local_channels([relay]), [])
+
+    def test_join_during_relay_removal_keeps_the_relay(self):
+        relay = self.layer.relay_channel("chat_room_1")
+
+        async def scenario():
+            await self.layer.group_add("chat_room_1", self._local("c0"))
+            started, release = asyncio.Event(), asyncio.Event()
+
+            async def slow_discard(group, channel):
+                started.set()
+                await release.wait()
+
+            self.redis_discard.side_effect = slow_discard
+            leave = asyncio.create_task(self.layer.group_discard("chat_room_1", self._local("c0")))
+            await started.wait()
+            join = asyncio.create_task(self.layer.group_add("chat_room_1", self._local("c1")))
+            await asyncio.sleep(0)
+            release.set()
+            await asyncio.gather(leave, join)
+
+        async_to_sync(scenario)()
+
+        self.assertEqual(
+            [call.args for call in self.redis_add.await_args_list],
+            [("chat_room_1", relay), ("chat_room_1", relay)],
+        )
+        self.redis_discard.assert_awaited_once_with("chat_room_1", relay)
+        self.assertIn("chat_room_1", self.layer._relay_timers)
+        self.assertEqual(self.layer.local_channels([relay]), [self._local("c1")])
+
+    def test_relay_is_refreshed_by_timer_until_the_last_leave(self):
+        relay = self.layer.relay_channel("chat_room_1")
+        async_to_sync(self.layer.group_add)("chat_room_1", self._local("c0"))
+        delay, refresh = self.wheel.schedule.call_args.args
+        self.assertEqual(delay, self.layer.group_expiry / 2)
+
+        self.assertEqual(asyncio.run(refresh()), self.layer.group_expiry / 2)
+        self.assertEqual(self.redis_add.await_count, 2)
+        self.redis_add.assert_awaited_with("chat_room_1", relay)
+
+        self.redis_add.side_effect = ConnectionError("redis down")
+        self.assertEqual(asyncio.run(refresh()), 5.0)
+        self.redis_add.side_effect = None
+
+        async_to_sync(self.layer.group_discard)("chat_room_1", self._local("c0"))
+        self.wheel.schedule.return_value.cancel.assert_called_once_with()
+        self.assertIsNone(asyncio.run(refresh()))
@@ -0,0 +1,65 @@
+"""Tests for the bounded consumer DB executor."""
+
+import asyncio
+import threading
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, override_settings
+
+from chat_app_django.db_executor import db_to_async, get_db_executor
+
+
+class DBExecutorTests(SimpleTestCase):
+    @override_settings(CONSUMER_DB_POOL_SIZE=0)
+    def test_disabled_pool_falls_back_to_sync_to_async(self):
+        self.assertIsNone(get_db_executor())
+        self.assertEqual(async_to_sync(db_to_async(lambda a, b: a + b))(2, 3), 5)
+
+    @override_settings(CONSUMER_DB_POOL_SIZE=2)
+    def test_calls_run_in_parallel_up_to_pool_size(self):
+        barrier = threading.Barrier(2, timeout=5)
+        names = []
+
+        def blocking_call():
+            names.append(threading.current_thread().name)
+            barrier.wait()
+            return True
+
+        async def run():
+            return await asyncio.gather(db_to_async(blocking_call)(), db_to_async(blocking_call)())
+
+        self.assertEqual(async_to_sync(run)(), [True, True])
+        self.assertEqual(len(set(names)), 2)
+        self.assertTrue(all(name.startswith("db-consumers") for name in names))
+
+    @override_settings(CONSUMER_DB_POOL_SIZE=1)
+    def test_queue_depth_and_wait_metrics(self):
+        executor = get_db_executor()
+        release = threading.Event()
+        waits_before = executor.wait.snapshot()["count"]
+
+        async def run():
+            first = asyncio.ensure_future(db_to_async(release.wait)(5))
+            second = asyncio.ensure_future(db_to_async(lambda: "done")())
+            for _ in range(100):
+                if executor.queue_depth.value == 1:
+                    break
+                await asyncio.sleep(0.01)
+            depth_while_blocked = executor.queue_depth.value
+            release.set()
+            return depth_while_blocked, await first, await second
+
+        depth, first, second = async_to_sync(run)()
+
+        self.assertEqual(depth, 1)
+        self.assertEqual((first, second), (True, "done"))
+        self.assertEqual(executor.queue_depth.value, 0)
+        self.assertGreaterEqual(executor.queue_depth.snapshot()["peak"], 1)
+        self.assertEqual(executor.wait.snapshot()["count"], waits_before + 2)
+
+    def test_pool_is_rebuilt_when_size_changes(self):
+        with override_settings(CONSUMER_DB_POOL_SIZE=1):
+            small = get_db_executor()
+            self.assertIs(get_db_executor(), small)
+        with override_settings(CONSUMER_DB_POOL_SIZE=3):
+            self.assertEqual(get_db_executor().max_workers, 3)
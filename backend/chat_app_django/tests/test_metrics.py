@@ -0,0 +1,47 @@
+"""Tests for in-process latency histograms and their endpoint."""
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from chat_app_django.metrics import Histogram, histogram
+
+User = get_user_model()
+
+
+class HistogramTests(SimpleTestCase):
+    def test_snapshot_has_cumulative_buckets(self):
+        hist = Histogram("test.latency", buckets=(1, 10, 100))
+        for value in (0.5, 1, 5, 50, 500):
+            hist.observe(value)
+
+        snapshot = hist.snapshot()
+
+        self.assertEqual(snapshot["count"], 5)
+        self.assertEqual(snapshot["sumMs"], 556.5)
+        self.assertEqual(
+            snapshot["buckets"],
+            [
+                {"le": 1, "count": 2},
+                {"le": 10, "count": 3},
+                {"le": 100, "count": 4},
+                {"le": "+Inf", "count": 5},
+            ],
+        )
+
+    def test_registry_returns_same_histogram(self):
+        self.assertIs(histogram("test.registry"), histogram("test.registry"))
+
+
+class LatencyMetricsEndpointTests(TestCase):
+    def test_metrics_are_staff_only(self):
+        histogram("test.endpoint").observe(3)
+        user = User.objects.create_user(username="metrics_user", password="pass12345")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get("/api/health/metrics/").status_code, 403)
+
+        user.is_staff = True
+        user.save(update_fields=["is_staff"])
+        response = self.client.get("/api/health/metrics/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("test.endpoint", response.json()["histograms"])
@@ -1,9 +1,17 @@
 from unittest.mock import patch
 
+from django.core.cache import cache
 from django.db import IntegrityError
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
-from chat_app_django.security.rate_limit import DbRateLimiter, RateLimitPolicy
+from chat_app_django.security.rate_limit import (
+    CacheRateLimiter,
+    DbRateLimiter,
+    RateLimitPolicy,
+    get_rate_limiter,
+    is_rate_limited,
+)
+from users.models import SecurityRateLimitBucket
 
 
 class RateLimitServiceTests(TestCase):
@@ -31,3 +39,53 @@ class RateLimitServiceTests(TestCase):
             side_effect=RuntimeError("boom"),
         ):
             self.assertTrue(DbRateLimiter.is_limited(scope_key="auth:login:5.6.7.8", policy=policy))
+
+
+class CacheRateLimiterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_within_window_like_db_limiter(self):
+        policy = RateLimitPolicy(limit=2, window_seconds=10)
+        self.assertFalse(CacheRateLimiter.is_limited(scope_key="rl:chat:message:1", policy=policy))
+        self.assertFalse(CacheRateLimiter.is_limited(scope_key="rl:chat:message:1", policy=policy))
+        self.assertTrue(CacheRateLimiter.is_limited(scope_key="rl:chat:message:1", policy=policy))
+        self.assertFalse(CacheRateLimiter.is_limited(scope_key="rl:chat:message:2", policy=policy))
+
+    def test_expired_window_starts_new_count(self):
+        policy = RateLimitPolicy(limit=1, window_seconds=10)
+        self.assertFalse(CacheRateLimiter.is_limited(scope_key="rl:slow:1:1", policy=policy))
+        self.assertTrue(CacheRateLimiter.is_limited(scope_key="rl:slow:1:1", policy=policy))
+        cache.delete(CacheRateLimiter._key("rl:slow:1:1"))
+        self.assertFalse(CacheRateLimiter.is_limited(scope_key="rl:slow:1:1", policy=policy))
+
+    def test_key_vanishing_between_add_and_incr_retries(self):
+        policy = RateLimitPolicy(limit=5, window_seconds=10)
+        with patch.object(cache, "add", side_effect=[False, True]), patch.object(
+            cache, "incr", side_effect=ValueError("expired")
+        ):
+            self.assertFalse(CacheRateLimiter.is_limited(scope_key="rl:ws:connect:chat:ip", policy=policy))
+
+    def test_empty_key_and_cache_errors_fail_closed(self):
+        policy = RateLimitPolicy(limit=5, window_seconds=10)
+        self.assertTrue(CacheRateLimiter.is_limited(scope_key="", policy=policy))
+        with patch.object(cache, "add", side_effect=ConnectionError("redis down")):
+            self.assertTrue(CacheRateLimiter.is_limited(scope_key="rl:chat:message:1", policy=policy))
+
+
+class RateLimiterRoutingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(RATE_LIMIT_BACKENDS={"rl:ws:connect": "cache", "rl:ws:connect:presence": "db"})
+    def test_longest_prefix_wins_and_default_is_db(self):
+        self.assertIs(get_rate_limiter("rl:ws:connect:chat:1.2.3.4"), CacheRateLimiter)
+        self.assertIs(get_rate_limiter("rl:ws:connect:presence:1.2.3.4"), DbRateLimiter)
+        self.assertIs(get_rate_limiter("auth:login:1.2.3.4"), DbRateLimiter)
+
+    @override_settings(RATE_LIMIT_BACKENDS={"rl:chat:message": "cache"})
+    def test_cache_routed_scope_does_not_touch_bucket_table(self):
+        policy = RateLimitPolicy(limit=1, window_seconds=10)
+        self.assertFalse(is_rate_limited("rl:chat:message:7", policy))
+        self.assertTrue(is_rate_limited("rl:chat:message:7", policy))
+        self.assertFalse(SecurityRateLimitBucket.objects.filter(scope_key="rl:chat:message:7").exists())
@@ -0,0 +1,131 @@
+"""Tests for the async state store used by presence and inbox consumers."""
+
+from unittest.mock import patch
+
+import fakeredis
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.cache.backends.redis import RedisCache
+from django.test import SimpleTestCase
+
+from chat_app_django.cache_utils import RedisCacheAdapter, redis_client_for
+from chat_app_django.state_store import LocalStateStore, RedisStateStore, get_state_store, local_hash_incr
+from presence.store import PresenceStore
+
+
+class LocalStateStoreTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = LocalStateStore()
+
+    def test_values_are_shared_with_sync_cache(self):
+        async def run():
+            await self.store.set("state:a", {"x": 1}, timeout=60)
+            added = await self.store.add("state:a", {"x": 2}, timeout=60)
+            return added, await self.store.get_many(["state:a", "state:missing"])
+
+        added, found = async_to_sync(run)()
+
+        self.assertFalse(added)
+        self.assertEqual(found, {"state:a": {"x": 1}})
+        self.assertEqual(cache.get("state:a"), {"x": 1})
+
+    def test_incr_missing_key_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            async_to_sync(self.store.incr)("state:counter")
+
+    def test_sets_and_hashes(self):
+        local_hash_incr("state:hash", "dm_a", 2, 60)
+        local_hash_incr("state:hash", "dm_b", 1, 60)
+
+        async def run():
+            await self.store.set_add("state:set", "a", "b")
+            await self.store.set_remove("state:set", "a")
+            after_delete = await self.store.hash_delete("state:hash", "dm_a", 60)
+            return await self.store.set_members("state:set"), after_delete
+
+        members, counts = async_to_sync(run)()
+
+        self.assertEqual(members, ["b"])
+        self.assertEqual(counts, {"dm_b": 1})
+        self.assertEqual(cache.get("state:hash"), {"dm_b": 1})
+
+    def test_default_cache_uses_local_store(self):
+        self.assertIsInstance(get_state_store(), LocalStateStore)
+
+
+class RedisStateStoreTests(SimpleTestCase):
+    """The adapter and the async store against an in-memory Redis server."""
+
+    def setUp(self):
+        server = fakeredis.FakeServer()
+        self.backend = RedisCache(
+            "redis://127.0.0.1:6379/0",
+            {"KEY_PREFIX": "app", "OPTIONS": {"connection_class": fakeredis.FakeConnection, "server": server}},
+        )
+        self.adapter = RedisCacheAdapter(self.backend)
+        self.store = RedisStateStore(self.adapter)
+        # redis.asyncio connections are per event loop; async_to_sync runs a new loop each time.
+        patcher = patch.object(
+            RedisStateStore, "_client", side_effect=lambda: fakeredis.FakeAsyncRedis(server=server)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_adapter_exposes_cache_server_and_key_space(self):
+        self.assertEqual(self.adapter.servers, ("redis://127.0.0.1:6379/0",))
+        self.assertEqual(self.adapter.url, "redis://127.0.0.1:6379/0")
+        self.assertNotIn("parser_class", self.adapter.pool_options())
+        self.assertEqual(self.adapter.make_key("a"), self.backend.make_key("a"))
+        self.assertEqual(self.adapter.loads(self.adapter.dumps({"seq": 1})), {"seq": 1})
+        self.assertEqual(self.adapter.timeout(30), 30)
+
+    def test_values_are_shared_with_the_django_cache(self):
+        self.backend.set("presence:published", {"seq": 3}, timeout=30)
+
+        async def run():
+            seen = await self.store.get("presence:published")
+            await self.store.set("presence:published", {"seq": 4}, timeout=30)
+            added = await self.store.add("presence:published", {"seq": 5}, timeout=30)
+            return seen, added
+
+        self.assertEqual(async_to_sync(run)(), ({"seq": 3}, False))
+        self.assertEqual(self.backend.get("presence:published"), {"seq": 4})
+
+    def test_incr_follows_cache_semantics(self):
+        with self.assertRaises(ValueError):
+            async_to_sync(self.store.incr)("presence:conn:a")
+        self.backend.set("presence:conn:a", 1, timeout=30)
+        self.assertEqual(async_to_sync(self.store.incr)("presence:conn:a", 2), 3)
+        self.assertEqual(self.backend.get("presence:conn:a"), 3)
+
+    def test_native_structures_share_the_sync_client_key_space(self):
+        with patch("chat_app_django.cache_utils.caches", {"default": self.backend}):
+            client, raw_key = redis_client_for("presence:index")
+            hash_client, hash_key = redis_client_for("inbox:unread")
+        client.sadd(raw_key, "alice")
+        hash_client.hincrby(hash_key, "dm_a", 2)
+
+        async def run():
+            await self.store.set_add("presence:index", "bob")
+            return sorted(await self.store.set_members("presence:index")), await self.store.hash_get("inbox:unread")
+
+        self.assertEqual(async_to_sync(run)(), (["alice", "bob"], {"dm_a": 2}))
+
+    def test_presence_store_runs_on_redis(self):
+        presence = PresenceStore("presence:auth:redis", ttl=60, grace=0, counter_timeout=120)
+
+        async def run():
+            await presence.aconnect("alice", {"imageName": None, "avatarCrop": None})
+            await presence.aconnect("alice", {"imageName": None, "avatarCrop": None})
+            await presence.aconnect("bob")
+            remaining = await presence.adisconnect("alice")
+            await presence.adisconnect("bob")
+            return remaining, await presence.aonline()
+
+        with patch("presence.store.get_state_store", return_value=self.store):
+            remaining, online = async_to_sync(run)()
+
+        self.assertEqual(remaining, 1)
+        self.assertEqual(online, {"alice": {"imageName": None, "avatarCrop": None}})
+        self.assertEqual(self.backend.get(presence.counter_key("alice")), 1)
@@ -0,0 +1,151 @@
+"""Tests for the shared WebSocket timer wheel."""
+
+import asyncio
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase
+
+from chat_app_django.timer_wheel import TimerWheel, get_timer_wheel
+
+
+class TimerWheelTests(SimpleTestCase):
+    def test_callbacks_rearm_until_they_return_none(self):
+        fired = []
+
+        async def run():
+            wheel = TimerWheel(tick=0.01, slots=4)
+
+            async def callback():
+                fired.append(len(fired))
+                return 0.01 if len(fired) < 3 else None
+
+            wheel.schedule(0.01, callback)
+            await asyncio.wait_for(wheel._task, timeout=2)
+            return len(wheel)
+
+        self.assertEqual(async_to_sync(run)(), 0)
+        self.assertEqual(fired, [0, 1, 2])
+
+    def test_delays_longer_than_one_revolution_wait_extra_rounds(self):
+        async def run():
+            wheel = TimerWheel(tick=0.01, slots=4)
+            order = []
+
+            async def record(name):
+                order.append(name)
+
+            wheel.schedule(0.1, lambda: record("late"))
+            wheel.schedule(0.02, lambda: record("early"))
+            await asyncio.wait_for(wheel._task, timeout=2)
+            return order
+
+        self.assertEqual(async_to_sync(run)(), ["early", "late"])
+
+    def test_cancelled_timer_never_fires_and_driver_stops(self):
+        async def run():
+            wheel = TimerWheel(tick=0.01, slots=8)
+            fired = []
+
+            async def callback():
+                fired.append(True)
+
+            keep = wheel.schedule(0.03, callback)
+            dropped = wheel.schedule(0.02, callback)
+            dropped.cancel()
+            dropped.cancel()
+            self.assertEqual(len(wheel), 1)
+            await asyncio.wait_for(wheel._task, timeout=2)
+            keep.cancel()
+            return fired, wheel._task
+
+        fired, task = async_to_sync(run)()
+        self.assertEqual(fired, [True])
+        self.assertIsNone(task)
+
+    def test_failing_callback_is_dropped(self):
+        async def run():
+            wheel = TimerWheel(tick=0.01, slots=4)
+
+            async def broken():
+                raise RuntimeError("boom")
+
+            wheel.schedule(0.01, broken)
+            with self.assertLogs("chat_app_django.timer_wheel", level="ERROR"):
+                await asyncio.wait_for(wheel._task, timeout=2)
+            return len(wheel)
+
+        self.assertEqual(async_to_sync(run)(), 0)
+
+    def _run_blocked(self, *, max_concurrency, slow_count):
+        """Запускает ``slow_count`` зависших колбэков и один быстрый после них."""
+
+        async def run():
+            wheel = TimerWheel(tick=0.01, slots=8, max_concurrency=max_concurrency)
+            release = asyncio.Event()
+            fired = []
+            running = 0
+            peak = 0
+
+            async def slow():
+                nonlocal running, peak
+                running += 1
+                peak = max(peak, running)
+                await release.wait()
+                running -= 1
+                fired.append("slow")
+
+            async def fast():
+                fired.append("fast")
+
+            for _ in range(slow_count):
+                wheel.schedule(0.01, slow)
+            wheel.schedule(0.03, fast)
+            await asyncio.sleep(0.1)
+            before_release = list(fired)
+            release.set()
+            await asyncio.wait_for(wheel._task, timeout=2)
+            return before_release, fired, peak
+
+        return async_to_sync(run)()
+
+    def test_slow_callback_does_not_stall_other_timers(self):
+        before_release, fired, peak = self._run_blocked(max_concurrency=4, slow_count=1)
+        self.assertEqual(before_release, ["fast"])
+        self.assertEqual(fired, ["fast", "slow"])
+        self.assertEqual(peak, 1)
+
+    def test_callbacks_run_with_bounded_concurrency(self):
+        before_release, fired, peak = self._run_blocked(max_concurrency=2, slow_count=3)
+        self.assertEqual(before_release, [])
+        self.assertEqual(peak, 2)
+        self.assertEqual(sorted(fired), ["fast", "slow", "slow", "slow"])
+
+    def test_driver_sleeps_a_tick_while_only_callbacks_are_running(self):
+        sleep = asyncio.sleep
+        wakeups = 0
+
+        async def counting_sleep(delay, *args, **kwargs):
+            nonlocal wakeups
+            wakeups += 1
+            return await sleep(delay, *args, **kwargs)
+
+        async def run():
+            wheel = TimerWheel(tick=0.01, slots=8)
+
+            async def slow():
+                await sleep(0.3)
+
+            wheel.schedule(0.01, slow)
+            with patch("chat_app_django.timer_wheel.asyncio.sleep", counting_sleep):
+                await asyncio.wait_for(wheel._task, timeout=2)
+
+        async_to_sync(run)()
+        # Около 30 тиков за 0.3 с; холостой цикл давал десятки тысяч пробуждений.
+        self.assertLess(wakeups, 100)
+
+    def test_one_wheel_per_event_loop(self):
+        async def run():
+            return get_timer_wheel() is get_timer_wheel()
+
+        self.assertTrue(async_to_sync(run)())
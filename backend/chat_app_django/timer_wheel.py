@@ -0,0 +1,175 @@
+"""Общее колесо таймеров для heartbeat и idle-watchdog WebSocket consumer'ов.
+
+Раньше каждый сокет держал по одной-две спящие задачи asyncio (пинги и
+проверка простоя), то есть сотни тысяч задач и таймеров loop'а при
+десятках тысяч соединений. ``TimerWheel`` — хешированное колесо: таймер
+попадает в слот ``(текущий тик + задержка) % slots`` с числом оставшихся
+оборотов, а одна задача на event loop раз в тик забирает созревший слот и
+отдаёт его колбэки в очередь. Очередь разбирают не больше
+``TIMER_WHEEL_MAX_CONCURRENCY`` рабочих задач, поэтому медленная отправка
+в одном сокете не задерживает ни тик, ни таймеры остальных. Память на
+сокет — один ``TimerHandle``, пробуждения loop'а не зависят от числа
+сокетов.
+
+Колбэк — корутина без аргументов; она возвращает задержку до следующего
+срабатывания в секундах или ``None``, чтобы таймер больше не запускался.
+Точность — один тик (``TIMER_WHEEL_TICK_SECONDS``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+import weakref
+from collections import deque
+from collections.abc import Awaitable, Callable
+
+from .metrics import gauge
+
+logger = logging.getLogger("chat_app_django.timer_wheel")
+
+TIMER_WHEEL_TICK_SECONDS = 1.0
+TIMER_WHEEL_SLOTS = 512
+TIMER_WHEEL_MAX_CONCURRENCY = 256
+
+TimerCallback = Callable[[], Awaitable[float | None]]
+
+
+class TimerHandle:
+    """Запланированный таймер; ``cancel()`` снимает его за O(1)."""
+
+    __slots__ = ("callback", "rounds", "slot", "cancelled", "_wheel")
+
+    def __init__(self, wheel: TimerWheel, callback: TimerCallback):
+        self._wheel = wheel
+        self.callback = callback
+        self.rounds = 0
+        self.slot = -1
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        if self.cancelled:
+            return
+        self.cancelled = True
+        self._wheel._remove(self)
+
+
+class TimerWheel:
+    """Хешированное колесо таймеров, привязанное к одному event loop."""
+
+    def __init__(
+        self,
+        tick: float = TIMER_WHEEL_TICK_SECONDS,
+        slots: int = TIMER_WHEEL_SLOTS,
+        max_concurrency: int = TIMER_WHEEL_MAX_CONCURRENCY,
+    ):
+        self.tick = max(0.001, float(tick))
+        self.slots = max(1, int(slots))
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._buckets: list[dict[TimerHandle, None]] = [{} for _ in range(self.slots)]
+        self._cursor = 0
+        self._size = 0
+        self._task: asyncio.Task | None = None
+        # Созревшие таймеры ждут свободную рабочую задачу здесь, а не в тике.
+        self._due: deque[TimerHandle] = deque()
+        self._workers: set[asyncio.Task] = set()
+        self.timers = gauge("ws.timer_wheel.timers")
+
+    def __len__(self) -> int:
+        return self._size
+
+    def schedule(self, delay: float, callback: TimerCallback) -> TimerHandle:
+        """Запускает ``callback`` примерно через ``delay`` секунд."""
+        handle = TimerHandle(self, callback)
+        self._insert(handle, delay)
+        self._ensure_running()
+        return handle
+
+    def _insert(self, handle: TimerHandle, delay: float) -> None:
+        # Минимум один тик: слот под курсором уже обрабатывается.
+        ticks = max(1, math.ceil(max(0.0, delay) / self.tick))
+        handle.rounds = (ticks - 1) // self.slots
+        handle.slot = (self._cursor + ticks) % self.slots
+        self._buckets[handle.slot][handle] = None
+        self._size += 1
+        self.timers.add(1)
+
+    def _remove(self, handle: TimerHandle) -> None:
+        bucket = self._buckets[handle.slot] if handle.slot >= 0 else None
+        handle.slot = -1
+        if bucket is None or handle not in bucket:
+            return
+        del bucket[handle]
+        self._size -= 1
+        self.timers.add(-1)
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def _advance(self) -> list[TimerHandle]:
+        """Сдвигает курсор на тик и забирает созревшие таймеры слота."""
+        self._cursor = (self._cursor + 1) % self.slots
+        bucket = self._buckets[self._cursor]
+        due: list[TimerHandle] = []
+        for handle in list(bucket):
+            if handle.rounds > 0:
+                handle.rounds -= 1
+                continue
+            self._remove(handle)
+            due.append(handle)
+        return due
+
+    async def _fire(self, handle: TimerHandle) -> None:
+        try:
+            delay = await handle.callback()
+        except Exception:
+            logger.exception("Timer callback failed")
+            return
+        if delay is not None and not handle.cancelled:
+            self._insert(handle, delay)
+
+    def _dispatch(self, due: list[TimerHandle]) -> None:
+        """Ставит колбэки в очередь и добирает рабочих задач до лимита."""
+        self._due.extend(due)
+        loop = asyncio.get_running_loop()
+        # Запущенные задачи заняты своими колбэками; на новые — новые задачи.
+        for _ in range(min(self.max_concurrency - len(self._workers), len(due))):
+            worker = loop.create_task(self._drain())
+            self._workers.add(worker)
+            worker.add_done_callback(self._workers.discard)
+
+    async def _drain(self) -> None:
+        while self._due:
+            handle = self._due.popleft()
+            if not handle.cancelled:
+                await self._fire(handle)
+
+    async def _run(self) -> None:
+        next_tick = time.monotonic() + self.tick
+        # Колбэки в полёте могут перевзвести таймер, поэтому ждём и их.
+        while self._size or self._due or self._workers:
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+            # После задержки loop'а догоняем пропущенные тики, не теряя слоты.
+            # Тик идёт и без таймеров в слотах: иначе, пока колбэки в полёте,
+            # sleep(0) крутил бы loop вхолостую.
+            while next_tick <= time.monotonic():
+                next_tick += self.tick
+                due = self._advance()
+                if due:
+                    self._dispatch(due)
+        self._task = None
+
+
+_wheels: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, TimerWheel] = weakref.WeakKeyDictionary()
+
+
+def get_timer_wheel() -> TimerWheel:
+    """Колесо таймеров текущего event loop."""
+    loop = asyncio.get_running_loop()
+    wheel = _wheels.get(loop)
+    if wheel is None:
+        wheel = _wheels[loop] = TimerWheel()
+    return wheel
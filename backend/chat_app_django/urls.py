@@ -40,6 +40,7 @@ def api_index(request):
         "health": {
             "live": _link(request, "health-live"),
             "ready": _link(request, "health-ready"),
+            "metrics": _link(request, "health-metrics"),
         },
         "meta": {
             "clientConfig": _link(request, "api-client-config"),
@@ -142,6 +143,7 @@ urlpatterns = [
     path("api/", api_index, name="api-index"),
     path("api/health/live/", health.live, name="health-live"),
     path("api/health/ready/", health.ready, name="health-ready"),
+    path("api/health/metrics/", health.latency_metrics, name="health-metrics"),
     path("api/meta/client-config/", meta_api.client_config_view, name="api-client-config"),
     path("api/auth/", include("users.urls")),
     path("api/chat/", include("chat.api_urls")),
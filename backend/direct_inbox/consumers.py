@@ -1,30 +1,30 @@
 """WebSocket consumer for direct message inbox state."""
 
-import asyncio
 import json
 import time
 import uuid
 from collections.abc import Awaitable, Callable
 from typing import Any, TypeVar, cast
 
-from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.conf import settings
 
+from chat_app_django.db_executor import db_to_async
 from chat_app_django.ip_utils import get_client_ip_from_scope
 from chat_app_django.security.audit import audit_ws_event
-from chat_app_django.security.rate_limit import DbRateLimiter, RateLimitPolicy
+from chat_app_django.security.rate_limit import RateLimitPolicy, is_rate_limited
+from chat_app_django.timer_wheel import get_timer_wheel
 from chat.utils import is_valid_room_slug as _is_valid_room_slug
 from roles.access import can_read
 from rooms.models import Room
 
 from .constants import DIRECT_INBOX_CLOSE_IDLE_CODE
 from .state import (
-    clear_active_room,
-    get_unread_state,
-    mark_read,
-    set_active_room,
-    touch_active_room,
+    aclear_active_room,
+    aget_unread_state,
+    amark_read,
+    aset_active_room,
+    atouch_active_room,
     user_group_name,
 )
 
@@ -32,7 +32,7 @@ T = TypeVar("T")
 
 
 def _to_async(func: Callable[..., T]) -> Callable[..., Awaitable[T]]:
-    return cast(Callable[..., Awaitable[T]], sync_to_async(func, thread_sensitive=True))
+    return cast(Callable[..., Awaitable[T]], db_to_async(func))
 
 
 def _ws_connect_rate_limited(scope, endpoint: str) -> bool:
@@ -42,7 +42,7 @@ def _ws_connect_rate_limited(scope, endpoint: str) -> bool:
     ip = get_client_ip_from_scope(scope) or "unknown"
     scope_key = f"rl:ws:connect:{endpoint}:{ip}"
     policy = RateLimitPolicy(limit=limit, window_seconds=window)
-    return DbRateLimiter.is_limited(scope_key=scope_key, policy=policy)
+    return is_rate_limited(scope_key=scope_key, policy=policy)
 
 
 class DirectInboxConsumer(AsyncWebsocketConsumer):
@@ -74,23 +74,19 @@ class DirectInboxConsumer(AsyncWebsocketConsumer):
         audit_ws_event("ws.connect.accepted", self.scope, endpoint="direct_inbox")
 
         self._last_client_activity = time.monotonic()
-        self._heartbeat_task = asyncio.create_task(self._heartbeat())
-        self._idle_task = None
+        wheel = get_timer_wheel()
+        self._heartbeat_timer = wheel.schedule(max(5, self.heartbeat_seconds), self._heartbeat)
+        self._idle_timer = None
         if self.idle_timeout > 0:
-            self._idle_task = asyncio.create_task(self._idle_watchdog())
+            self._idle_timer = wheel.schedule(self.idle_timeout, self._idle_watchdog)
 
         await self._send_unread_state()
 
     async def disconnect(self, code):
-        for task_name in ("_heartbeat_task", "_idle_task"):
-            task = getattr(self, task_name, None)
-            if not task:
-                continue
-            task.cancel()
-            try:
-                await task
-            except asyncio.CancelledError:
-                pass
+        for timer_name in ("_heartbeat_timer", "_idle_timer"):
+            timer = getattr(self, timer_name, None)
+            if timer:
+                timer.cancel()
 
         user = getattr(self, "user", None)
         if user and user.is_authenticated:
@@ -259,23 +255,21 @@ class DirectInboxConsumer(AsyncWebsocketConsumer):
             )
         )
 
-    async def _heartbeat(self):
-        interval = max(5, self.heartbeat_seconds)
-        while True:
-            await asyncio.sleep(interval)
-            try:
-                await self.send(text_data=json.dumps({"type": "ping"}))
-            except Exception:
-                break
-
-    async def _idle_watchdog(self):
-        interval = max(5, min(self.heartbeat_seconds, self.idle_timeout))
-        while True:
-            await asyncio.sleep(interval)
-            if (time.monotonic() - self._last_client_activity) <= self.idle_timeout:
-                continue
-            await self.close(code=DIRECT_INBOX_CLOSE_IDLE_CODE)
-            break
+    async def _heartbeat(self) -> float | None:
+        """Timer-wheel callback: sends a ping and returns the next delay."""
+        try:
+            await self.send(text_data=json.dumps({"type": "ping"}))
+        except Exception:
+            return None
+        return max(5, self.heartbeat_seconds)
+
+    async def _idle_watchdog(self) -> float | None:
+        """Timer-wheel callback: closes an idle socket, otherwise re-arms for the remaining time."""
+        idle_for = time.monotonic() - self._last_client_activity
+        if idle_for <= self.idle_timeout:
+            return self.idle_timeout - idle_for
+        await self.close(code=DIRECT_INBOX_CLOSE_IDLE_CODE)
+        return None
 
     def _load_room_sync(self, room_slug: str) -> Room | None:
         return Room.objects.filter(slug=room_slug).first()
@@ -289,32 +283,17 @@ class DirectInboxConsumer(AsyncWebsocketConsumer):
     async def _can_read(self, room: Room) -> bool:
         return await _to_async(self._can_read_sync)(room)
 
-    def _get_unread_state_sync(self) -> dict[str, Any]:
-        return get_unread_state(self.user.pk)
-
     async def _get_unread_state(self) -> dict[str, Any]:
-        return await _to_async(self._get_unread_state_sync)()
-
-    def _mark_read_sync(self, room_slug: str) -> dict[str, Any]:
-        return mark_read(self.user.pk, room_slug, self.unread_ttl)
+        return await aget_unread_state(self.user.pk)
 
     async def _mark_read(self, room_slug: str) -> dict[str, Any]:
-        return await _to_async(self._mark_read_sync)(room_slug)
-
-    def _set_active_room_sync(self, room_slug: str) -> None:
-        set_active_room(self.user.pk, room_slug, self.conn_id, self.active_ttl)
+        return await amark_read(self.user.pk, room_slug, self.unread_ttl)
 
     async def _set_active_room(self, room_slug: str) -> None:
-        await _to_async(self._set_active_room_sync)(room_slug)
-
-    def _clear_active_room_sync(self, conn_only: bool = False) -> None:
-        clear_active_room(self.user.pk, self.conn_id if conn_only else None)
+        await aset_active_room(self.user.pk, room_slug, self.conn_id, self.active_ttl)
 
     async def _clear_active_room(self, conn_only: bool = False) -> None:
-        await _to_async(self._clear_active_room_sync)(conn_only)
-
-    def _touch_active_room_sync(self) -> None:
-        touch_active_room(self.user.pk, self.conn_id, self.active_ttl)
+        await aclear_active_room(self.user.pk, self.conn_id if conn_only else None)
 
     async def _touch_active_room(self) -> None:
-        await _to_async(self._touch_active_room_sync)()
+        await atouch_active_room(self.user.pk, self.conn_id, self.active_ttl)
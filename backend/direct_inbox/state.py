@@ -1,10 +1,31 @@
-"""Cache-backed unread/active state for direct messages."""
+"""Cache-backed unread/active state for direct messages.
+
+Unread counters live in a per-user Redis hash when the default cache is
+Redis, so concurrent messages to the same user never lose increments and
+each update touches a single field. Other caches fall back to the state
+store's process-locked dict under the same key.
+
+The ``a``-prefixed functions are the async equivalents used by
+``DirectInboxConsumer``; they go through the async state store
+(``chat_app_django.state_store``) instead of a thread hop.
+"""
 
 from __future__ import annotations
 
 from typing import Any
 
 from django.core.cache import cache
+from redis.exceptions import ResponseError
+
+from chat_app_django.cache_utils import redis_client_for
+from chat_app_django.db_executor import db_to_async
+from chat_app_django.state_store import (
+    LocalStateStore,
+    get_state_store,
+    local_hash_delete,
+    local_hash_get,
+    local_hash_incr,
+)
 
 
 UNREAD_KEY_PREFIX = "direct:unread"
@@ -61,13 +82,7 @@ def _normalize_counts(value: Any) -> dict[str, int]:
     return result
 
 
-def get_unread_slugs(user_id: int) -> list[str]:
-    counts = _normalize_counts(cache.get(unread_key(user_id)))
-    return list(counts.keys())
-
-
-def get_unread_state(user_id: int) -> dict[str, Any]:
-    counts = _normalize_counts(cache.get(unread_key(user_id)))
+def _state(counts: dict[str, int]) -> dict[str, Any]:
     slugs = list(counts.keys())
     return {
         "dialogs": len(slugs),
@@ -76,37 +91,95 @@ def get_unread_state(user_id: int) -> dict[str, Any]:
     }
 
 
+def _decode_hash(raw: dict) -> dict[str, int]:
+    return _normalize_counts(
+        {
+            (key.decode() if isinstance(key, bytes) else key): value
+            for key, value in raw.items()
+        }
+    )
+
+
+class _RedisUnreadCounters:
+    """Per-user Redis hash ``slug -> count`` updated with HINCRBY/HDEL."""
+
+    def _run(self, user_id: int, build) -> dict[str, int]:
+        client, key = redis_client_for(unread_key(user_id))
+        try:
+            return _decode_hash(build(client.pipeline(transaction=True), key).execute()[-1])
+        except ResponseError as exc:
+            if "WRONGTYPE" not in str(exc):
+                raise
+        # Key still holds a pre-hash pickled dict: convert it once and retry.
+        legacy = _normalize_counts(cache.get(unread_key(user_id)))
+        client.delete(key)
+        if legacy:
+            client.hset(key, mapping=legacy)
+        return _decode_hash(build(client.pipeline(transaction=True), key).execute()[-1])
+
+    def get(self, user_id: int) -> dict[str, int]:
+        return self._run(user_id, lambda pipe, key: pipe.hgetall(key))
+
+    def incr(self, user_id: int, slug: str, ttl_seconds: int) -> dict[str, int]:
+        return self._run(
+            user_id,
+            lambda pipe, key: pipe.hincrby(key, slug, 1).expire(key, ttl_seconds).hgetall(key),
+        )
+
+    def clear(self, user_id: int, slug: str, ttl_seconds: int) -> dict[str, int]:
+        # Redis drops the key by itself once the last field is removed.
+        return self._run(
+            user_id,
+            lambda pipe, key: pipe.hdel(key, slug).expire(key, ttl_seconds).hgetall(key),
+        )
+
+
+_redis_counters = _RedisUnreadCounters()
+
+
+def _uses_redis() -> bool:
+    return redis_client_for(UNREAD_KEY_PREFIX) is not None
+
+
+def _local_unread_key(user_id: int) -> str:
+    """Unread key in the local cache; a pre-hash slug list is converted first."""
+    key = unread_key(user_id)
+    legacy = cache.get(key)
+    if isinstance(legacy, list):
+        cache.set(key, _normalize_counts(legacy))
+    return key
+
+
+def _unread_counts(user_id: int) -> dict[str, int]:
+    if _uses_redis():
+        return _redis_counters.get(user_id)
+    return _normalize_counts(local_hash_get(_local_unread_key(user_id)))
+
+
+def get_unread_slugs(user_id: int) -> list[str]:
+    return list(_unread_counts(user_id).keys())
+
+
+def get_unread_state(user_id: int) -> dict[str, Any]:
+    return _state(_unread_counts(user_id))
+
+
 def mark_unread(user_id: int, room_slug: str, ttl_seconds: int) -> dict[str, Any]:
     slug = str(room_slug or "").strip()
     if not slug:
         return get_unread_state(user_id)
-    current = _normalize_counts(cache.get(unread_key(user_id)))
-    current[slug] = current.get(slug, 0) + 1
-    cache.set(unread_key(user_id), current, timeout=ttl_seconds)
-    slugs = list(current.keys())
-    return {
-        "dialogs": len(slugs),
-        "slugs": slugs,
-        "counts": current,
-    }
+    if _uses_redis():
+        return _state(_redis_counters.incr(user_id, slug, ttl_seconds))
+    return _state(_normalize_counts(local_hash_incr(_local_unread_key(user_id), slug, 1, ttl_seconds)))
 
 
 def mark_read(user_id: int, room_slug: str, ttl_seconds: int) -> dict[str, Any]:
     slug = str(room_slug or "").strip()
     if not slug:
         return get_unread_state(user_id)
-    current = _normalize_counts(cache.get(unread_key(user_id)))
-    current.pop(slug, None)
-    if current:
-        cache.set(unread_key(user_id), current, timeout=ttl_seconds)
-    else:
-        cache.delete(unread_key(user_id))
-    slugs = list(current.keys())
-    return {
-        "dialogs": len(slugs),
-        "slugs": slugs,
-        "counts": current,
-    }
+    if _uses_redis():
+        return _state(_redis_counters.clear(user_id, slug, ttl_seconds))
+    return _state(_normalize_counts(local_hash_delete(_local_unread_key(user_id), slug, ttl_seconds)))
 
 
 def set_active_room(user_id: int, room_slug: str, conn_id: str, ttl_seconds: int) -> None:
@@ -146,3 +219,74 @@ def is_room_active(user_id: int, room_slug: str) -> bool:
     if not isinstance(value, dict):
         return False
     return value.get("roomSlug") == room_slug
+
+
+# ── Async path ────────────────────────────────────────────────────────
+
+
+async def _aunread_counts(user_id: int, update, fallback) -> dict[str, int]:
+    store = get_state_store()
+    # The local cache is in process memory, so converting a legacy value runs inline.
+    key = _local_unread_key(user_id) if isinstance(store, LocalStateStore) else unread_key(user_id)
+    try:
+        return _normalize_counts(await update(store, key))
+    except ResponseError as exc:
+        if "WRONGTYPE" not in str(exc):
+            raise
+    # A legacy pickled dict is converted once by the sync path; rare, so a hop is fine.
+    return await db_to_async(fallback)()
+
+
+async def aget_unread_state(user_id: int) -> dict[str, Any]:
+    counts = await _aunread_counts(
+        user_id,
+        lambda store, key: store.hash_get(key),
+        lambda: _redis_counters.get(user_id),
+    )
+    return _state(counts)
+
+
+async def amark_read(user_id: int, room_slug: str, ttl_seconds: int) -> dict[str, Any]:
+    slug = str(room_slug or "").strip()
+    if not slug:
+        return await aget_unread_state(user_id)
+    counts = await _aunread_counts(
+        user_id,
+        lambda store, key: store.hash_delete(key, slug, ttl_seconds),
+        lambda: _redis_counters.clear(user_id, slug, ttl_seconds),
+    )
+    return _state(counts)
+
+
+async def aset_active_room(user_id: int, room_slug: str, conn_id: str, ttl_seconds: int) -> None:
+    await get_state_store().set(
+        active_key(user_id),
+        {
+            "roomSlug": room_slug,
+            "connId": conn_id,
+        },
+        timeout=ttl_seconds,
+    )
+
+
+async def atouch_active_room(user_id: int, conn_id: str, ttl_seconds: int) -> None:
+    store = get_state_store()
+    value = await store.get(active_key(user_id))
+    if not isinstance(value, dict):
+        return
+    if value.get("connId") != conn_id:
+        return
+    await store.set(active_key(user_id), value, timeout=ttl_seconds)
+
+
+async def aclear_active_room(user_id: int, conn_id: str | None = None) -> None:
+    store = get_state_store()
+    if conn_id is None:
+        await store.delete(active_key(user_id))
+        return
+    value = await store.get(active_key(user_id))
+    if not isinstance(value, dict):
+        return
+    if value.get("connId") != conn_id:
+        return
+    await store.delete(active_key(user_id))
@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models, transaction
 
 from chat_app_django.security.audit import audit_security_event
@@ -74,14 +76,56 @@ def list_blocked(actor) -> list:
 
 def is_blocked_between(user_a, user_b) -> bool:
     """Return True if either user has blocked the other."""
+    return is_blocked_between_ids(user_a.pk, user_b.pk)
+
+
+def _block_cache_ttl() -> int:
+    return max(0, int(getattr(settings, "FRIENDS_BLOCK_CACHE_TTL", 300)))
+
+
+def block_cache_key(user_a_id: int, user_b_id: int) -> str:
+    low, high = sorted((int(user_a_id), int(user_b_id)))
+    return f"friends:blocked:{low}:{high}"
+
+
+def _query_blocked_between(user_a_id: int, user_b_id: int) -> bool:
     return Friendship.objects.filter(
         status=Friendship.Status.BLOCKED,
     ).filter(
-        models.Q(from_user=user_a, to_user=user_b)
-        | models.Q(from_user=user_b, to_user=user_a)
+        models.Q(from_user_id=user_a_id, to_user_id=user_b_id)
+        | models.Q(from_user_id=user_b_id, to_user_id=user_a_id)
     ).exists()
 
 
+def is_blocked_between_ids(user_a_id: int, user_b_id: int) -> bool:
+    """Cached block check for an unordered user pair."""
+    ttl = _block_cache_ttl()
+    if not ttl:
+        return _query_blocked_between(user_a_id, user_b_id)
+    key = block_cache_key(user_a_id, user_b_id)
+    cached = cache.get(key)
+    if cached is not None:
+        return bool(cached)
+    blocked = _query_blocked_between(user_a_id, user_b_id)
+    # add(), not set(): a refresh written after a block change must win over this read.
+    cache.add(key, blocked, timeout=ttl)
+    return blocked
+
+
+def invalidate_block_cache(user_a_id: int, user_b_id: int) -> None:
+    """Drop the cached pair now and re-read it from the database after commit."""
+    ttl = _block_cache_ttl()
+    if not ttl:
+        return
+    key = block_cache_key(user_a_id, user_b_id)
+    cache.delete(key)
+
+    def refresh() -> None:
+        cache.set(key, _query_blocked_between(user_a_id, user_b_id), timeout=ttl)
+
+    transaction.on_commit(refresh)
+
+
 # ── Send request ──────────────────────────────────────────────────────
 
 def send_request(actor, target_username: str) -> Friendship:
@@ -5,6 +5,7 @@ from django.dispatch import receiver
 
 from chat_app_django.security.audit import audit_security_event
 
+from .application.friend_service import invalidate_block_cache
 from .models import Friendship
 from .utils import get_from_user_id, get_to_user_id
 
@@ -23,6 +24,15 @@ def audit_friendship_save(sender, instance: Friendship, created: bool, **kwargs)
     )
 
 
+@receiver(post_save, sender=Friendship)
+@receiver(post_delete, sender=Friendship)
+def invalidate_friendship_block_cache(sender, instance: Friendship, **kwargs):
+    from_user_id = get_from_user_id(instance)
+    to_user_id = get_to_user_id(instance)
+    if from_user_id is not None and to_user_id is not None:
+        invalidate_block_cache(from_user_id, to_user_id)
+
+
 @receiver(post_delete, sender=Friendship)
 def audit_friendship_delete(sender, instance: Friendship, **kwargs):
     from_user_id = get_from_user_id(instance)
@@ -2,8 +2,10 @@ from types import SimpleNamespace
 from typing import cast
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
 
+from friends.application import friend_service
 from friends.models import Friendship
 from friends.utils import get_from_user_id, get_to_user_id
 
@@ -42,3 +44,36 @@ class FriendshipModelStringTests(TestCase):
     def test_str_falls_back_to_placeholders_when_relations_missing(self):
         friendship = Friendship(status=Friendship.Status.ACCEPTED)
         self.assertEqual(str(friendship), f"?->?:{Friendship.Status.ACCEPTED}")
+
+
+class BlockCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username="block_alice", password="pass12345")
+        self.bob = User.objects.create_user(username="block_bob", password="pass12345")
+
+    def test_block_state_is_cached_per_unordered_pair(self):
+        self.assertFalse(friend_service.is_blocked_between_ids(self.alice.pk, self.bob.pk))
+        with self.assertNumQueries(0):
+            self.assertFalse(friend_service.is_blocked_between_ids(self.bob.pk, self.alice.pk))
+
+    def test_block_and_unblock_invalidate_cached_pair(self):
+        self.assertFalse(friend_service.is_blocked_between(self.alice, self.bob))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            friend_service.block_user(self.alice, "block_bob")
+        with self.assertNumQueries(0):
+            self.assertTrue(friend_service.is_blocked_between(self.bob, self.alice))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            friend_service.unblock_user(self.alice, self.bob.pk)
+        with self.assertNumQueries(0):
+            self.assertFalse(friend_service.is_blocked_between(self.alice, self.bob))
+
+    def test_refresh_after_commit_wins_over_stale_read(self):
+        key = friend_service.block_cache_key(self.alice.pk, self.bob.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Friendship.objects.create(from_user=self.bob, to_user=self.alice, status=Friendship.Status.BLOCKED)
+            # A reader that saw the pre-commit state cannot overwrite the refresh.
+            cache.add(key, False)
+        self.assertTrue(cache.get(key))
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-16 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_messages', '0003_message_edit_delete_reply_attachment_reaction_readstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messagereadstate',
+            name='unread_count',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,51 @@
+"""Denormalize per-message reaction counts onto Message.
+
+Existing messages are backfilled from their Reaction rows; emojis keep the
+order in which they were first used on the message.
+"""
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def backfill_reaction_counts(apps, schema_editor):
+    Message = apps.get_model("chat_messages", "Message")
+    Reaction = apps.get_model("chat_messages", "Reaction")
+
+    rows = (
+        Reaction.objects.values("message_id", "emoji")
+        .annotate(total=Count("id"), first_id=Min("id"))
+        .order_by("message_id", "first_id")
+    )
+    summaries: dict[int, list[list]] = {}
+    for row in rows.iterator():
+        summaries.setdefault(row["message_id"], []).append([row["emoji"], row["total"]])
+
+    pending = []
+    for message_id, counts in summaries.items():
+        pending.append(Message(pk=message_id, reaction_counts=counts))
+        if len(pending) >= 500:
+            Message.objects.bulk_update(pending, ["reaction_counts"])
+            pending = []
+    if pending:
+        Message.objects.bulk_update(pending, ["reaction_counts"])
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat_messages", "0004_messagereadstate_unread_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="message",
+            name="reaction_counts",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(backfill_reaction_counts, noop),
+    ]
@@ -45,6 +45,11 @@ class Message(models.Model):
         on_delete=models.SET_NULL,
         related_name="replies",
     )
+
+    # ── Reactions ──────────────────────────────────────────────────────
+    # Denormalized [[emoji, count], ...] in first-reaction order, maintained
+    # by chat.services.add_reaction / remove_reaction.
+    reaction_counts = models.JSONField(default=list, blank=True)
     user_id: Optional[int]
     room_id: int
     deleted_by_id: Optional[int]
@@ -145,6 +150,8 @@ class MessageReadState(models.Model):
         related_name="+",
     )
     last_read_at = models.DateTimeField(auto_now=True)
+    # Materialized unread counter (CHAT_UNREAD_COUNTERS_MATERIALIZED); NULL = not computed yet.
+    unread_count = models.PositiveIntegerField(null=True, blank=True)
     user_id: int
     room_id: int
     last_read_message_id: Optional[int]
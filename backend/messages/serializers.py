@@ -97,20 +97,22 @@ class MessageSerializer(serializers.ModelSerializer):
         }
 
     def get_reactions(self, obj):
-        reactions_qs = obj.reactions.all()
-        counts: dict[str, int] = {}
-        user_reacted: set[str] = set()
-        request = self.context.get("request")
-        current_user_id = getattr(getattr(request, "user", None), "pk", None)
-
-        for r in reactions_qs:
-            counts[r.emoji] = counts.get(r.emoji, 0) + 1
-            if current_user_id and r.user_id == current_user_id:
-                user_reacted.add(r.emoji)
+        # Counts come from the denormalized summary; "me" from the per-page
+        # lookup in context["my_reactions"] ({message_id: {emoji, ...}}).
+        my_reactions = self.context.get("my_reactions")
+        if my_reactions is not None:
+            user_reacted = my_reactions.get(obj.pk, set())
+        else:
+            request = self.context.get("request")
+            user = getattr(request, "user", None)
+            if getattr(user, "is_authenticated", False):
+                user_reacted = set(obj.reactions.filter(user=user).values_list("emoji", flat=True))
+            else:
+                user_reacted = set()
 
         return [
             {"emoji": emoji, "count": count, "me": emoji in user_reacted}
-            for emoji, count in counts.items()
+            for emoji, count in obj.reaction_counts or []
         ]
 
     def to_representation(self, instance):
@@ -0,0 +1,265 @@
+"""Debounced, diff-based presence fan-out.
+
+Connects and disconnects only mark the presence state dirty. A flusher task
+per event loop waits ``window`` seconds so a burst of changes is coalesced,
+then compares the live presence store with the last published state and
+emits a single ``presence.delta`` carrying joins and leaves. A full snapshot
+replaces the delta once every ``snapshot_interval`` seconds. Each publication
+increments a shared sequence number so clients can detect a gap and ask for
+a resync.
+
+Members carry only stable fields (avatar name and crop); consumers sign
+avatar URLs when sending, so a touch that re-signs nothing is not a join.
+The published state mirrors the store layout: a small ``{namespace}:published``
+blob with the sequence number plus one key per published member and an
+index, so a flush writes only what joined or left.
+
+Publication is serialized across workers with a short cache lock; a worker
+that loses the race simply retries after the next window.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import weakref
+from collections.abc import Callable
+from typing import Any
+
+from chat_app_django.state_store import get_state_store
+
+from .store import PresenceStore
+
+logger = logging.getLogger("presence.broadcaster")
+
+LOCK_TIMEOUT_SECONDS = 10
+BUSY_RETRY_SECONDS = 0.05
+
+
+def published_state_key(namespace: str) -> str:
+    return f"{namespace}:published"
+
+
+def published_member_key(namespace: str, member: str) -> str:
+    return f"{published_state_key(namespace)}:member:{member}"
+
+
+def published_index_key(namespace: str) -> str:
+    return f"{published_state_key(namespace)}:index"
+
+
+async def apublished_seq(namespace: str) -> int:
+    state = await get_state_store().get(published_state_key(namespace)) or {}
+    try:
+        return int(state.get("seq", 0))
+    except (TypeError, ValueError, AttributeError):
+        return 0
+
+
+def member_payload(image_name: str | None, avatar_crop: dict[str, float] | None) -> dict[str, object]:
+    """Stored and diffed presence payload; URLs are signed per recipient."""
+    return {"imageName": image_name or None, "avatarCrop": avatar_crop}
+
+
+def online_rows(online: dict[str, dict[str, Any]]) -> list[dict[str, object]]:
+    return [
+        {
+            "username": username,
+            "imageName": info.get("imageName"),
+            "avatarCrop": info.get("avatarCrop"),
+        }
+        for username, info in online.items()
+    ]
+
+
+def diff_online(
+    previous: dict[str, dict[str, Any]],
+    current: dict[str, dict[str, Any]],
+) -> tuple[dict[str, dict[str, Any]], list[str]]:
+    """Return members that joined (or changed avatar) and usernames that left."""
+    joins = {
+        username: info
+        for username, info in current.items()
+        if previous.get(username) != info
+    }
+    leaves = sorted(username for username in previous if username not in current)
+    return joins, leaves
+
+
+class PresenceBroadcaster:
+    """Coalesces presence changes of one namespace into sequenced deltas."""
+
+    def __init__(
+        self,
+        *,
+        user_store: PresenceStore,
+        guest_store: PresenceStore,
+        channel_layer,
+        group_auth: str,
+        group_guest: str,
+        window: float,
+        snapshot_interval: float,
+    ):
+        self.user_store = user_store
+        self.guest_store = guest_store
+        self.channel_layer = channel_layer
+        self.group_auth = group_auth
+        self.group_guest = group_guest
+        self.window = max(0.0, float(window))
+        self.snapshot_interval = max(1.0, float(snapshot_interval))
+        self.state_key = published_state_key(user_store.namespace)
+        self.lock_key = f"{self.state_key}:lock"
+        self._dirty = asyncio.Event()
+        self._attached = 0
+        self._task: asyncio.Task | None = None
+
+    def attach(self) -> None:
+        """Register a live connection; keeps periodic snapshots running."""
+        self._attached += 1
+        self._ensure_running()
+
+    def detach(self) -> None:
+        self._attached = max(0, self._attached - 1)
+        self.request()
+
+    def request(self) -> None:
+        """Mark presence as changed; publication happens after the window."""
+        self._dirty.set()
+        self._ensure_running()
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._dirty.wait(), timeout=self.snapshot_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self.window:
+                await asyncio.sleep(self.window)
+            self._dirty.clear()
+            try:
+                published = await self.flush()
+            except Exception:
+                logger.warning("Presence broadcast failed", exc_info=True)
+                published = True
+            if not published:
+                self._dirty.set()
+                await asyncio.sleep(max(self.window, BUSY_RETRY_SECONDS))
+                continue
+            if self._attached <= 0 and not self._dirty.is_set():
+                return
+
+    async def _published_online(self, store) -> dict[str, dict[str, Any]]:
+        namespace = self.user_store.namespace
+        members = await store.set_members(published_index_key(namespace))
+        if not members:
+            return {}
+        keys = {published_member_key(namespace, member): member for member in members}
+        found = await store.get_many(list(keys))
+        return {keys[key]: payload for key, payload in found.items() if isinstance(payload, dict)}
+
+    async def _save_published(self, store, joins: dict[str, dict[str, Any]], leaves: list[str]) -> None:
+        """Write only the members that changed since the last publication."""
+        namespace = self.user_store.namespace
+        for username, payload in joins.items():
+            await store.set(published_member_key(namespace, username), payload, timeout=None)
+        for username in leaves:
+            await store.delete(published_member_key(namespace, username))
+        if joins:
+            await store.set_add(published_index_key(namespace), *joins)
+        if leaves:
+            await store.set_remove(published_index_key(namespace), *leaves)
+
+    async def _prepare(self, store) -> list[tuple[str, dict[str, Any]]] | None:
+        """Diff against the published state; ``None`` means another worker holds the lock."""
+        if not await store.add(self.lock_key, 1, timeout=LOCK_TIMEOUT_SECONDS):
+            return None
+        try:
+            previous = await store.get(self.state_key) or {}
+            if not isinstance(previous, dict):
+                previous = {}
+            online = await self.user_store.aonline()
+            guests = await self.guest_store.acount()
+            now = time.time()
+
+            snapshot_due = now - float(previous.get("snapshot_at") or 0) >= self.snapshot_interval
+            joins, leaves = diff_online(await self._published_online(store), online)
+            guests_changed = guests != previous.get("guests")
+            if not (snapshot_due or joins or leaves or guests_changed):
+                await store.delete(self.lock_key)
+                return []
+
+            seq = int(previous.get("seq") or 0) + 1
+            await self._save_published(store, joins, leaves)
+            await store.set(
+                self.state_key,
+                {
+                    "seq": seq,
+                    "guests": guests,
+                    "snapshot_at": now if snapshot_due else previous.get("snapshot_at"),
+                },
+                timeout=None,
+            )
+        except Exception:
+            await store.delete(self.lock_key)
+            raise
+
+        events: list[tuple[str, dict[str, Any]]] = []
+        if snapshot_due or guests_changed:
+            events.append((self.group_guest, {"type": "presence.update", "guests": guests}))
+        if snapshot_due:
+            events.append(
+                (
+                    self.group_auth,
+                    {"type": "presence.update", "online": online_rows(online), "guests": guests, "seq": seq},
+                )
+            )
+        else:
+            events.append(
+                (
+                    self.group_auth,
+                    {
+                        "type": "presence.delta",
+                        "seq": seq,
+                        "joins": online_rows(joins),
+                        "leaves": leaves,
+                        "guests": guests,
+                    },
+                )
+            )
+        return events
+
+    async def flush(self) -> bool:
+        """Publish pending changes; returns ``False`` when the lock was busy."""
+        store = get_state_store()
+        events = await self._prepare(store)
+        if events is None:
+            return False
+        if not events:
+            return True
+        try:
+            # Sent while holding the lock so sequence numbers reach groups in order.
+            for group, event in events:
+                await self.channel_layer.group_send(group, event)
+        finally:
+            await store.delete(self.lock_key)
+        return True
+
+
+_broadcasters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple, PresenceBroadcaster]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_presence_broadcaster(key: tuple, factory: Callable[[], PresenceBroadcaster]) -> PresenceBroadcaster:
+    """Return the broadcaster for ``key`` bound to the running event loop."""
+    loop = asyncio.get_running_loop()
+    per_loop = _broadcasters.setdefault(loop, {})
+    broadcaster = per_loop.get(key)
+    if broadcaster is None:
+        broadcaster = per_loop[key] = factory()
+    return broadcaster
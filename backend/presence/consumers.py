@@ -1,22 +1,29 @@
 """WebSocket consumer for user online presence tracking."""
 
-import asyncio
 import json
 import time
 from collections.abc import Awaitable, Callable
 from typing import Any, TypeVar, cast
 
-from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.conf import settings
-from django.core.cache import cache
 
+from chat.sender import load_sender_snapshot, profile_group_name
+from chat_app_django.db_executor import db_to_async
 from chat_app_django.ip_utils import get_client_ip_from_scope
-from chat_app_django.media_utils import build_profile_url, serialize_avatar_crop
+from chat_app_django.media_utils import profile_url_builder, serialize_avatar_crop
 from chat_app_django.security.audit import audit_ws_event
-from chat_app_django.security.rate_limit import DbRateLimiter, RateLimitPolicy
+from chat_app_django.security.rate_limit import RateLimitPolicy, is_rate_limited
+from chat_app_django.timer_wheel import get_timer_wheel
 from users.identity import user_public_username
 
+from .broadcaster import (
+    PresenceBroadcaster,
+    apublished_seq,
+    get_presence_broadcaster,
+    member_payload,
+    online_rows,
+)
 from .constants import (
     PRESENCE_CACHE_KEY_AUTH,
     PRESENCE_CACHE_KEY_GUEST,
@@ -25,12 +32,13 @@ from .constants import (
     PRESENCE_GROUP_AUTH,
     PRESENCE_GROUP_GUEST,
 )
+from .store import PresenceStore
 
 T = TypeVar("T")
 
 
 def _to_async(func: Callable[..., T]) -> Callable[..., Awaitable[T]]:
-    return cast(Callable[..., Awaitable[T]], sync_to_async(func, thread_sensitive=True))
+    return cast(Callable[..., Awaitable[T]], db_to_async(func))
 
 
 def _ws_connect_rate_limited(scope, endpoint: str) -> bool:
@@ -44,7 +52,7 @@ def _ws_connect_rate_limited(scope, endpoint: str) -> bool:
     ip = get_client_ip_from_scope(scope) or "unknown"
     scope_key = f"rl:ws:connect:{endpoint}:{ip}"
     policy = RateLimitPolicy(limit=limit, window_seconds=window)
-    return DbRateLimiter.is_limited(scope_key=scope_key, policy=policy)
+    return is_rate_limited(scope_key=scope_key, policy=policy)
 
 
 class PresenceConsumer(AsyncWebsocketConsumer):
@@ -60,6 +68,9 @@ class PresenceConsumer(AsyncWebsocketConsumer):
     presence_idle_timeout = int(getattr(settings, "PRESENCE_IDLE_TIMEOUT", 90))
     cache_timeout_seconds = PRESENCE_CACHE_TTL_SECONDS
     presence_touch_interval = int(getattr(settings, "PRESENCE_TOUCH_INTERVAL", 30))
+    presence_broadcast_window = int(getattr(settings, "PRESENCE_BROADCAST_WINDOW_MS", 250)) / 1000
+    presence_snapshot_interval = int(getattr(settings, "PRESENCE_SNAPSHOT_INTERVAL", 60))
+    presence_resync_interval = 1.0
 
     async def connect(self):
         user = self.scope.get("user")
@@ -72,38 +83,41 @@ class PresenceConsumer(AsyncWebsocketConsumer):
             await self.close(code=4401)
             return
 
-        if await _to_async(_ws_connect_rate_limited)(self.scope, "presence"):
+        if await _to_async(self._connect_sync)(user):
             audit_ws_event("ws.connect.denied", self.scope, endpoint="presence", reason="rate_limited", code=4429)
             await self.close(code=4429)
             return
 
         await self.channel_layer.group_add(self.group_name, self.channel_name)
+        if not self.is_guest:
+            self.profile_group_name = profile_group_name(user.pk)
+            await self.channel_layer.group_add(self.profile_group_name, self.channel_name)
         await self.accept()
         audit_ws_event("ws.connect.accepted", self.scope, endpoint="presence")
 
         self._last_client_activity = time.monotonic()
         self._next_presence_touch_at = 0.0
-        self._heartbeat_task = asyncio.create_task(self._heartbeat())
-        self._idle_task = None
+        self._next_resync_at = 0.0
+        wheel = get_timer_wheel()
+        self._heartbeat_timer = wheel.schedule(max(5, self.presence_heartbeat), self._heartbeat)
+        self._idle_timer = None
         if self.presence_idle_timeout > 0:
-            self._idle_task = asyncio.create_task(self._idle_watchdog())
+            self._idle_timer = wheel.schedule(self.presence_idle_timeout, self._idle_watchdog)
 
         if self.is_guest:
             await self._add_guest(self.guest_key)
         else:
             await self._add_user(user)
+        await self._send_snapshot()
+        self._broadcaster().attach()
+        self._broadcast_attached = True
         await self._broadcast()
 
     async def disconnect(self, code):
-        for task_name in ("_heartbeat_task", "_idle_task"):
-            task = getattr(self, task_name, None)
-            if not task:
-                continue
-            task.cancel()
-            try:
-                await task
-            except asyncio.CancelledError:
-                pass
+        for timer_name in ("_heartbeat_timer", "_idle_timer"):
+            timer = getattr(self, timer_name, None)
+            if timer:
+                timer.cancel()
 
         user = self.scope.get("user")
         graceful = code in (1000, 1001)
@@ -113,7 +127,12 @@ class PresenceConsumer(AsyncWebsocketConsumer):
             await self._remove_user(user, graceful=graceful)
 
         await self._broadcast()
+        if getattr(self, "_broadcast_attached", False):
+            self._broadcast_attached = False
+            self._broadcaster().detach()
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        if hasattr(self, "profile_group_name"):
+            await self.channel_layer.group_discard(self.profile_group_name, self.channel_name)
         audit_ws_event("ws.disconnect", self.scope, endpoint="presence", code=code)
 
     async def receive(self, text_data=None, bytes_data=None):
@@ -126,6 +145,11 @@ class PresenceConsumer(AsyncWebsocketConsumer):
         except json.JSONDecodeError:
             audit_ws_event("ws.presence.rejected", self.scope, endpoint="presence", reason="invalid_json")
             return
+        if payload.get("type") == "resync":
+            if now >= self._next_resync_at:
+                self._next_resync_at = now + self.presence_resync_interval
+                await self._send_snapshot()
+            return
         if payload.get("type") != "ping":
             audit_ws_event(
                 "ws.presence.rejected",
@@ -146,245 +170,185 @@ class PresenceConsumer(AsyncWebsocketConsumer):
         elif user and user.is_authenticated:
             await self._touch_user(user)
 
-    async def _broadcast(self):
-        online = await self._get_online()
-        guests = await self._get_guest_count()
-        await self.channel_layer.group_send(
-            self.group_name_guest,
-            {"type": "presence.update", "guests": guests},
-        )
-        await self.channel_layer.group_send(
-            self.group_name_auth,
-            {"type": "presence.update", "online": online, "guests": guests},
+    def _broadcaster(self) -> PresenceBroadcaster:
+        key = (self.cache_key, self.guest_cache_key, self.group_name_auth, self.group_name_guest)
+        return get_presence_broadcaster(
+            key,
+            lambda: PresenceBroadcaster(
+                user_store=self._user_store(),
+                guest_store=self._guest_store(),
+                channel_layer=self.channel_layer,
+                group_auth=self.group_name_auth,
+                group_guest=self.group_name_guest,
+                window=self.presence_broadcast_window,
+                snapshot_interval=self.presence_snapshot_interval,
+            ),
         )
 
+    async def _broadcast(self):
+        """Schedules a coalesced ``presence.delta`` for both presence groups."""
+        self._broadcaster().request()
+
+    async def _send_snapshot(self):
+        """Sends the full presence state to this connection only."""
+        payload: dict[str, object] = {
+            "seq": await apublished_seq(self.cache_key),
+            "guests": await self._get_guest_count(),
+        }
+        if not self.is_guest:
+            payload["online"] = await self._get_online()
+        await self.send(text_data=json.dumps(payload))
+
     async def presence_update(self, event):
         payload = {}
         if "online" in event:
-            payload["online"] = event["online"]
+            payload["online"] = self._with_profile_urls(event["online"])
         if "guests" in event:
             payload["guests"] = event["guests"]
+        if "seq" in event:
+            payload["seq"] = event["seq"]
         if payload:
             await self.send(text_data=json.dumps(payload))
 
-    async def _heartbeat(self):
-        interval = max(5, self.presence_heartbeat)
-        while True:
-            await asyncio.sleep(interval)
-            try:
-                await self.send(text_data=json.dumps({"type": "ping"}))
-            except Exception:
-                break
-
-    async def _idle_watchdog(self):
-        interval = max(5, min(self.presence_heartbeat, self.presence_idle_timeout))
-        while True:
-            await asyncio.sleep(interval)
-            if (time.monotonic() - self._last_client_activity) <= self.presence_idle_timeout:
-                continue
-            await self.close(code=PRESENCE_CLOSE_IDLE_CODE)
-            break
-
-    def _add_user_sync(self, user: Any) -> None:
-        username = user_public_username(user)
-        if not username:
+    async def presence_delta(self, event):
+        await self.send(
+            text_data=json.dumps(
+                {
+                    "type": "presence.delta",
+                    "seq": event["seq"],
+                    "joins": self._with_profile_urls(event.get("joins", [])),
+                    "leaves": event.get("leaves", []),
+                    "guests": event.get("guests"),
+                }
+            )
+        )
+
+    async def chat_profile_changed(self, event):
+        """Re-reads name and avatar after a profile change and republishes this member."""
+        user = self.scope.get("user")
+        if self.is_guest or user is None or not getattr(user, "is_authenticated", False):
             return
-        data = cache.get(self.cache_key, {})
-        current = data.get(username, {})
-        count = current.get("count", 0) + 1
-        profile = getattr(user, "profile", None)
-        image_name = getattr(profile, "image", None)
-        image_name = image_name.name if image_name else ""
-        image_url = build_profile_url(self.scope, image_name) if image_name else None
-        avatar_crop = serialize_avatar_crop(profile)
-        data[username] = {
-            "count": count,
-            "profileImage": image_url,
-            "avatarCrop": avatar_crop,
-            "last_seen": time.time(),
-            "grace_until": 0,
-        }
-        cache.set(self.cache_key, data, timeout=self.cache_timeout_seconds)
+        # The scope user's profile is cached for the whole connection; read it fresh.
+        snapshot = await _to_async(load_sender_snapshot)(user.pk)
+        if snapshot is None:
+            return
+        previous = getattr(self, "_member", None)
+        self._member = (snapshot.username, snapshot.avatar_path, snapshot.avatar_crop)
+        if not snapshot.username:
+            return
+        payload = member_payload(snapshot.avatar_path, snapshot.avatar_crop)
+        store = self._user_store()
+        if previous and previous[0] and previous[0] != snapshot.username:
+            await store.adisconnect(previous[0], graceful=True)
+            await store.aconnect(snapshot.username, payload)
+        else:
+            await store.atouch(snapshot.username, payload)
+        await self._broadcast()
 
-    async def _add_user(self, user: Any) -> None:
-        await _to_async(self._add_user_sync)(user)
+    async def _heartbeat(self) -> float | None:
+        """Timer-wheel callback: sends a ping and returns the next delay."""
+        try:
+            await self.send(text_data=json.dumps({"type": "ping"}))
+        except Exception:
+            return None
+        return max(5, self.presence_heartbeat)
+
+    async def _idle_watchdog(self) -> float | None:
+        """Timer-wheel callback: closes an idle socket, otherwise re-arms for the remaining time."""
+        idle_for = time.monotonic() - self._last_client_activity
+        if idle_for <= self.presence_idle_timeout:
+            return self.presence_idle_timeout - idle_for
+        await self.close(code=PRESENCE_CLOSE_IDLE_CODE)
+        return None
+
+    def _user_store(self) -> PresenceStore:
+        return PresenceStore(
+            self.cache_key,
+            ttl=self.presence_ttl,
+            grace=self.presence_grace,
+            counter_timeout=self.cache_timeout_seconds,
+        )
 
-    def _remove_user_sync(self, user: Any, graceful: bool = False) -> None:
-        username = user_public_username(user)
-        if not username:
-            return
-        data = cache.get(self.cache_key, {})
-        if username in data:
-            entry = data[username]
-            count = entry.get("count", 1) - 1
-            now = time.time()
-            if count <= 0:
-                if graceful or self.presence_grace <= 0:
-                    data.pop(username, None)
-                else:
-                    entry["count"] = 0
-                    entry["last_seen"] = now
-                    entry["grace_until"] = now + self.presence_grace
-                    data[username] = entry
-            else:
-                entry["count"] = count
-                entry["last_seen"] = now
-                entry["grace_until"] = 0
-                data[username] = entry
-            cache.set(self.cache_key, data, timeout=self.cache_timeout_seconds)
+    def _guest_store(self) -> PresenceStore:
+        return PresenceStore(
+            self.guest_cache_key,
+            ttl=self.presence_ttl,
+            grace=self.presence_grace,
+            counter_timeout=self.cache_timeout_seconds,
+        )
 
-    async def _remove_user(self, user: Any, graceful: bool = False) -> None:
-        await _to_async(self._remove_user_sync)(user, graceful)
-
-    def _get_online_sync(self) -> list[dict[str, object]]:
-        data = cache.get(self.cache_key, {})
-        now = time.time()
-        cleaned = {}
-        for username, info in data.items():
-            try:
-                count = int(info.get("count", 0))
-            except (TypeError, ValueError):
-                count = 0
-            last_seen = info.get("last_seen", 0)
-            grace_until = info.get("grace_until", 0)
-            if count > 0 and (now - last_seen) <= self.presence_ttl:
-                cleaned[username] = info
-            elif (
-                count <= 0
-                and grace_until
-                and grace_until > now
-                and (now - last_seen) <= self.presence_ttl
-            ):
-                cleaned[username] = info
-        if cleaned != data:
-            cache.set(self.cache_key, cleaned, timeout=self.cache_timeout_seconds)
+    def _connect_sync(self, user: Any) -> bool:
+        """Connect-time sync work in one hop; returns ``True`` when rate limited."""
+        if _ws_connect_rate_limited(self.scope, "presence"):
+            return True
+        if not self.is_guest:
+            self._member = self._member_sync(user)
+        return False
+
+    def _member_sync(self, user: Any) -> tuple[str, str, dict[str, float] | None]:
+        """Public username, avatar name and crop; re-read on ``chat_profile_changed``."""
+        profile = getattr(user, "profile", None)
+        image = getattr(profile, "image", None)
+        return user_public_username(user), (image.name if image else ""), serialize_avatar_crop(profile)
+
+    async def _resolve_member(self, user: Any) -> tuple[str, str, dict[str, float] | None]:
+        member = getattr(self, "_member", None)
+        if member is None:
+            member = self._member = await _to_async(self._member_sync)(user)
+        return member
+
+    def _with_profile_urls(self, rows: list[dict[str, object]]) -> list[dict[str, object]]:
+        """Signs avatar URLs for this socket when rows are sent, not when stored."""
+        build = getattr(self, "_profile_url", None)
+        if build is None:
+            build = self._profile_url = profile_url_builder(self.scope, shared_expiry=True)
         return [
             {
-                "username": username,
-                "profileImage": info.get("profileImage"),
-                "avatarCrop": info.get("avatarCrop"),
+                "username": row.get("username"),
+                "profileImage": build(cast(str | None, row.get("imageName"))),
+                "avatarCrop": row.get("avatarCrop"),
             }
-            for username, info in cleaned.items()
+            for row in rows
         ]
 
-    async def _get_online(self) -> list[dict[str, object]]:
-        return await _to_async(self._get_online_sync)()
+    async def _add_user(self, user: Any) -> None:
+        username, image_name, avatar_crop = await self._resolve_member(user)
+        if not username:
+            return
+        await self._user_store().aconnect(username, member_payload(image_name, avatar_crop))
 
-    def _add_guest_sync(self, ip: str | None) -> None:
-        if not ip:
+    async def _remove_user(self, user: Any, graceful: bool = False) -> None:
+        username, _, _ = await self._resolve_member(user)
+        if not username:
             return
-        data = cache.get(self.guest_cache_key, {}) or {}
-        current = data.get(ip, {})
-        try:
-            count = int(current.get("count", 0))
-        except (TypeError, ValueError, AttributeError):
-            count = 0
-        data[ip] = {"count": count + 1, "last_seen": time.time(), "grace_until": 0}
-        cache.set(self.guest_cache_key, data, timeout=self.cache_timeout_seconds)
+        await self._user_store().adisconnect(username, graceful=graceful)
 
-    async def _add_guest(self, ip: str | None) -> None:
-        await _to_async(self._add_guest_sync)(ip)
+    async def _get_online(self) -> list[dict[str, object]]:
+        return self._with_profile_urls(online_rows(await self._user_store().aonline()))
 
-    def _remove_guest_sync(self, ip: str | None, graceful: bool = False) -> None:
+    async def _add_guest(self, ip: str | None) -> None:
         if not ip:
             return
-        data = cache.get(self.guest_cache_key, {}) or {}
-        current = data.get(ip, {})
-        try:
-            count = int(current.get("count", 0))
-        except (TypeError, ValueError, AttributeError):
-            count = 0
-        count -= 1
-        now = time.time()
-        if count <= 0:
-            if graceful or self.presence_grace <= 0:
-                data.pop(ip, None)
-            else:
-                data[ip] = {"count": 0, "last_seen": now, "grace_until": now + self.presence_grace}
-        else:
-            data[ip] = {"count": count, "last_seen": now, "grace_until": 0}
-        if data:
-            cache.set(self.guest_cache_key, data, timeout=self.cache_timeout_seconds)
-        else:
-            cache.delete(self.guest_cache_key)
+        await self._guest_store().aconnect(ip)
 
     async def _remove_guest(self, ip: str | None, graceful: bool = False) -> None:
-        await _to_async(self._remove_guest_sync)(ip, graceful)
-
-    def _get_guest_count_sync(self) -> int:
-        data = cache.get(self.guest_cache_key, {}) or {}
-        now = time.time()
-        cleaned = {}
-        for ip, info in data.items():
-            try:
-                count = int(info.get("count", 0))
-            except (TypeError, ValueError, AttributeError):
-                count = 0
-            last_seen = info.get("last_seen", 0)
-            grace_until = info.get("grace_until", 0)
-            if count > 0 and (now - last_seen) <= self.presence_ttl:
-                cleaned[ip] = info
-            elif (
-                count <= 0
-                and grace_until
-                and grace_until > now
-                and (now - last_seen) <= self.presence_ttl
-            ):
-                cleaned[ip] = info
-        if cleaned != data:
-            cache.set(self.guest_cache_key, cleaned, timeout=self.cache_timeout_seconds)
-        return len(cleaned)
+        if not ip:
+            return
+        await self._guest_store().adisconnect(ip, graceful=graceful)
 
     async def _get_guest_count(self) -> int:
-        return await _to_async(self._get_guest_count_sync)()
+        return await self._guest_store().acount()
 
-    def _touch_user_sync(self, user: Any) -> None:
-        username = user_public_username(user)
+    async def _touch_user(self, user: Any) -> None:
+        username, image_name, avatar_crop = await self._resolve_member(user)
         if not username:
             return
-        data = cache.get(self.cache_key, {})
-        current = data.get(username)
-        profile = getattr(user, "profile", None)
-        image_name = getattr(profile, "image", None)
-        image_name = image_name.name if image_name else ""
-        image_url = build_profile_url(self.scope, image_name) if image_name else None
-        avatar_crop = serialize_avatar_crop(profile)
-        if not current:
-            data[username] = {
-                "count": 1,
-                "profileImage": image_url,
-                "avatarCrop": avatar_crop,
-                "last_seen": time.time(),
-                "grace_until": 0,
-            }
-        else:
-            current["last_seen"] = time.time()
-            current["grace_until"] = 0
-            current["profileImage"] = image_url
-            current["avatarCrop"] = avatar_crop
-            data[username] = current
-        cache.set(self.cache_key, data, timeout=self.cache_timeout_seconds)
+        await self._user_store().atouch(username, member_payload(image_name, avatar_crop))
 
-    async def _touch_user(self, user: Any) -> None:
-        await _to_async(self._touch_user_sync)(user)
-
-    def _touch_guest_sync(self, ip: str | None) -> None:
+    async def _touch_guest(self, ip: str | None) -> None:
         if not ip:
             return
-        data = cache.get(self.guest_cache_key, {}) or {}
-        current = data.get(ip)
-        if not current:
-            data[ip] = {"count": 1, "last_seen": time.time(), "grace_until": 0}
-        else:
-            data[ip] = {
-                "count": current.get("count", 1),
-                "last_seen": time.time(),
-                "grace_until": 0,
-            }
-        cache.set(self.guest_cache_key, data, timeout=self.cache_timeout_seconds)
-
-    async def _touch_guest(self, ip: str | None) -> None:
-        await _to_async(self._touch_guest_sync)(ip)
+        await self._guest_store().atouch(ip)
 
     def _get_guest_session_key(self) -> str | None:
         """Returns guest session key from scope when session is initialized."""
@@ -0,0 +1,123 @@
+"""Per-member presence storage on top of the async state store.
+
+Every tracked member (a public username or a guest session key) owns two
+small keys instead of a slot in one shared blob:
+
+* ``<namespace>:member:<id>`` holds the broadcast payload and expires
+  ``ttl`` seconds after the last connect or touch;
+* ``<namespace>:conn:<id>`` is an atomic connection counter.
+
+Membership of the online set is tracked incrementally in an index: a native
+Redis set when the default cache is Redis, a process-local set otherwise
+(which has the same reach as a local-memory cache). Readers fetch the index
+plus one ``get_many`` and drop only members whose key has expired, so a
+broadcast never rewrites shared state.
+
+All access goes through ``chat_app_django.state_store``, so consumers and
+the broadcaster update presence without a thread hop. Keys and values are
+the Django cache ones, readable from sync code with ``cache.get``.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from chat_app_django.state_store import AsyncStateStore, get_state_store
+
+
+def index_name(namespace: str) -> str:
+    return f"{namespace}:index"
+
+
+class PresenceStore:
+    """Connection-counted presence of members within one namespace."""
+
+    def __init__(self, namespace: str, *, ttl: int, grace: int, counter_timeout: int):
+        self.namespace = namespace
+        self.ttl = max(1, int(ttl))
+        self.grace = max(0, int(grace))
+        self.counter_timeout = max(self.ttl, int(counter_timeout))
+        self.index_key = index_name(namespace)
+
+    def member_key(self, member: str) -> str:
+        return f"{self.namespace}:member:{member}"
+
+    def counter_key(self, member: str) -> str:
+        return f"{self.namespace}:conn:{member}"
+
+    @property
+    def _store(self) -> AsyncStateStore:
+        return get_state_store()
+
+    async def _incr_connections(self, member: str) -> int:
+        key = self.counter_key(member)
+        await self._store.add(key, 0, timeout=self.counter_timeout)
+        try:
+            count = int(await self._store.incr(key))
+        except (TypeError, ValueError):
+            count = 1
+            await self._store.set(key, count, timeout=self.counter_timeout)
+        await self._store.touch(key, timeout=self.counter_timeout)
+        return count
+
+    async def aconnect(self, member: str, payload: dict[str, Any] | None = None) -> int:
+        """Register one more connection of ``member``; returns the connection count."""
+        count = await self._incr_connections(member)
+        await self._store.set(self.member_key(member), payload or {}, timeout=self.ttl)
+        await self._store.set_add(self.index_key, member)
+        return count
+
+    async def adisconnect(self, member: str, *, graceful: bool = False) -> int:
+        """Drop one connection; returns the number of connections left.
+
+        When the last connection goes away ungracefully the member stays
+        listed for ``grace`` seconds so a quick reconnect does not flap.
+        """
+        counter_key = self.counter_key(member)
+        member_key = self.member_key(member)
+        try:
+            remaining = int(await self._store.incr(counter_key, -1))
+        except (TypeError, ValueError):
+            remaining = 0
+        if remaining > 0:
+            await self._store.touch(member_key, timeout=self.ttl)
+            return remaining
+
+        await self._store.delete(counter_key)
+        if graceful or self.grace <= 0:
+            await self._store.delete(member_key)
+            await self._store.set_remove(self.index_key, member)
+        else:
+            await self._store.touch(member_key, timeout=min(self.grace, self.ttl))
+        return 0
+
+    async def atouch(self, member: str, payload: dict[str, Any] | None = None) -> None:
+        """Extend the liveness of ``member``; O(1) regardless of how many are online."""
+        member_key = self.member_key(member)
+        if payload is not None:
+            await self._store.set(member_key, payload, timeout=self.ttl)
+        elif not await self._store.touch(member_key, timeout=self.ttl):
+            await self._store.set(member_key, {}, timeout=self.ttl)
+        counter_key = self.counter_key(member)
+        if not await self._store.touch(counter_key, timeout=self.counter_timeout):
+            await self._store.add(counter_key, 1, timeout=self.counter_timeout)
+        # Idempotent; heals the index if a concurrent reader pruned the member.
+        await self._store.set_add(self.index_key, member)
+
+    async def aonline(self) -> dict[str, dict[str, Any]]:
+        """Return live members and their payloads, pruning expired index entries."""
+        members = await self._store.set_members(self.index_key)
+        if not members:
+            return {}
+        keys = {self.member_key(member): member for member in members}
+        found = await self._store.get_many(list(keys))
+        stale = [member for key, member in keys.items() if key not in found]
+        if stale:
+            await self._store.set_remove(self.index_key, *stale)
+        return {
+            keys[key]: payload if isinstance(payload, dict) else {}
+            for key, payload in sorted(found.items(), key=lambda item: keys[item[0]])
+        }
+
+    async def acount(self) -> int:
+        return len(await self.aonline())
@@ -5,9 +5,10 @@ from __future__ import annotations
 from dataclasses import dataclass
 
 from django.http import Http404
+from django.utils import timezone
 
 from roles.domain import rules
-from roles.infrastructure import repositories
+from roles.infrastructure import permission_cache, repositories
 from roles.permissions import (
     DM_PARTICIPANT,
     EVERYONE_GROUP_PRIVATE,
@@ -108,17 +109,28 @@ def _get_default_everyone_permissions(room: Room) -> int:
     return 0
 
 
-def compute_permissions(room: Room, user) -> Perm:
-    """Computes effective permissions for a user in a room."""
-    if not user or not getattr(user, "is_authenticated", False):
-        if room.kind in {Room.Kind.PUBLIC, Room.Kind.GROUP}:
-            if room.kind == Room.Kind.GROUP and not getattr(room, "is_public", False):
-                return Perm(0)
-            return Perm.READ_MESSAGES
-        return Perm(0)
+def _anonymous_permissions(room: Room) -> Perm:
+    if room.kind in {Room.Kind.PUBLIC, Room.Kind.GROUP}:
+        if room.kind == Room.Kind.GROUP and not getattr(room, "is_public", False):
+            return Perm(0)
+        return Perm.READ_MESSAGES
+    return Perm(0)
 
+
+def _seconds_until(moment) -> float | None:
+    if moment is None:
+        return None
+    return (moment - timezone.now()).total_seconds()
+
+
+def _compute_member_permissions(room: Room, user) -> tuple[Perm, float | None]:
+    """Resolve permissions from the DB.
+
+    Returns the effective mask and, when the result depends on a pending
+    deadline (an active mute), the number of seconds it stays valid.
+    """
     if room.kind == Room.Kind.DIRECT:
-        return _compute_direct_permissions(room, user)
+        return _compute_direct_permissions(room, user), None
 
     default_permissions = repositories.get_default_role_permissions(room)
     if default_permissions is not None:
@@ -130,12 +142,12 @@ def compute_permissions(room: Room, user) -> Perm:
     if not membership:
         if room.kind == Room.Kind.GROUP:
             if not getattr(room, "is_public", False):
-                return Perm(0)
+                return Perm(0), None
             # Public groups are readable before join, but writing requires membership.
-            return Perm.READ_MESSAGES
-        return Perm(everyone_permissions)
+            return Perm.READ_MESSAGES, None
+        return Perm(everyone_permissions), None
     if membership.is_banned:
-        return Perm(0)
+        return Perm(0), None
 
     member_roles = list(membership.roles.all())
     role_permissions = [int(role.permissions) for role in member_roles]
@@ -147,7 +159,7 @@ def compute_permissions(room: Room, user) -> Perm:
     }
     user_id = getattr(user, "pk", None)
     if user_id is None:
-        return Perm(0)
+        return Perm(0), None
 
     role_overrides: list[tuple[int, int]] = []
     user_overrides: list[tuple[int, int]] = []
@@ -167,9 +179,35 @@ def compute_permissions(room: Room, user) -> Perm:
     )
 
     # Strip SEND_MESSAGES if member is muted (unless ADMINISTRATOR)
+    valid_for = None
     if membership.is_muted and not (int(effective) & Perm.ADMINISTRATOR):
         effective = Perm(int(effective) & ~int(Perm.SEND_MESSAGES))
+        valid_for = _seconds_until(getattr(membership, "muted_until", None))
+
+    return effective, valid_for
+
+
+def compute_permissions(room: Room, user) -> Perm:
+    """Computes effective permissions for a user in a room.
+
+    Results for authenticated users are served from the versioned
+    per-process cache; see ``roles.infrastructure.permission_cache``.
+    """
+    if not user or not getattr(user, "is_authenticated", False):
+        return _anonymous_permissions(room)
+
+    room_id = getattr(room, "pk", None)
+    user_id = getattr(user, "pk", None)
+    if room_id is None or user_id is None or not permission_cache.is_enabled():
+        return _compute_member_permissions(room, user)[0]
+
+    generation = permission_cache.get_room_generation(room_id)
+    cached = permission_cache.get_cached(room_id, user_id, generation)
+    if cached is not None:
+        return Perm(cached)
 
+    effective, valid_for = _compute_member_permissions(room, user)
+    permission_cache.store(room_id, user_id, generation, int(effective), valid_for=valid_for)
     return effective
 
 
@@ -0,0 +1,117 @@
+"""Change numbers for the direct inbox ``since`` cursor.
+
+Every change a user's inbox must pick up (new, edited or deleted last
+message, a new, banned or removed membership) takes the next value of that
+user's ``MembershipSyncCounter`` and stamps it on the membership (or on a
+tombstone when the membership is gone). The counter row stays locked until
+the transaction commits, so a user's numbers become visible in commit
+order: a client that synced up to ``N`` can never miss a change that
+commits later with a number below ``N``.
+
+Tombstones are kept for ``CHAT_SYNC_TOMBSTONE_RETENTION_DAYS``. Pruning
+raises the user's ``pruned_seq``, and a cursor below it is stale: the
+removals it would need are gone, so the client has to reload the list.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, QuerySet, Subquery
+from django.db.models.functions import Greatest
+
+from roles.models import MembershipSyncCounter, MembershipTombstone
+
+
+def _advance_counters(user_ids: Iterable[int]) -> list[int]:
+    """Lock and increment the counters of ``user_ids``; returns the sorted ids."""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return user_ids
+    # Locks are taken in user id order so two transactions bumping the same
+    # pair of users cannot deadlock.
+    existing = set(
+        MembershipSyncCounter.objects.select_for_update()
+        .filter(user_id__in=user_ids)
+        .order_by("user_id")
+        .values_list("user_id", flat=True)
+    )
+    missing = [user_id for user_id in user_ids if user_id not in existing]
+    if missing:
+        MembershipSyncCounter.objects.bulk_create(
+            [MembershipSyncCounter(user_id=user_id) for user_id in missing],
+            ignore_conflicts=True,
+        )
+        list(
+            MembershipSyncCounter.objects.select_for_update()
+            .filter(user_id__in=missing)
+            .order_by("user_id")
+            .values_list("user_id", flat=True)
+        )
+    MembershipSyncCounter.objects.filter(user_id__in=user_ids).update(value=F("value") + 1)
+    return user_ids
+
+
+def bump_memberships(memberships: QuerySet) -> None:
+    """Stamp ``memberships`` with the next change number of their users."""
+    with transaction.atomic():
+        user_ids = _advance_counters(memberships.values_list("user_id", flat=True))
+        if not user_ids:
+            return
+        memberships.update(
+            sync_seq=Subquery(
+                MembershipSyncCounter.objects.filter(user_id=OuterRef("user_id")).values("value")[:1]
+            )
+        )
+
+
+def record_removal(user_id: int, room_slug: str) -> None:
+    """Leave a tombstone so the next sync of ``user_id`` drops ``room_slug``."""
+    with transaction.atomic():
+        _advance_counters([user_id])
+        seq = MembershipSyncCounter.objects.values_list("value", flat=True).get(user_id=user_id)
+        MembershipTombstone.objects.create(user_id=user_id, room_slug=room_slug, sync_seq=seq)
+
+
+def current_seq(user_id: int) -> int:
+    """Last committed change number of ``user_id`` (0 before the first change)."""
+    value = MembershipSyncCounter.objects.filter(user_id=user_id).values_list("value", flat=True).first()
+    return int(value or 0)
+
+
+def is_stale(user_id: int, since: int) -> bool:
+    """Whether tombstones newer than ``since`` may already have been pruned."""
+    pruned = MembershipSyncCounter.objects.filter(user_id=user_id).values_list("pruned_seq", flat=True).first()
+    return since < int(pruned or 0)
+
+
+def prune_tombstones(before: datetime, *, batch_size: int) -> int:
+    """Delete tombstones removed before ``before``; returns how many were deleted.
+
+    Each batch raises ``pruned_seq`` of the affected users in the same
+    transaction as the delete, so no cursor can silently skip a removal.
+    """
+    stale = MembershipTombstone.objects.filter(removed_at__lt=before).order_by("id")
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(stale.values_list("id", flat=True)[:batch_size])
+            if not ids:
+                return total
+            batch = MembershipTombstone.objects.filter(id__in=ids)
+            horizons = dict(batch.values_list("user_id").annotate(seq=Max("sync_seq")).order_by("user_id"))
+            # Same lock order as _advance_counters.
+            list(
+                MembershipSyncCounter.objects.select_for_update()
+                .filter(user_id__in=horizons)
+                .order_by("user_id")
+                .values_list("user_id", flat=True)
+            )
+            for user_id, seq in horizons.items():
+                MembershipSyncCounter.objects.filter(user_id=user_id).update(pruned_seq=Greatest("pruned_seq", seq))
+            deleted, _details = batch.delete()
+            total += deleted
+        if len(ids) < batch_size:
+            return total
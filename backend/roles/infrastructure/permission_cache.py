@@ -0,0 +1,133 @@
+"""Versioned in-process cache of effective room permissions.
+
+Entries are kept per worker process and keyed by ``(room_id, user_id)``.
+Each entry remembers the room generation it was computed under; the
+generation counter itself lives in the shared Django cache, so a bump from
+any process invalidates every worker's entries for that room.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+GENERATION_KEY_PREFIX = "roles:perm_gen"
+
+
+@dataclass(frozen=True)
+class _Entry:
+    generation: int
+    permissions: int
+    expires_at: float
+
+
+_entries: OrderedDict[tuple[int, int], _Entry] = OrderedDict()
+_lock = threading.Lock()
+
+
+def _ttl_seconds() -> int:
+    return max(0, int(getattr(settings, "ROLES_PERMISSION_CACHE_TTL", 60)))
+
+
+def _max_entries() -> int:
+    return max(1, int(getattr(settings, "ROLES_PERMISSION_CACHE_MAX_ENTRIES", 50000)))
+
+
+def is_enabled() -> bool:
+    return _ttl_seconds() > 0
+
+
+def generation_key(room_id: int) -> str:
+    return f"{GENERATION_KEY_PREFIX}:{int(room_id)}"
+
+
+def get_room_generation(room_id: int) -> int:
+    """Return the current generation of a room, seeding it on first use.
+
+    The seed is time-based so that a flushed or evicted counter never
+    reuses a value an old local entry may still carry.
+    """
+    key = generation_key(room_id)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        value = cache.get(key)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _bump_now(room_id: int) -> None:
+    key = generation_key(room_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_room_generation(room_id: int | None) -> None:
+    """Invalidate cached permissions of every user in the room.
+
+    The counter is bumped immediately and once more after the surrounding
+    transaction commits, so a concurrent reader cannot cache pre-commit
+    state under the new generation.
+    """
+    if room_id is None:
+        return
+    room_id = int(room_id)
+    _bump_now(room_id)
+    transaction.on_commit(lambda: _bump_now(room_id))
+
+
+def get_cached(room_id: int, user_id: int, generation: int) -> int | None:
+    key = (int(room_id), int(user_id))
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        if entry.generation != generation or entry.expires_at <= now:
+            _entries.pop(key, None)
+            return None
+        _entries.move_to_end(key)
+        return entry.permissions
+
+
+def store(
+    room_id: int,
+    user_id: int,
+    generation: int,
+    permissions: int,
+    *,
+    valid_for: float | None = None,
+) -> None:
+    """Store computed permissions; ``valid_for`` caps the entry lifetime."""
+    ttl = float(_ttl_seconds())
+    if valid_for is not None:
+        ttl = min(ttl, float(valid_for))
+    if ttl <= 0:
+        return
+    key = (int(room_id), int(user_id))
+    entry = _Entry(
+        generation=int(generation),
+        permissions=int(permissions),
+        expires_at=time.monotonic() + ttl,
+    )
+    limit = _max_entries()
+    with _lock:
+        _entries[key] = entry
+        _entries.move_to_end(key)
+        while len(_entries) > limit:
+            _entries.popitem(last=False)
+
+
+def clear_local() -> None:
+    with _lock:
+        _entries.clear()
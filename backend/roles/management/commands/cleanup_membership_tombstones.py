@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from roles.infrastructure.membership_sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет надгробия удалённых личных диалогов старше N дней. "
+        "Клиенты с более старым курсором `since` получают 410 и загружают список заново."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=int(getattr(settings, "CHAT_SYNC_TOMBSTONE_RETENTION_DAYS", 30)),
+            help="Период хранения в днях (по умолчанию из CHAT_SYNC_TOMBSTONE_RETENTION_DAYS).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Размер пачки удаления.",
+        )
+
+    def handle(self, *args, **options):
+        days = int(options["days"])
+        if days < 1:
+            raise CommandError("--days должно быть >= 1")
+        batch_size = int(options["batch_size"])
+        if batch_size < 1:
+            raise CommandError("--batch-size должно быть >= 1")
+
+        cutoff = timezone.now() - timezone.timedelta(days=days)
+        deleted = prune_tombstones(cutoff, batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Удалено {deleted} надгробий старше {days} дней"))
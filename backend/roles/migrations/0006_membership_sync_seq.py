@@ -0,0 +1,49 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roles', '0005_membership_muted_by_membership_muted_until'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MembershipSyncCounter',
+            fields=[
+                ('user_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'roles_membership_sync_counter',
+            },
+        ),
+        migrations.CreateModel(
+            name='MembershipTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField()),
+                ('room_slug', models.CharField(max_length=60)),
+                ('sync_seq', models.BigIntegerField()),
+                ('removed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'roles_membership_tombstone',
+            },
+        ),
+        migrations.AddField(
+            model_name='membership',
+            name='sync_seq',
+            field=models.BigIntegerField(default=0, help_text="Change number of the user's last direct inbox change in this room."),
+        ),
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(fields=['user', 'sync_seq'], name='membership_user_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membershiptombstone',
+            index=models.Index(fields=['user_id', 'sync_seq'], name='membership_tombstone_sync_idx'),
+        ),
+    ]
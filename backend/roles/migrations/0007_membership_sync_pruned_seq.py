@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roles', '0006_membership_sync_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='membershipsynccounter',
+            name='pruned_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -2,6 +2,8 @@
 
 Role      — per-room role definition with permissions bitmask and hierarchy.
 Membership — links a user to a room; carries M2M roles and ban state.
+MembershipSyncCounter / MembershipTombstone — change numbers behind the
+direct inbox ``since`` cursor.
 
 Direct chats have no roles — access is based on Room.direct_pair_key.
 """
@@ -170,6 +172,10 @@ class Membership(models.Model):
         related_name="mutes_issued",
     )
     joined_at = models.DateTimeField(auto_now_add=True)
+    sync_seq = models.BigIntegerField(
+        default=0,
+        help_text="Change number of the user's last direct inbox change in this room.",
+    )
     room_id: int
     user_id: int
     banned_by_id: Optional[int]
@@ -185,6 +191,7 @@ class Membership(models.Model):
         ]
         indexes = [
             models.Index(fields=["user", "room"], name="membership_user_room_idx"),
+            models.Index(fields=["user", "sync_seq"], name="membership_user_sync_idx"),
         ]
 
     def __str__(self):
@@ -203,6 +210,43 @@ class Membership(models.Model):
         return self.muted_until > timezone.now()
 
 
+class MembershipSyncCounter(models.Model):
+    """Last change number handed out for a user's direct inbox.
+
+    Keyed by plain user id (no FK) so removals recorded inside a user
+    deletion cascade do not reference a row that is going away.
+    """
+
+    user_id = models.BigIntegerField(primary_key=True)
+    value = models.BigIntegerField(default=0)
+    # Highest change number whose tombstone was pruned; older cursors must resync.
+    pruned_seq = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = "roles_membership_sync_counter"
+
+    def __str__(self):
+        return f"{self.user_id}:{self.value}"
+
+
+class MembershipTombstone(models.Model):
+    """A direct chat membership that was deleted, for incremental sync."""
+
+    user_id = models.BigIntegerField()
+    room_slug = models.CharField(max_length=60)
+    sync_seq = models.BigIntegerField()
+    removed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "roles_membership_tombstone"
+        indexes = [
+            models.Index(fields=["user_id", "sync_seq"], name="membership_tombstone_sync_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.room_slug}:{self.user_id}@{self.sync_seq}"
+
+
 class PermissionOverride(models.Model):
     """Per-role or per-user permission override within a room.
 
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
-from django.db.models.signals import post_delete, post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 
 from chat_app_django.security.audit import audit_security_event
+from rooms.models import Room
 
-from .models import Membership, Role
+from .infrastructure import membership_sync
+from .infrastructure.permission_cache import bump_room_generation
+from .models import Membership, PermissionOverride, Role
 
 
 @receiver(post_save, sender=Membership)
@@ -53,3 +56,52 @@ def audit_role_delete(sender, instance: Role, **kwargs):
         room_slug=getattr(instance.room, "slug", None),
         role_name=instance.name,
     )
+
+
+# ── Permission cache invalidation ─────────────────────────────────────
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def invalidate_room_permissions(sender, instance: Room, **kwargs):
+    bump_room_generation(instance.pk)
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+@receiver(post_save, sender=PermissionOverride)
+@receiver(post_delete, sender=PermissionOverride)
+def invalidate_member_permissions(sender, instance, **kwargs):
+    bump_room_generation(getattr(instance, "room_id", None))
+
+
+@receiver(m2m_changed, sender=Membership.roles.through)
+def invalidate_membership_roles(sender, instance, action: str, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if isinstance(instance, Membership):
+        bump_room_generation(instance.room_id)
+        return
+    # Reverse side (role.members.add(...)): the role belongs to one room.
+    bump_room_generation(getattr(instance, "room_id", None))
+
+
+# ── Direct inbox sync ─────────────────────────────────────────────────
+
+
+@receiver(post_save, sender=Membership)
+def bump_direct_membership_sync(sender, instance: Membership, raw: bool = False, **kwargs):
+    # Creation, ban and unban of a DM membership all change the peer list.
+    if raw or instance.room.kind != Room.Kind.DIRECT:
+        return
+    membership_sync.bump_memberships(Membership.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Membership)
+def record_direct_membership_removal(sender, instance: Membership, **kwargs):
+    room = instance.room
+    if room.kind != Room.Kind.DIRECT:
+        return
+    membership_sync.record_removal(instance.user_id, room.slug)
@@ -0,0 +1,100 @@
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from roles.application.permission_service import can_write, compute_permissions
+from roles.infrastructure import permission_cache
+from roles.models import Membership, PermissionOverride, Role
+from roles.permissions import Perm
+from rooms.models import Room
+
+User = get_user_model()
+
+
+class PermissionCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        permission_cache.clear_local()
+        self.owner = User.objects.create_user(username="owner", password="testpass123")
+        self.member_user = User.objects.create_user(username="member", password="testpass123")
+        self.room = Room.objects.create(
+            name="Cached Group",
+            slug="g-perm-cache-abc12345",
+            kind=Room.Kind.GROUP,
+            is_public=False,
+            created_by=self.owner,
+        )
+        self.roles = Role.create_defaults_for_room(self.room)
+        self.membership = Membership.objects.create(room=self.room, user=self.member_user)
+        self.membership.roles.add(self.roles["Member"])
+
+    def tearDown(self):
+        permission_cache.clear_local()
+
+    def test_second_call_hits_cache_without_queries(self):
+        self.assertTrue(can_write(self.room, self.member_user))
+        with self.assertNumQueries(0):
+            self.assertTrue(can_write(self.room, self.member_user))
+
+    def test_role_change_invalidates_cached_permissions(self):
+        self.assertFalse(compute_permissions(self.room, self.member_user) & Perm.ADMINISTRATOR)
+        member_role = self.roles["Member"]
+        member_role.permissions = int(member_role.permissions) | int(Perm.ADMINISTRATOR)
+        member_role.save(update_fields=["permissions"])
+        self.assertTrue(compute_permissions(self.room, self.member_user) & Perm.ADMINISTRATOR)
+
+    def test_membership_roles_change_invalidates_cached_permissions(self):
+        self.assertFalse(compute_permissions(self.room, self.member_user) & Perm.ADMINISTRATOR)
+        self.membership.roles.add(self.roles["Owner"])
+        self.assertTrue(compute_permissions(self.room, self.member_user) & Perm.ADMINISTRATOR)
+
+    def test_override_and_membership_delete_invalidate(self):
+        self.assertTrue(can_write(self.room, self.member_user))
+        override = PermissionOverride.objects.create(
+            room=self.room,
+            target_user=self.member_user,
+            deny=int(Perm.SEND_MESSAGES),
+        )
+        self.assertFalse(can_write(self.room, self.member_user))
+        override.delete()
+        self.assertTrue(can_write(self.room, self.member_user))
+        self.membership.delete()
+        self.assertFalse(can_write(self.room, self.member_user))
+
+    @override_settings(ROLES_PERMISSION_CACHE_TTL=3600)
+    def test_mute_entry_expires_with_mute_deadline(self):
+        self.membership.muted_until = timezone.now() + timedelta(seconds=30)
+        self.membership.save(update_fields=["muted_until"])
+        self.assertFalse(can_write(self.room, self.member_user))
+
+        after_deadline = time.monotonic() + 31
+        with patch("roles.infrastructure.permission_cache.time.monotonic", return_value=after_deadline):
+            with patch(
+                "roles.models.Membership.is_muted",
+                new_callable=lambda: property(lambda _self: False),
+            ):
+                self.assertTrue(can_write(self.room, self.member_user))
+
+    def test_flushed_generation_does_not_reuse_local_entries(self):
+        self.assertTrue(can_write(self.room, self.member_user))
+        cache.clear()
+        with patch(
+            "roles.application.permission_service._compute_member_permissions",
+            return_value=(Perm(0), None),
+        ) as compute:
+            self.assertFalse(can_write(self.room, self.member_user))
+        compute.assert_called_once()
+
+    @override_settings(ROLES_PERMISSION_CACHE_TTL=0)
+    def test_disabled_cache_always_recomputes(self):
+        self.assertTrue(can_write(self.room, self.member_user))
+        with patch(
+            "roles.application.permission_service._compute_member_permissions",
+            return_value=(Perm(0), None),
+        ):
+            self.assertFalse(can_write(self.room, self.member_user))
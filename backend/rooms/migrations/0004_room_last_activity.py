@@ -0,0 +1,65 @@
+"""Denormalize the last message pointer and last activity time onto Room.
+
+Existing rooms are backfilled from their newest message, or from the
+earliest membership when the room has no messages yet.
+"""
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_last_activity(apps, schema_editor):
+    Room = apps.get_model("rooms", "Room")
+    Message = apps.get_model("chat_messages", "Message")
+    Membership = apps.get_model("roles", "Membership")
+
+    newest = Message.objects.filter(room_id=OuterRef("pk")).order_by("-date_added", "-id")
+    first_join = Membership.objects.filter(room_id=OuterRef("pk")).order_by("joined_at")
+    Room.objects.update(
+        last_message_id=Subquery(newest.values("id")[:1]),
+        last_activity_at=Coalesce(
+            Subquery(newest.values("date_added")[:1]),
+            Subquery(first_join.values("joined_at")[:1]),
+            models.F("last_activity_at"),
+        ),
+    )
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat_messages", "0004_messagereadstate_unread_count"),
+        ("roles", "0005_membership_muted_by_membership_muted_until"),
+        ("rooms", "0003_room_avatar_crop"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="room",
+            name="last_activity_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="last_message",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="chat_messages.message",
+            ),
+        ),
+        migrations.RunPython(backfill_last_activity, noop),
+        migrations.AddIndex(
+            model_name="room",
+            index=models.Index(fields=["kind", "-last_activity_at", "-id"], name="room_kind_activity_idx"),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from typing import Optional
 
 
@@ -63,8 +64,25 @@ class Room(models.Model):
     max_members = models.PositiveIntegerField(default=200000)
     member_count = models.PositiveIntegerField(default=0)
 
+    # ── Activity (denormalized, updated on message insert) ─────────────
+    last_message = models.ForeignKey(
+        "chat_messages.Message",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    last_activity_at = models.DateTimeField(default=timezone.now)
+    last_message_id: Optional[int]
+
     class Meta:
         db_table = "chat_room"
+        indexes = [
+            models.Index(
+                fields=["kind", "-last_activity_at", "-id"],
+                name="room_kind_activity_idx",
+            ),
+        ]
 
     def __str__(self):
         return str(self.name)
@@ -29,7 +29,7 @@ from chat_app_django.media_utils import (
     serialize_avatar_crop,
 )
 from chat_app_django.security.audit import audit_http_event
-from chat_app_django.security.rate_limit import DbRateLimiter, RateLimitPolicy
+from chat_app_django.security.rate_limit import RateLimitPolicy, is_rate_limited
 
 from users.application import auth_service
 from users.application.errors import IdentityServiceError
@@ -100,7 +100,7 @@ def _rate_limited(request, action: str) -> bool:
     ip = _get_client_ip(request) or "unknown"
     scope_key = f"rl:auth:{action}:{ip}"
     policy = RateLimitPolicy(limit=limit, window_seconds=window)
-    return DbRateLimiter.is_limited(scope_key=scope_key, policy=policy)
+    return is_rate_limited(scope_key=scope_key, policy=policy)
 
 
 def _identity_error_response(exc: IdentityServiceError) -> Response:
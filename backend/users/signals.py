@@ -7,12 +7,18 @@ from django.db import IntegrityError
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 
+from chat.sender import notify_profile_changed_on_commit
 from chat_app_django.security.audit import audit_security_event
 from messages.models import Message
 
 from .identity import user_public_username
 from .models import Profile
 
+# Profile fields that chat sockets keep in their sender snapshot.
+CHAT_SENDER_PROFILE_FIELDS = frozenset(
+    {"username", "image", "avatar_crop_x", "avatar_crop_y", "avatar_crop_width", "avatar_crop_height"}
+)
+
 
 @receiver(pre_save, sender=User)
 def remember_previous_username(sender, instance, **kwargs):
@@ -55,6 +61,7 @@ def sync_chat_username_snapshots(sender, instance, **kwargs):
         return
 
     Message.objects.filter(user=instance).exclude(username=new_username).update(username=new_username)
+    notify_profile_changed_on_commit(instance.pk)
     audit_security_event(
         "user.username.changed",
         actor_user=instance,
@@ -100,3 +107,12 @@ def sync_chat_profile_username_snapshots(sender, instance, **kwargs):
         old_username=old_username,
         new_username=new_username,
     )
+
+
+@receiver(post_save, sender=Profile)
+def notify_chat_sender_profile_changed(sender, instance, created=False, update_fields=None, **kwargs):
+    if kwargs.get("raw", False) or created:
+        return
+    if update_fields is not None and not CHAT_SENDER_PROFILE_FIELDS.intersection(update_fields):
+        return
+    notify_profile_changed_on_commit(instance.user_id)
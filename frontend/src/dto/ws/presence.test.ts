@@ -27,6 +27,29 @@ describe("presence WS DTO decoder", () => {
         },
       ],
       guests: 2,
+      seq: null,
+    });
+  });
+
+  it("decodes delta event", () => {
+    const decoded = decodePresenceWsEvent(
+      JSON.stringify({
+        type: "presence.delta",
+        seq: 7,
+        joins: [{ username: "bob", profileImage: "https://cdn/bob.jpg" }],
+        leaves: ["alice"],
+        guests: 3,
+      }),
+    );
+
+    expect(decoded).toEqual({
+      type: "delta",
+      seq: 7,
+      joins: [
+        { username: "bob", profileImage: "https://cdn/bob.jpg", avatarCrop: null },
+      ],
+      leaves: ["alice"],
+      guests: 3,
     });
   });
 
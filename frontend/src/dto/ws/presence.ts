@@ -24,6 +24,17 @@ const presenceStateSchema = z
   .object({
     online: z.array(onlineUserSchema).optional(),
     guests: z.union([z.number(), z.string()]).optional(),
+    seq: z.number().int().optional(),
+  })
+  .passthrough();
+
+const presenceDeltaSchema = z
+  .object({
+    type: z.literal("presence.delta"),
+    seq: z.number().int(),
+    joins: z.array(onlineUserSchema),
+    leaves: z.array(z.string().min(1)),
+    guests: z.union([z.number(), z.string()]).nullable().optional(),
   })
   .passthrough();
 
@@ -38,11 +49,25 @@ const toGuests = (value: unknown): number | null => {
   return null;
 };
 
+const toOnlineUser = (entry: z.infer<typeof onlineUserSchema>): OnlineUser => ({
+  username: entry.username,
+  profileImage: entry.profileImage ?? null,
+  avatarCrop: entry.avatarCrop ?? null,
+});
+
 export type PresenceWsEvent =
   | {
       type: "state";
       online: OnlineUser[] | null;
       guests: number | null;
+      seq: number | null;
+    }
+  | {
+      type: "delta";
+      seq: number;
+      joins: OnlineUser[];
+      leaves: string[];
+      guests: number | null;
     }
   | { type: "ping" }
   | { type: "unknown" };
@@ -62,6 +87,17 @@ export const decodePresenceWsEvent = (raw: string): PresenceWsEvent => {
     return { type: "ping" };
   }
 
+  const delta = safeDecode(presenceDeltaSchema, payload);
+  if (delta) {
+    return {
+      type: "delta",
+      seq: delta.seq,
+      joins: delta.joins.map(toOnlineUser),
+      leaves: delta.leaves,
+      guests: toGuests(delta.guests),
+    };
+  }
+
   const state = safeDecode(presenceStateSchema, payload);
   if (!state) {
     return { type: "unknown" };
@@ -69,13 +105,8 @@ export const decodePresenceWsEvent = (raw: string): PresenceWsEvent => {
 
   return {
     type: "state",
-    online: state.online
-      ? state.online.map((entry) => ({
-          username: entry.username,
-          profileImage: entry.profileImage ?? null,
-          avatarCrop: entry.avatarCrop ?? null,
-        }))
-      : null,
+    online: state.online ? state.online.map(toOnlineUser) : null,
     guests: toGuests(state.guests),
+    seq: state.seq ?? null,
   };
 };
@@ -105,6 +105,94 @@ describe("PresenceProvider", () => {
     expect(apiMock.ensurePresenceSession).not.toHaveBeenCalled();
   });
 
+  it("applies sequenced deltas and requests resync on a gap", async () => {
+    render(
+      <PresenceProvider user={user}>
+        <PresenceProbe />
+      </PresenceProvider>,
+    );
+
+    await waitFor(() => expect(wsMock.options?.url).toContain("/ws/presence/"));
+
+    const emit = (payload: unknown) =>
+      act(() => {
+        wsMock.options?.onMessage?.(
+          new MessageEvent("message", { data: JSON.stringify(payload) }),
+        );
+      });
+
+    emit({
+      online: [{ username: "demo", profileImage: null }],
+      guests: 1,
+      seq: 4,
+    });
+    emit({
+      type: "presence.delta",
+      seq: 5,
+      joins: [{ username: "alice", profileImage: null }],
+      leaves: [],
+      guests: 2,
+    });
+
+    expect(screen.getByTestId("online-count").textContent).toBe("2");
+    expect(screen.getByTestId("guest-count").textContent).toBe("2");
+
+    wsMock.send.mockClear();
+    emit({
+      type: "presence.delta",
+      seq: 7,
+      joins: [],
+      leaves: ["alice"],
+      guests: 2,
+    });
+
+    expect(screen.getByTestId("online-count").textContent).toBe("2");
+    expect(wsMock.send).toHaveBeenCalledWith(JSON.stringify({ type: "resync" }));
+  });
+
+  it("keeps the signed-in user's current avatar over stale presence rows", async () => {
+    const { rerender } = render(
+      <PresenceProvider user={user}>
+        <PresenceProbe />
+      </PresenceProvider>,
+    );
+
+    await waitFor(() => expect(wsMock.options?.url).toContain("/ws/presence/"));
+
+    const emit = (payload: unknown) =>
+      act(() => {
+        wsMock.options?.onMessage?.(
+          new MessageEvent("message", { data: JSON.stringify(payload) }),
+        );
+      });
+
+    emit({ online: [], guests: 0, seq: 1 });
+    emit({
+      type: "presence.delta",
+      seq: 2,
+      joins: [{ username: "demo", profileImage: "https://cdn.example.com/old.jpg" }],
+      leaves: [],
+      guests: 0,
+    });
+
+    expect(screen.getByTestId("online-json").textContent).toContain(
+      "https://cdn.example.com/demo.jpg",
+    );
+    expect(screen.getByTestId("online-json").textContent).not.toContain("old.jpg");
+
+    rerender(
+      <PresenceProvider
+        user={{ ...user, profileImage: "https://cdn.example.com/new.jpg" }}
+      >
+        <PresenceProbe />
+      </PresenceProvider>,
+    );
+
+    expect(screen.getByTestId("online-json").textContent).toContain(
+      "https://cdn.example.com/new.jpg",
+    );
+  });
+
   it("bootstraps guest session before websocket and keeps guest counter", async () => {
     render(
       <PresenceProvider user={null}>
@@ -1,4 +1,4 @@
-﻿import { useCallback, useEffect, useMemo, useState } from "react";
+﻿import { useCallback, useEffect, useMemo, useRef, useState } from "react";
 import type { ReactNode } from "react";
 
 import { apiService } from "../../adapters/ApiService";
@@ -32,6 +32,8 @@ export function PresenceProvider({
   const [guestCount, setGuestCount] = useState(0);
   const [guestSessionReady, setGuestSessionReady] = useState(false);
   const needsGuestSessionBootstrap = ready && !user && !guestSessionReady;
+  const lastSeqRef = useRef<number | null>(null);
+  const requestResyncRef = useRef<() => void>(() => {});
 
   useEffect(() => {
     if (!needsGuestSessionBootstrap) return;
@@ -61,34 +63,55 @@ export function PresenceProvider({
     return `${base}?auth=${user ? "1" : "0"}`;
   }, [guestSessionReady, ready, user]);
 
+  // Свой аватар подменяется в visibleOnline: так он применяется и к снимкам,
+  // и к дельтам, а обработчик сокета не пересоздаётся при смене профиля.
   const handlePresence = useCallback(
     (event: MessageEvent) => {
       const decoded = decodePresenceWsEvent(event.data);
+      if (decoded.type === "delta") {
+        const lastSeq = lastSeqRef.current;
+        if (lastSeq !== null && decoded.seq <= lastSeq) {
+          return;
+        }
+        if (lastSeq === null || decoded.seq !== lastSeq + 1) {
+          lastSeqRef.current = null;
+          requestResyncRef.current();
+          return;
+        }
+        lastSeqRef.current = decoded.seq;
+        const left = new Set(decoded.leaves);
+        const joined = new Map(
+          decoded.joins.map((entry) => [entry.username, entry]),
+        );
+        setOnlineUsers((prev) => [
+          ...prev.filter(
+            (entry) => !left.has(entry.username) && !joined.has(entry.username),
+          ),
+          ...joined.values(),
+        ]);
+        if (decoded.guests !== null) {
+          setGuestCount(decoded.guests);
+        }
+        return;
+      }
+
       if (decoded.type !== "state") {
         return;
       }
 
+      if (decoded.seq !== null) {
+        lastSeqRef.current = decoded.seq;
+      }
+
       if (decoded.online) {
-        if (user) {
-          const nextImage = user.profileImage || null;
-          const nextCrop = user.avatarCrop ?? null;
-          setOnlineUsers(
-            decoded.online.map((entry) =>
-              entry.username === user.username
-                ? { ...entry, profileImage: nextImage, avatarCrop: nextCrop }
-                : entry,
-            ),
-          );
-        } else {
-          setOnlineUsers(decoded.online);
-        }
+        setOnlineUsers(decoded.online);
       }
 
       if (decoded.guests !== null) {
         setGuestCount(decoded.guests);
       }
     },
-    [user],
+    [],
   );
 
   const { status, lastError, send } = useReconnectingWebSocket({
@@ -98,7 +121,16 @@ export function PresenceProvider({
   });
 
   useEffect(() => {
-    if (status !== "online") return;
+    requestResyncRef.current = () => {
+      send(JSON.stringify({ type: "resync" }));
+    };
+  }, [send]);
+
+  useEffect(() => {
+    if (status !== "online") {
+      lastSeqRef.current = null;
+      return;
+    }
 
     const sendPing = () => {
       send(JSON.stringify({ type: "ping", ts: Date.now() }));